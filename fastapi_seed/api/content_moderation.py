@@ -1,15 +1,117 @@
-from typing import Dict
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Request
-from pydantic import BaseModel
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Request,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 
-from ..services.content_moderation import ContentModerationService
+from fastapi_seed.models.moderation_audit import ModerationAnalytics
+from fastapi_seed.repository.database import DatabaseManager
+from fastapi_seed.repository.executor import DatabaseOverloadedError
+from fastapi_seed.services.admission import (
+    PRIORITY_HEADER,
+    TIMEOUT_HEADER,
+    Priority,
+    parse_deadline,
+    parse_priority,
+)
+from fastapi_seed.services.batching import DeadlineExceededError
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.inference_server import (
+    InferenceUnavailableError,
+    moderation_service_class,
+)
+from fastapi_seed.services.moderation_audit import (
+    MODERATION_AUDIT,
+    moderation_analytics,
+)
+from fastapi_seed.services.moderation_stream import (
+    StreamSettings,
+    stream_moderated_lines,
+)
+
+if TYPE_CHECKING:
+    # Imported by the service class in use, so a process forwarding
+    # moderation to an inference server never imports torch
+    from fastapi_seed.services.content_moderation import (
+        ContentModerationService,
+    )
 
 router = APIRouter(prefix="/content-moderation", tags=["content-moderation"])
 
+# Seconds per analytics time bucket
+ANALYTICS_BUCKETS = {"minute": 60, "hour": 3600, "day": 86400}
+# Most time buckets an analytics request may span
+MAX_ANALYTICS_BUCKETS = 10_000
+
 # Dependency to get the service instance
 def get_moderation_service():
-    return ContentModerationService()
+    """Return the moderation service, or a fast 503 while it is loading.
+
+    The service is the inference server's client if this process forwards
+    moderation to one.
+    """
+    service_class = moderation_service_class()
+    if not service_class.is_ready():
+        failed = service_class.load_error() is not None
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Moderation model failed to load"
+                if failed
+                else "Moderation model is loading, retry later"
+            ),
+            headers=None if failed else {"Retry-After": "5"},
+        )
+    return service_class()
+
+def get_admission(
+    priority: Optional[str] = Header(None, alias=PRIORITY_HEADER),
+    timeout_ms: Optional[str] = Header(None, alias=TIMEOUT_HEADER),
+) -> Tuple[Priority, Optional[float]]:
+    """Return the priority and deadline a client asked for.
+
+    The priority is high, normal (the default) or low, and the timeout the
+    number of milliseconds the client waits for the response.
+    """
+    try:
+        return parse_priority(priority), parse_deadline(timeout_ms)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        ) from e
+
+def rejected(error: Exception) -> HTTPException:
+    """Return the response to a request moderation did not score.
+
+    A full queue is answered with 429 and Retry-After, so that clients back
+    off instead of timing out, and a passed deadline with 504.
+    """
+    if isinstance(error, DeadlineExceededError):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Deadline passed before moderation",
+        )
+    if isinstance(error, InferenceUnavailableError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Moderation is unavailable, retry later",
+            headers={"Retry-After": "1"},
+        )
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Moderation is overloaded, retry later",
+        headers={"Retry-After": "1"},
+    )
 
 class ModerationRequest(BaseModel):
     text: str
@@ -18,15 +120,34 @@ class ModerationResponse(BaseModel):
     scores: Dict[str, float]
     request_rate: float
 
+class BatchModerationRequest(BaseModel):
+    texts: List[str] = Field(min_length=1, max_length=1024)
+
+class BatchModerationResponse(BaseModel):
+    results: List[Dict[str, float]]
+    request_rate: float
+
 @router.post("/moderate", response_model=ModerationResponse)
 async def moderate_content(
     request: Request,
     moderation_request: ModerationRequest,
-    service: ContentModerationService = Depends(get_moderation_service)
+    service: "ContentModerationService" = Depends(get_moderation_service),
+    admission: Tuple[Priority, Optional[float]] = Depends(get_admission),
 ):
     """Moderate the provided text content and return category scores.
+
+    Inference runs on the service's dedicated executor, so the event loop
+    stays free for other routes while the model is busy. The X-Priority
+    and X-Request-Timeout-Ms headers set the request's priority class and
+    deadline.
     """
-    scores = service.moderate_text(moderation_request.text)
+    priority, deadline = admission
+    try:
+        scores = await service.moderate_text_async(
+            moderation_request.text, priority, deadline
+        )
+    except (InferenceOverloadedError, DeadlineExceededError) as e:
+        raise rejected(e) from e
 
     # Get RPS from middleware
     request_rate = getattr(request.state, "rps", 0.0)
@@ -35,3 +156,116 @@ async def moderate_content(
         scores=scores,
         request_rate=request_rate
     )
+
+@router.post("/moderate/batch", response_model=BatchModerationResponse)
+async def moderate_content_batch(
+    request: Request,
+    moderation_request: BatchModerationRequest,
+    service: "ContentModerationService" = Depends(get_moderation_service)
+):
+    """Moderate a list of texts and return category scores in input order.
+    """
+    try:
+        results = await service.moderate_texts_async(moderation_request.texts)
+    except InferenceOverloadedError as e:
+        raise rejected(e) from e
+
+    return BatchModerationResponse(
+        results=results,
+        request_rate=getattr(request.state, "rps", 0.0)
+    )
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """Streaming response whose body iterator consumes the request body.
+
+    StreamingResponse listens for client disconnects while streaming, which
+    swallows the request body messages the iterator is still reading. Here
+    a disconnect surfaces through the request body stream instead.
+    """
+
+    async def __call__(self, _scope: Scope, _receive: Receive, send: Send):
+        """Send the response without reading from `receive`."""
+        try:
+            await self.stream_response(send)
+        except OSError as e:
+            raise ClientDisconnect() from e
+
+        if self.background is not None:
+            await self.background()
+
+@router.post("/moderate/stream")
+async def moderate_content_stream(
+    request: Request,
+    text_field: str = "text",
+    id_field: Optional[str] = None,
+    service: "ContentModerationService" = Depends(get_moderation_service)
+):
+    """Moderate an NDJSON request body and stream NDJSON results.
+
+    Each input line is a JSON object with the text in `text_field`, or a
+    JSON string. Each output line holds the input line number, the
+    `id_field` value if requested, and the scores or an error.
+    """
+    return RequestBodyStreamingResponse(
+        stream_moderated_lines(
+            service,
+            request.stream(),
+            StreamSettings(text_field=text_field, id_field=id_field),
+        ),
+        media_type="application/x-ndjson",
+    )
+
+@router.get("/stats")
+def moderation_stats(
+    service: "ContentModerationService" = Depends(get_moderation_service)
+) -> Dict[str, dict]:
+    """Return batching, executor and audit log statistics for tuning."""
+    return {**service.stats(), "audit": MODERATION_AUDIT.stats()}
+
+def _utc(moment: datetime) -> datetime:
+    """Return a time as naive UTC, like the audit log stores it."""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.get("/analytics", response_model=ModerationAnalytics)
+async def moderation_analytics_route(
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Return the flagged rate and category score percentiles over time.
+
+    Decisions are aggregated per `bucket` from `since`, by default a day
+    before `until`, to `until`, by default now. Times without a time zone
+    are UTC. Decisions of the last second may not be written yet.
+    """
+    bucket_seconds = ANALYTICS_BUCKETS[bucket]
+    until = _utc(until) if until else datetime.now(timezone.utc).replace(
+        tzinfo=None
+    )
+    since = _utc(since) if since else until - timedelta(days=1)
+    span = (until - since).total_seconds()
+    if span <= 0 or span / bucket_seconds > MAX_ANALYTICS_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                "since must be before until, at most "
+                f"{MAX_ANALYTICS_BUCKETS} buckets apart"
+            ),
+        )
+
+    database = DatabaseManager()
+
+    def run() -> ModerationAnalytics:
+        with database.read_session() as session:
+            return moderation_analytics(session, bucket_seconds, since, until)
+
+    try:
+        return await database.read_executor.run(run)
+    except DatabaseOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is overloaded, retry later",
+            headers={"Retry-After": "1"},
+        ) from e
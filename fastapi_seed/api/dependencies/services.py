@@ -5,12 +5,47 @@ from __future__ import annotations
 from fastapi import Depends
 from sqlmodel import Session
 
-from fastapi_seed.repository.database import get_session
-from fastapi_seed.services.heroes import HeroesService
+from fastapi_seed.repository.database import (
+    DatabaseManager,
+    get_read_session,
+    get_session,
+)
+from fastapi_seed.services.hero_cache import HERO_CACHE
+from fastapi_seed.services.hero_search import HERO_SEARCH
+from fastapi_seed.services.hero_writer import HeroWriter
+from fastapi_seed.services.heroes import AsyncHeroesService, HeroesService
 
 
 def get_heroes_service(
     session: Session = Depends(get_session),  # noqa: B008
+    read_session: Session = Depends(get_read_session),  # noqa: B008
 ) -> HeroesService:
-    """Get HeroesService instance."""
-    return HeroesService(session=session)
+    """Get HeroesService instance.
+
+    Queries go through the read-only pool. Sessions check out a connection
+    only when first used, so a request only takes connections from the
+    pools it uses.
+    """
+    return HeroesService(
+        session=session,
+        writer=HeroWriter(),
+        cache=HERO_CACHE,
+        read_session=read_session,
+    )
+
+
+async def get_async_heroes_service() -> AsyncHeroesService:
+    """Get AsyncHeroesService instance.
+
+    Being async, the dependency resolves on the event loop instead of
+    taking a threadpool slot, and no session is opened for the request:
+    each query opens its own on the database executor.
+    """
+    database = DatabaseManager()
+    return AsyncHeroesService(
+        executor=database.read_executor,
+        read_session=database.read_session,
+        writer=HeroWriter(),
+        cache=HERO_CACHE,
+        search_index=HERO_SEARCH,
+    )
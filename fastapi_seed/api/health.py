@@ -0,0 +1,39 @@
+"""Health check routes module."""
+
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+from fastapi_seed.services.inference_server import moderation_service_class
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+def live():
+    """Report that the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+def ready(request: Request):
+    """Report whether the moderation model is loaded and warmed up.
+
+    An app serving no moderation is ready once it serves requests.
+    """
+    features = getattr(request.app.state, "features", None)
+    if features is not None and "moderation" not in features:
+        return {"status": "ready"}
+
+    service_class = moderation_service_class()
+    if service_class.is_ready():
+        return {"status": "ready"}
+
+    error = service_class.load_error()
+    content = (
+        {"status": "loading"}
+        if error is None
+        else {"status": "failed", "error": f"{type(error).__name__}: {error}"}
+    )
+    return JSONResponse(
+        content, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
@@ -1,28 +1,244 @@
 """Heroes routes module."""
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 
-from fastapi_seed.api.dependencies.services import get_heroes_service
-from fastapi_seed.models.hero import Hero, HeroCreate
-from fastapi_seed.services.heroes import HeroesService
+from fastapi_seed.api.dependencies.services import (
+    get_async_heroes_service,
+    get_heroes_service,
+)
+from fastapi_seed.models.hero import (
+    Hero,
+    HeroBulkCreated,
+    HeroCreate,
+    HeroMatch,
+)
+from fastapi_seed.repository.executor import DatabaseOverloadedError
+from fastapi_seed.repository.heroes import BULK_CHUNK_SIZE
+from fastapi_seed.services.heroes import (
+    EXPORT_FORMATS,
+    AsyncHeroesService,
+    HeroesService,
+)
+from fastapi_seed.services.ndjson import aiter_lines
 
 router = APIRouter(prefix="/heroes", tags=["heroes"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+
+_hero_list = TypeAdapter(List[HeroCreate])
+
+
+def _overloaded() -> HTTPException:
+    """Return the fast 503 of a call the database cannot queue."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Database is overloaded, retry later",
+        headers={"Retry-After": "1"},
+    )
+
 
 @router.post("/")
-def create_hero(
+async def create_hero(
     hero_create: HeroCreate,
+    service: AsyncHeroesService = Depends(get_async_heroes_service),  # noqa: B008
+):
+    """Create a new hero.
+
+    Concurrent creates are committed together by the hero writer.
+    """
+    try:
+        return await service.create_hero_async(hero_create)
+    except DatabaseOverloadedError as e:
+        raise _overloaded() from e
+
+
+@router.post("/bulk", response_model=HeroBulkCreated)
+async def create_heroes(
+    request: Request,
     service: HeroesService = Depends(get_heroes_service),  # noqa: B008
 ):
-    """Create a new hero."""
-    return service.create_hero(hero_create)
+    """Create many heroes from a JSON list or a streamed NDJSON body.
+
+    An NDJSON body (`application/x-ndjson`) holds one hero object per line
+    and is inserted chunk by chunk while it is read, so its size is not
+    limited by memory. Chunks are committed separately: if a line is
+    invalid, the chunks before it stay created and the error reports how
+    many heroes that was.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip() not in NDJSON_MEDIA_TYPES:
+        try:
+            hero_creates = _hero_list.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors()) from e
+        ids = await run_in_threadpool(service.create_heroes, hero_creates)
+        return HeroBulkCreated(ids=ids)
+
+    ids: List[UUID] = []
+    try:
+        async for chunk in _ndjson_chunks(request.stream()):
+            ids.extend(await run_in_threadpool(service.create_heroes, chunk))
+    except _InvalidLineError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"line": e.line, "error": str(e), "created": len(ids)},
+        ) from e
+    return HeroBulkCreated(ids=ids)
+
+
+@router.get("/export")
+def export_heroes(
+    request: Request,
+    export_format: Optional[str] = Query(None, alias="format"),
+    service: HeroesService = Depends(get_heroes_service),  # noqa: B008
+):
+    """Stream every hero as NDJSON, Parquet or an Arrow IPC stream.
+
+    The format is taken from the `format` query parameter, else from the
+    first supported media type in the `Accept` header, else NDJSON. Rows
+    go from DuckDB to the response in batches without building models.
+    """
+    if export_format is None:
+        export_format = _accepted_export_format(
+            request.headers.get("accept", "")
+        )
+    selected = EXPORT_FORMATS.get(export_format)
+    if selected is None or not selected.available:
+        available = [name for name, f in EXPORT_FORMATS.items() if f.available]
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Export format must be one of {available}",
+        )
+    return StreamingResponse(
+        service.export_heroes(export_format), media_type=selected.media_type
+    )
+
+
+def _accepted_export_format(accept: str) -> str:
+    """Return the first export format listed in an Accept header."""
+    media_types = [part.split(";")[0].strip() for part in accept.split(",")]
+    for media_type in media_types:
+        for name, export_format in EXPORT_FORMATS.items():
+            if export_format.media_type == media_type:
+                return name
+    return "ndjson"
 
 
 @router.get("/", response_model=List[Hero])
-def read_heroes(
+async def read_heroes(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    service: AsyncHeroesService = Depends(get_async_heroes_service),  # noqa: B008
+):
+    """Read a page of heroes ordered by name.
+
+    The cursor of the next page is returned in the `X-Next-Cursor` header,
+    which is absent on the last page. Pass it back as `cursor` to continue.
+    The page is serialized in one pass without validating each hero
+    against `response_model`, which only documents the schema.
+    """
+    try:
+        # Rows come from our own table, so they need no validation
+        body, next_cursor = await service.get_heroes_json(
+            limit, cursor, name_prefix, validate=False
+        )
+    except DatabaseOverloadedError as e:
+        raise _overloaded() from e
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+    headers = {} if next_cursor is None else {NEXT_CURSOR_HEADER: next_cursor}
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/search", response_model=List[HeroMatch])
+async def search_heroes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    service: AsyncHeroesService = Depends(get_async_heroes_service),  # noqa: B008
+):
+    """Search heroes by name, best matches first.
+
+    Heroes containing the words of `q` are ranked by BM25. If there are
+    fewer than `limit`, heroes with names similar to `q` follow, marked
+    `fuzzy`, so that partial and misspelled names still match.
+    """
+    try:
+        return await service.search_heroes(q, limit)
+    except DatabaseOverloadedError as e:
+        raise _overloaded() from e
+
+
+@router.get("/stats")
+def heroes_stats(
     service: HeroesService = Depends(get_heroes_service),  # noqa: B008
+) -> Dict[str, Optional[dict]]:
+    """Return hero cache and writer statistics for tuning."""
+    return service.stats()
+
+
+@router.get("/{hero_id}", response_model=Hero)
+async def read_hero(
+    hero_id: UUID,
+    service: AsyncHeroesService = Depends(get_async_heroes_service),  # noqa: B008
 ):
-    """Read heroes with pagination."""
-    return service.get_heroes()
+    """Read a hero by id."""
+    try:
+        body = await service.get_hero_json(hero_id)
+    except DatabaseOverloadedError as e:
+        raise _overloaded() from e
+    if body is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Hero not found"
+        )
+    return Response(body, media_type="application/json")
+
+
+class _InvalidLineError(ValueError):
+    """NDJSON input line that is not a valid hero."""
+
+    def __init__(self, line: int, error: str) -> None:
+        super().__init__(error)
+        self.line = line
+
+
+async def _ndjson_chunks(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[List[HeroCreate]]:
+    """Parse NDJSON heroes into insert chunks, skipping blank lines."""
+    chunk: List[HeroCreate] = []
+    line_no = -1
+    async for line in aiter_lines(chunks):
+        line_no += 1
+        if line is None:
+            raise _InvalidLineError(line_no, "line too long")
+        if not line.strip():
+            continue
+        try:
+            chunk.append(HeroCreate.model_validate_json(line))
+        except ValidationError as e:
+            error = e.errors()[0]
+            raise _InvalidLineError(line_no, error["msg"]) from e
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
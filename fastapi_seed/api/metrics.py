@@ -0,0 +1,16 @@
+"""Metrics routes module."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from fastapi_seed.services.metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Return all metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
@@ -1,27 +1,109 @@
 """FastAPI application for Heroes and Movies API."""
 
-from contextlib import asynccontextmanager
+from __future__ import annotations
+
+import os
+from collections.abc import AsyncIterator, Iterable
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING
 
 from fastapi import FastAPI
 
-from fastapi_seed.api import content_moderation, heroes
+from fastapi_seed.api import health, metrics
+from fastapi_seed.middleware.load_shedding import LoadSheddingMiddleware
+from fastapi_seed.middleware.metrics import MetricsMiddleware
 from fastapi_seed.middleware.rps_tracker import RPSTrackerMiddleware
-from fastapi_seed.repository.database import DatabaseManager
-from fastapi_seed.services.content_moderation import ContentModerationService
 
-app = FastAPI(title="Heroes and Movies API")
+if TYPE_CHECKING:
+    from fastapi_seed.services.content_moderation import ModerationSettings
+
+# Features an app can serve. Each one's routers and services, and their
+# dependencies such as torch for moderation, are only imported when the
+# feature is enabled
+FEATURES = ("heroes", "moderation")
+
+
+def enabled_features(features: Iterable[str] | None = None) -> frozenset[str]:
+    """Return the features to serve.
+
+    Args:
+        features: Names from `FEATURES`. If None, the comma-separated
+            APP_FEATURES environment variable, or all features if unset.
+
+    Raises:
+        ValueError: If a feature is unknown or none is given.
+    """
+    if features is None:
+        features = os.environ.get("APP_FEATURES", ",".join(FEATURES))
+        features = features.split(",")
+    selected = frozenset(name.strip() for name in features if name.strip())
+    unknown = selected.difference(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+    if not selected:
+        raise ValueError("At least one feature must be enabled")
+    return selected
+
+
+def moderation_settings() -> ModerationSettings:
+    """Return the settings moderation is served with."""
+    from fastapi_seed.services.content_moderation import (  # noqa: PLC0415
+        ModerationSettings,
+    )
+    from fastapi_seed.services.moderation_cascade import (  # noqa: PLC0415
+        CascadeSettings,
+    )
+
+    # Answer obvious texts with the first stage of a cascade file written
+    # by fastapi_seed.tools.calibrate_cascade, at the thresholds it picked
+    cascade = None
+    cascade_path = os.environ.get("MODERATION_CASCADE_PATH")
+    if cascade_path:
+        flag_above = os.environ.get("MODERATION_CASCADE_FLAG_ABOVE")
+        cascade = CascadeSettings(
+            path=cascade_path,
+            clear_below=float(
+                os.environ.get(
+                    "MODERATION_CASCADE_CLEAR_BELOW",
+                    CascadeSettings.clear_below,
+                )
+            ),
+            flag_above=float(flag_above) if flag_above else None,
+        )
+
+    return ModerationSettings(
+        # A local directory, such as a fastapi_seed.tools.tiny_model
+        model_name=os.environ.get(
+            "MODERATION_MODEL_NAME", ModerationSettings.model_name
+        ),
+        model_cache_dir=os.environ.get("MODERATION_MODEL_CACHE_DIR"),
+        max_batch_size=32,
+        max_wait_ms=5.0,
+        inference_workers=1,
+        # Requests queued beyond what is served within clients' deadlines
+        # only time out; a smaller bound answers them 429 at once instead
+        max_pending=int(os.environ.get("MODERATION_MAX_PENDING", "256")),
+        long_text=True,
+        cascade=cascade,
+    )
 
 
 @asynccontextmanager
-async def lifespan(_: FastAPI):
-    """Lifespan context manager for FastAPI to manage database connections and services."""
-    # Initialize with appropriate pool size based on your workload
-    DatabaseManager(pool_size=10, max_overflow=20)
+async def database_lifespan() -> AsyncIterator[None]:
+    """Open the database the features share."""
+    from fastapi_seed.repository.database import (  # noqa: PLC0415
+        DatabaseManager,
+        ReadPoolSettings,
+    )
 
-    # Initialize content moderation service and download model
-    print("Initializing content moderation service and downloading model...")
-    ContentModerationService.initialize()
-    print("Content moderation service initialized successfully!")
+    # Initialize with appropriate pool size based on your workload
+    DatabaseManager(
+        pool_size=10,
+        max_overflow=20,
+        read_pool=ReadPoolSettings(
+            pool_size=20, max_overflow=20, max_pending=512
+        ),
+    )
 
     yield
 
@@ -29,19 +111,143 @@ async def lifespan(_: FastAPI):
     DatabaseManager().dispose()
 
 
-def create_app() -> FastAPI:
-    """Create and configure the FastAPI application."""
+@asynccontextmanager
+async def heroes_lifespan() -> AsyncIterator[None]:
+    """Start the hero writer and index."""
+    from fastapi_seed.repository.database import (  # noqa: PLC0415
+        DatabaseManager,
+    )
+    from fastapi_seed.services.hero_search import HERO_SEARCH  # noqa: PLC0415
+    from fastapi_seed.services.hero_writer import (  # noqa: PLC0415
+        HeroWriter,
+        WriterSettings,
+    )
+
+    # Single writer committing concurrent hero creates together
+    HeroWriter(WriterSettings(max_batch_size=256, max_wait_ms=2.0))
+
+    # Index hero names in the background; searches meanwhile cover the
+    # heroes indexed so far, and then add new heroes as they find them
+    HERO_SEARCH.refresh_in_background(DatabaseManager().read_session)
+
+    yield
+
+    # Commit queued heroes before the connections go away
+    HeroWriter().shutdown()
+
+
+@asynccontextmanager
+async def moderation_lifespan() -> AsyncIterator[None]:
+    """Serve moderation and keep its decisions in the audit log."""
+    from fastapi_seed.repository.database import (  # noqa: PLC0415
+        DatabaseManager,
+    )
+    from fastapi_seed.services.moderation_audit import (  # noqa: PLC0415
+        MODERATION_AUDIT,
+    )
+
+    # Decisions are written by the web workers, which own the database,
+    # and never by the inference server
+    MODERATION_AUDIT.start(DatabaseManager())
+    try:
+        async with moderation_service():
+            yield
+    finally:
+        # Write the last decisions once no more are made
+        MODERATION_AUDIT.shutdown()
+
+
+@asynccontextmanager
+async def moderation_service() -> AsyncIterator[None]:
+    """Load the moderation model, or connect to the inference server."""
+    server_socket = os.environ.get("MODERATION_SERVER_SOCKET")
+    if server_socket:
+        from fastapi_seed.services.inference_server import (  # noqa: PLC0415
+            RemoteModerationService,
+        )
+
+        # Another process owns the model and batches the texts of all
+        # web workers, see fastapi_seed.tools.serve_inference. This one
+        # never imports torch
+        RemoteModerationService(server_socket).start()
+        yield
+        await RemoteModerationService().close()
+        return
+
+    from fastapi_seed.services.content_moderation import (  # noqa: PLC0415
+        ContentModerationService,
+    )
+
+    # Load the moderation model in the background so that other routes
+    # are served right away; /health/ready reports when moderation is
+    # available
+    print("Loading content moderation model in the background...")
+    ContentModerationService.initialize_in_background(moderation_settings())
+
+    yield
+
+    if ContentModerationService.is_ready():
+        # Flush pending moderation batches before shutting down
+        ContentModerationService().shutdown()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start and stop the services of the app's features."""
+    async with AsyncExitStack() as stack:
+        # Entered first so that it is disposed of last
+        await stack.enter_async_context(database_lifespan())
+        if "heroes" in app.state.features:
+            await stack.enter_async_context(heroes_lifespan())
+        # Entered last so that moderation batches are flushed first
+        if "moderation" in app.state.features:
+            await stack.enter_async_context(moderation_lifespan())
+        yield
+
+
+def create_app(features: Iterable[str] | None = None) -> FastAPI:
+    """Create and configure the FastAPI application.
+
+    Args:
+        features: Features to serve, see `enabled_features`.
+    """
     app = FastAPI(
         title="Lightly Purple API", version="1.0.0", lifespan=lifespan
     )
+    app.state.features = enabled_features(features)
+
+    # Answer moderation requests with an early 429 while the request rate
+    # is above MODERATION_MAX_RPS; inside the RPS tracker, which sets it
+    max_rps = os.environ.get("MODERATION_MAX_RPS")
+    if max_rps and "moderation" in app.state.features:
+        app.add_middleware(LoadSheddingMiddleware, max_rps=float(max_rps))
 
     # Add RPS tracker middleware
     app.add_middleware(RPSTrackerMiddleware)
 
-    app.include_router(heroes.router)
-    app.include_router(content_moderation.router)
+    # Outermost, so that latency includes the other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(health.router)
+    app.include_router(metrics.router)
+    if "heroes" in app.state.features:
+        from fastapi_seed.api import heroes  # noqa: PLC0415
+
+        app.include_router(heroes.router)
+    if "moderation" in app.state.features:
+        from fastapi_seed.api import content_moderation  # noqa: PLC0415
+
+        app.include_router(content_moderation.router)
 
     return app
 
 
-app = create_app()
+def __getattr__(name: str) -> FastAPI:
+    """Create `app`, served by `uvicorn fastapi_seed.app:app`, on access.
+
+    Importing this module for `create_app` then imports no feature.
+    """
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    app = globals()["app"] = create_app()
+    return app
@@ -0,0 +1,86 @@
+"""Early rejection of requests while the request rate is too high."""
+
+from __future__ import annotations
+
+import logging
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from fastapi_seed.services.admission import (
+    PRIORITY_HEADER,
+    Priority,
+    parse_priority,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware answering 429 while the request rate is too high.
+
+    Requests to paths under `path_prefix`, by default the moderation
+    scoring routes but not the read-only stats and analytics, are rejected
+    with Retry-After before their body is read once `request.state.rps`,
+    set by the `RPSTrackerMiddleware` wrapping this one, exceeds
+    `max_rps`. Requests
+    of a priority in `exempt` are still let through, and so are requests
+    whose priority header is invalid, for the route to reject.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_rps: float,
+        path_prefix: str = "/content-moderation/moderate",
+        retry_after: int = 1,
+        exempt: frozenset[Priority] = frozenset({Priority.HIGH}),
+    ) -> None:
+        """Initialize the middleware.
+
+        Args:
+            app: ASGI application to wrap.
+            max_rps: Requests per second above which requests are shed.
+            path_prefix: Prefix of the paths of the requests to shed.
+            retry_after: Seconds clients are asked to wait before retrying.
+            exempt: Priorities that are never shed.
+        """
+        self.app = app
+        self.max_rps = max_rps
+        self.path_prefix = path_prefix
+        self.retry_after = retry_after
+        self.exempt = exempt
+        self.shed = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Reject the request if it is to be shed, else pass it on."""
+        if scope["type"] != "http" or not self._shed(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.shed += 1
+        if self.shed % 1000 == 1:
+            logger.warning(
+                "Shedding requests at %.1f RPS (%d so far)",
+                scope["state"]["rps"],
+                self.shed,
+            )
+        response = JSONResponse(
+            {"detail": "Too many requests, retry later"},
+            status_code=429,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
+
+    def _shed(self, scope: Scope) -> bool:
+        """Whether a request is over the rate limit and not exempt."""
+        if not scope["path"].startswith(self.path_prefix):
+            return False
+        if scope.get("state", {}).get("rps", 0.0) <= self.max_rps:
+            return False
+        try:
+            priority = parse_priority(Headers(scope=scope).get(PRIORITY_HEADER))
+        except ValueError:
+            return False
+        return priority not in self.exempt
@@ -0,0 +1,19 @@
+"""Route keys for per-route request statistics."""
+
+from starlette.types import Scope
+
+# Route key of requests that did not match any route, so that arbitrary
+# paths cannot grow per-route statistics
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_key(scope: Scope) -> str:
+    """Return the method and route template of a handled request.
+
+    Must be called after routing, which stores the matched route in the
+    scope.
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if path is None:
+        return UNMATCHED_ROUTE
+    return f"{scope['method']} {path}"
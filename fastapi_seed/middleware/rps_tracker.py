@@ -1,68 +1,177 @@
+"""Request rate tracking middleware."""
+
+from __future__ import annotations
+
 import logging
 import time
-from collections import deque
-from threading import Lock
-from typing import Callable
+from typing import Any, Callable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi_seed.middleware.routes import route_key
 
 logger = logging.getLogger(__name__)
 
-class RPSTrackerMiddleware(BaseHTTPMiddleware):
+
+class RateCounter:
+    """Request count over a sliding window of one-second buckets.
+
+    The counter is a fixed ring of `window_size` per-second counts with a
+    running total, so recording a request and reading the rate take
+    constant time and memory however many requests arrive. Buckets of
+    seconds without requests are cleared lazily when time moves on.
+    """
+
     def __init__(
         self,
-        app,
-        window_size: int = 60,  # Window size in seconds
-        max_requests: int = 1000,  # Maximum number of requests to store
-    ):
-        super().__init__(app)
+        window_size: int = 60,
+        clock: Callable[[], float] = time.monotonic,
+        started: float | None = None,
+    ) -> None:
+        """Initialize the counter.
+
+        Args:
+            window_size: Window length in seconds.
+            clock: Monotonic clock in seconds, replaceable in tests.
+            started: Time counting started, now if None.
+        """
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+
         self.window_size = window_size
-        self.request_times = deque(maxlen=max_requests)
-        self.lock = Lock()
-        logger.info("RPS Tracker Middleware initialized with window size: %d seconds", window_size)
+        self._clock = clock
+        self._counts = [0] * window_size
+        self._total = 0
+        self._started = clock() if started is None else started
+        self._second = int(clock())
+
+    def record(self) -> None:
+        """Count one request at the current time."""
+        second = self._advance()
+        self._counts[second % self.window_size] += 1
+        self._total += 1
+
+    def count(self) -> int:
+        """Return the number of requests within the window."""
+        self._advance()
+        return self._total
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Record request time
-        current_time = time.time()
-        with self.lock:
-            self.request_times.append(current_time)
-            self._cleanup_old_requests(current_time)
-            rps = self._calculate_rps(current_time)
+    def rate(self) -> float:
+        """Return the average requests per second over the window.
 
-        # Add RPS to request state for potential use in route handlers
-        request.state.rps = rps
+        Shortly after startup the rate is averaged over the elapsed time
+        instead of the full window.
+        """
+        elapsed = self._clock() - self._started
+        span = min(float(self.window_size), max(elapsed, 1.0))
+        return self.count() / span
 
-        # Process the request
-        response = await call_next(request)
+    def _advance(self) -> int:
+        """Clear the buckets of seconds that left the window."""
+        second = int(self._clock())
+        if second <= self._second:
+            return self._second
+        if second - self._second >= self.window_size:
+            self._counts = [0] * self.window_size
+            self._total = 0
+        else:
+            for expired in range(self._second + 1, second + 1):
+                slot = expired % self.window_size
+                self._total -= self._counts[slot]
+                self._counts[slot] = 0
+        self._second = second
+        return second
 
-        # Log RPS after processing
+
+class RPSTrackerMiddleware:
+    """ASGI middleware tracking requests per second.
+
+    The overall rate is stored in `request.state.rps` before the request is
+    handled. Rates per route template and per response status are kept as
+    well and available from `snapshot`. All counting happens on the event
+    loop thread, so no locking is needed. Only one in `log_every` requests
+    is logged.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        window_size: int = 60,  # Window size in seconds
+        log_every: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the middleware.
+
+        Args:
+            app: ASGI application to wrap.
+            window_size: Window length in seconds.
+            log_every: Log the rates once every this many requests.
+            clock: Monotonic clock in seconds, replaceable in tests.
+        """
+        self.app = app
+        self.window_size = window_size
+        self.log_every = log_every
+        self._clock = clock
+        self.requests = RateCounter(window_size, clock)
+        self._started = clock()
+        self.routes: dict[str, RateCounter] = {}
+        self.statuses: dict[int, RateCounter] = {}
+        self._seen = 0
         logger.info(
-            "Request processed - Path: %s, Method: %s, RPS: %.2f",
-            request.url.path,
-            request.method,
-            rps
+            "RPS Tracker Middleware initialized with window size: %d seconds",
+            window_size,
         )
 
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Count the request, then its route and status once it responds."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.requests.record()
+        rps = self.requests.rate()
+        # Backs request.state.rps for route handlers
+        scope.setdefault("state", {})["rps"] = rps
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self._record_response(scope, message["status"])
+            await send(message)
 
-    def _cleanup_old_requests(self, current_time: float) -> None:
-        """Remove requests older than the window size."""
-        cutoff_time = current_time - self.window_size
-        while self.request_times and self.request_times[0] < cutoff_time:
-            self.request_times.popleft()
+        await self.app(scope, receive, send_with_status)
 
-    def _calculate_rps(self, current_time: float) -> float:
-        """Calculate requests per second based on the window size."""
-        if not self.request_times:
-            return 0.0
+        self._seen += 1
+        if self._seen % self.log_every == 0:
+            logger.info(
+                "Request processed - Path: %s, Method: %s, RPS: %.2f",
+                scope["path"],
+                scope["method"],
+                rps,
+            )
 
-        # Calculate the actual time window
-        window_start = self.request_times[0]
-        window_duration = current_time - window_start
+    def snapshot(self) -> dict:
+        """Return the overall, per-route and per-status request rates."""
+        return {
+            "rps": self.requests.rate(),
+            "routes": {
+                route: counter.rate() for route, counter in self.routes.items()
+            },
+            "statuses": {
+                status: counter.rate()
+                for status, counter in self.statuses.items()
+            },
+        }
 
-        if window_duration == 0:
-            return 0.0
+    def _record_response(self, scope: Scope, status: int) -> None:
+        """Count a response for its route template and status code."""
+        self._counter(self.routes, route_key(scope)).record()
+        self._counter(self.statuses, status).record()
 
-        return len(self.request_times) / window_duration
+    def _counter(self, counters: dict[Any, RateCounter], key) -> RateCounter:
+        """Return the counter of a key, creating it on first use."""
+        counter = counters.get(key)
+        if counter is None:
+            counter = counters[key] = RateCounter(
+                self.window_size, self._clock, self._started
+            )
+        return counter
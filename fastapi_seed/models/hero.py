@@ -1,7 +1,9 @@
 """Heroes models."""
 
+from typing import Optional
 from uuid import UUID, uuid4
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -16,6 +18,8 @@ class Hero(HeroBase, table=True):
     """Model for Hero."""
 
     __tablename__ = "heroes"
+    # Matches the (name, id) ordering of hero pages
+    __table_args__ = (Index("ix_heroes_name_id", "name", "id"),)
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     name: str
 
@@ -26,5 +30,27 @@ class HeroCreate(SQLModel):
     name: str
 
 
+class HeroBulkCreated(SQLModel):
+    """Model for the result of creating heroes in bulk."""
+
+    ids: list[UUID]
+
+
+class HeroPage(SQLModel):
+    """Model for a page of heroes."""
+
+    items: list[Hero]
+    # Opaque cursor of the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+
 class HeroRead(HeroBase):
     """Model for reading a Hero."""
+
+
+class HeroMatch(HeroBase):
+    """Model for a hero found by a name search."""
+
+    score: float
+    # Matched by trigram similarity rather than by whole words
+    fuzzy: bool = False
@@ -0,0 +1,65 @@
+"""Moderation audit log models."""
+
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from sqlmodel import Field, SQLModel
+
+
+class ModerationDecision(SQLModel, table=True):
+    """Model for a moderation decision kept in the audit log.
+
+    Rows are appended in time order, so DuckDB's per row group min/max of
+    `created_at` already skips the row groups outside a time range, and no
+    index is needed for it.
+    """
+
+    __tablename__ = "moderation_decisions"
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    # UTC
+    created_at: datetime
+    model: str
+    # The text itself is not kept
+    text_sha256: str
+    text_length: int
+    flagged: bool
+    # Highest scoring category
+    category: str
+    score: float
+
+
+class ModerationScore(SQLModel, table=True):
+    """Model for the score of one category of an audited decision."""
+
+    __tablename__ = "moderation_scores"
+    decision_id: UUID = Field(primary_key=True)
+    category: str = Field(primary_key=True)
+    # Of the decision, so that time ranges need no join
+    created_at: datetime
+    score: float
+
+
+class CategoryScoreStats(SQLModel):
+    """Model for the distribution of a category's scores."""
+
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+
+
+class ModerationBucket(SQLModel):
+    """Model for the moderation decisions of one time bucket."""
+
+    start: datetime
+    decisions: int
+    flagged: int
+    flagged_rate: float
+    categories: dict[str, CategoryScoreStats]
+
+
+class ModerationAnalytics(SQLModel):
+    """Model for moderation decisions aggregated per time bucket."""
+
+    bucket_seconds: int
+    buckets: list[ModerationBucket]
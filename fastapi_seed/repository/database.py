@@ -4,17 +4,83 @@ import logging
 import os
 import threading
 from contextlib import contextmanager
-from typing import Generator
+from dataclasses import dataclass
+from functools import partial
+from typing import Generator, Optional
 
+from sqlalchemy import Engine, event
 from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import Session, SQLModel, create_engine
 
+from fastapi_seed.repository.executor import DatabaseExecutor
+from fastapi_seed.services.metrics import REGISTRY
+
+POOL_CHECKOUT_WAIT = REGISTRY.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the database pool.",
+    ("pool",),
+)
+POOL_CHECKED_OUT = REGISTRY.gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently checked out of the pool.",
+    ("pool",),
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long checkouts wait for a connection."""
+
+    # Value of the pool label of the pool metrics
+    pool_name = "write"
+
+    def connect(self):
+        """Check out a connection and record the wait."""
+        with POOL_CHECKOUT_WAIT.labels(self.pool_name).time():
+            return super().connect()
+
+
+class ReadQueuePool(TimedQueuePool):
+    """Pool of the connections serving read-only sessions."""
+
+    pool_name = "read"
+
+
+@dataclass(frozen=True)
+class ReadPoolSettings:
+    """Sizing of the read-only connection pool.
+
+    Attributes:
+        pool_size: The number of read-only connections to keep open.
+        max_overflow: Max read-only connections to create beyond pool_size.
+        max_pending: Max reads of async routes queued or running before
+            further ones are rejected.
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    max_pending: int = 256
+
+
+def _begin_read_only(dbapi_connection, _connection_record) -> None:
+    """Start every transaction of a new connection in read-only mode.
+
+    DuckDB refuses to open a file again with `read_only` set while it is
+    open for writing, so read connections share the writer's database
+    instance and are made read-only per transaction instead.
+    """
+    dbapi_connection.begin = partial(
+        dbapi_connection.execute, "BEGIN TRANSACTION READ ONLY"
+    )
+
 
 class DatabaseManager:
     """Manages database connections."""
 
     _instance = None
     engine = None
+    read_engine = None
+    read_executor = None
     db_file = None
     _lock = threading.RLock()
     _initialized = False
@@ -42,13 +108,30 @@ class DatabaseManager:
             os.remove(db_file)
             logging.info(f"Deleted existing database: {db_file}")
 
-    def __new__(
+    @staticmethod
+    def create_indexes(engine: Engine) -> None:
+        """Create the model indexes missing from existing tables.
+
+        `create_all` only creates the indexes of tables it creates, so
+        indexes added to a model later are created here.
+
+        Args:
+            engine: Engine of the database
+        """
+        with engine.begin() as connection:
+            for table in SQLModel.metadata.sorted_tables:
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+
+    def __new__(  # noqa: PLR0913
         cls,
         db_file: str = "purple_test.db",
         cleanup_existing: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
         timeout: int = 30,
+        *,
+        read_pool: Optional[ReadPoolSettings] = None,
     ):
         """Create a new instance of the DatabaseManager with thread safety.
 
@@ -58,6 +141,7 @@ class DatabaseManager:
             pool_size: The number of connections to keep open
             max_overflow: Max connections to create beyond pool_size
             timeout: Seconds to wait for a connection from the pool
+            read_pool: Sizing of the read-only pool, the defaults if None
 
         Returns:
             DatabaseManager instance
@@ -82,16 +166,42 @@ class DatabaseManager:
 
                 instance.engine = create_engine(
                     f"duckdb:///{db_file}",
-                    poolclass=QueuePool,
+                    poolclass=TimedQueuePool,
                     pool_size=pool_size,
                     max_overflow=max_overflow,
                     pool_timeout=timeout,
                     connect_args=connect_args,
                 )
+                POOL_CHECKED_OUT.labels("write").set_function(
+                    instance.engine.pool.checkedout
+                )
+
+                # Reads get their own pool, so they never wait for a
+                # connection held by a write
+                read_pool = read_pool or ReadPoolSettings()
+                instance.read_engine = create_engine(
+                    f"duckdb:///{db_file}",
+                    poolclass=ReadQueuePool,
+                    pool_size=read_pool.pool_size,
+                    max_overflow=read_pool.max_overflow,
+                    pool_timeout=timeout,
+                    connect_args=connect_args,
+                )
+                event.listen(instance.read_engine, "connect", _begin_read_only)
+                POOL_CHECKED_OUT.labels("read").set_function(
+                    instance.read_engine.pool.checkedout
+                )
+                # One thread per read connection the pool can hand out
+                instance.read_executor = DatabaseExecutor(
+                    max_workers=read_pool.pool_size + read_pool.max_overflow,
+                    max_pending=read_pool.max_pending,
+                    name="read",
+                )
 
                 try:
                     # Initialize tables
                     SQLModel.metadata.create_all(instance.engine)
+                    cls.create_indexes(instance.engine)
                     instance._initialized = True  # noqa: SLF001
                     instance.db_file = db_file
                     logging.info(f"Database initialized at {db_file}")
@@ -124,10 +234,29 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @contextmanager
+    def read_session(self) -> Generator[Session, None, None]:
+        """Create a new session on the read-only pool.
+
+        Its transactions are read-only, so writes through it fail.
+
+        Yields:
+            Active read-only database session
+        """
+        if not self._initialized:
+            raise RuntimeError("Database not properly initialized")
+
+        with Session(self.read_engine) as session:
+            yield session
+
     def dispose(self):
-        """Close all connections and dispose of the engine."""
+        """Stop the read executor and dispose of the engines."""
+        if self.read_executor is not None:
+            self.read_executor.shutdown()
         if hasattr(self, "engine") and self.engine is not None:
             self.engine.dispose()
+            if self.read_engine is not None:
+                self.read_engine.dispose()
             logging.info("Database connections disposed")
 
 
@@ -138,3 +267,12 @@ def get_session():
     """
     with DatabaseManager().session() as session:
         yield session
+
+
+def get_read_session():
+    """Yield a new read-only session for database queries.
+
+    For use as a FastAPI dependency.
+    """
+    with DatabaseManager().read_session() as session:
+        yield session
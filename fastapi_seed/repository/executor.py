@@ -0,0 +1,122 @@
+"""Dedicated executor running blocking database calls off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, TypeVar
+
+from fastapi_seed.services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ResultT = TypeVar("ResultT")
+
+DB_CALLS_PENDING = REGISTRY.gauge(
+    "db_calls_pending",
+    "Database calls admitted to an executor, queued or running.",
+    ("pool",),
+)
+
+
+class DatabaseOverloadedError(RuntimeError):
+    """Raised when the database cannot accept more calls."""
+
+
+class DatabaseExecutor:
+    """Size-bounded thread pool owning the blocking calls of async routes.
+
+    DuckDB has no async driver, so async routes hand their queries to
+    `run`, which executes them on `max_workers` threads. Sizing the threads
+    like the connection pool they draw from keeps them from waiting for a
+    connection, and keeps database calls out of Starlette's shared
+    threadpool. Once `max_pending` calls are queued or running, further
+    calls fail at once with `DatabaseOverloadedError` instead of queuing
+    without bound.
+    """
+
+    def __init__(
+        self, max_workers: int = 15, max_pending: int = 256, name: str = "db"
+    ) -> None:
+        """Initialize the executor.
+
+        Args:
+            max_workers: Number of threads running database calls.
+            max_pending: Maximum number of calls queued or running.
+            name: Name of the threads and value of the pool metric label.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.name = name
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        DB_CALLS_PENDING.labels(name).set_function(lambda: self._pending)
+        logger.info(
+            "DatabaseExecutor %s started (max_workers=%d, max_pending=%d)",
+            name,
+            max_workers,
+            max_pending,
+        )
+
+    async def run(self, fn: Callable[..., ResultT], *args: Any) -> ResultT:
+        """Run a blocking function on the executor threads.
+
+        Args:
+            fn: Function to run, typically a unit of work on a session.
+            *args: Positional arguments for the function.
+
+        Returns:
+            The function's result.
+
+        Raises:
+            DatabaseOverloadedError: If `max_pending` calls are already
+                queued or running.
+        """
+        with self._admit():
+            return await asyncio.wrap_future(self._pool.submit(fn, *args))
+
+    @contextmanager
+    def _admit(self) -> Generator[None, None, None]:
+        """Reserve one pending slot for the duration of the block."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise DatabaseOverloadedError(
+                    f"{self._pending} {self.name} calls pending"
+                )
+            self._pending += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        """Return executor saturation statistics."""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads.
+
+        Args:
+            wait: Whether to wait for running calls to finish.
+        """
+        self._pool.shutdown(wait=wait)
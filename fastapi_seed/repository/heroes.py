@@ -1,9 +1,34 @@
 """Heroes repository module."""
 
-from sqlmodel import Session, select
+import io
+import os
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+from typing import Optional, TypeVar
+from uuid import UUID, uuid4
+
+import numpy as np
+from duckdb import DuckDBPyConnection
+from sqlalchemy import Select, literal_column
+from sqlmodel import Session, and_, or_, select
 
 from fastapi_seed.models.hero import Hero, HeroCreate
 
+_SelectT = TypeVar("_SelectT", bound=Select)
+
+# Rows inserted and committed together by create_heroes
+BULK_CHUNK_SIZE = 10_000
+
+# Name under which a chunk's columns are visible to DuckDB
+_BULK_VIEW = "bulk_heroes"
+
+# Rows fetched from DuckDB at a time when exporting heroes
+EXPORT_BATCH_ROWS = 10_000
+
+# Bytes read at a time from an exported Parquet file
+_EXPORT_READ_BYTES = 1 << 20
+
 
 def create_hero(session: Session, hero_create: HeroCreate):
     """Create a new hero in the database."""
@@ -17,12 +42,223 @@ def create_hero(session: Session, hero_create: HeroCreate):
     return hero
 
 
+def create_heroes(
+    session: Session,
+    hero_creates: Iterable[HeroCreate],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> list[UUID]:
+    """Create many heroes, committing once per chunk.
+
+    IDs are generated here, so nothing is read back after inserting. Each
+    chunk is handed to DuckDB as columns and inserted with a single
+    statement instead of one statement per row. If a chunk fails, it is
+    rolled back and the chunks before it stay committed.
+
+    Args:
+        session: Database session.
+        hero_creates: Heroes to create, possibly a lazy iterable.
+        chunk_size: Number of heroes inserted per transaction.
+
+    Returns:
+        The IDs of the created heroes, in input order.
+    """
+    ids: list[UUID] = []
+    for chunk in _chunks(hero_creates, chunk_size):
+        chunk_ids = [uuid4() for _ in chunk]
+        try:
+            insert_heroes(session, chunk_ids, [hero.name for hero in chunk])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        ids.extend(chunk_ids)
+
+    return ids
+
+
+def _chunks(
+    hero_creates: Iterable[HeroCreate], chunk_size: int
+) -> Iterator[list[HeroCreate]]:
+    """Split heroes into lists of at most chunk_size."""
+    iterator = iter(hero_creates)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def insert_heroes(
+    session: Session, ids: Sequence[UUID], names: Sequence[str]
+) -> None:
+    """Insert heroes with one statement, without committing.
+
+    Args:
+        session: Database session whose transaction the rows join.
+        ids: IDs of the heroes.
+        names: Names of the heroes, in the order of `ids`.
+    """
+    connection = session.connection().connection.driver_connection
+    # DuckDB scans registered NumPy columns directly, which is orders of
+    # magnitude faster than binding parameters row by row
+    connection.register(
+        _BULK_VIEW,
+        {
+            "id": np.array([str(hero_id) for hero_id in ids], dtype=object),
+            "name": np.array(names, dtype=object),
+        },
+    )
+    try:
+        connection.execute(
+            f"INSERT INTO {Hero.__tablename__} (id, name) "
+            f"SELECT CAST(id AS UUID), name FROM {_BULK_VIEW}"
+        )
+    finally:
+        connection.unregister(_BULK_VIEW)
+
+
 def get_heroes(
     session: Session,
-    skip: int = 0,
     limit: int = 100,
+    after: Optional[tuple[str, UUID]] = None,
+    name_prefix: Optional[str] = None,
 ):
-    """Retrieve heroes from the database with pagination."""
-    statement = select(Hero).offset(skip).limit(limit)
+    """Retrieve a page of heroes ordered by name and id.
+
+    Pages continue after the (name, id) key of the previous page's last
+    hero instead of skipping rows with an offset, so a deep page costs as
+    much as the first one.
+
+    Args:
+        session: Database session.
+        limit: Maximum number of heroes to return.
+        after: Name and id of the hero preceding the page, if any.
+        name_prefix: Only return heroes whose name starts with this.
+    """
+    statement = _page(select(Hero), limit, after, name_prefix)
 
     return session.exec(statement).all()
+
+
+def get_hero_rows(
+    session: Session,
+    limit: int = 100,
+    after: Optional[tuple[str, UUID]] = None,
+    name_prefix: Optional[str] = None,
+) -> list[tuple[UUID, str]]:
+    """Retrieve a page of heroes like `get_heroes`, as (id, name) tuples.
+
+    Skips building a model object per hero, for callers that only
+    serialize the rows.
+    """
+    statement = _page(select(Hero.id, Hero.name), limit, after, name_prefix)
+
+    return [tuple(row) for row in session.exec(statement)]
+
+
+def get_hero_row(session: Session, hero_id: UUID) -> Optional[tuple[UUID, str]]:
+    """Retrieve the (id, name) tuple of a hero, None if there is none."""
+    row = session.exec(
+        select(Hero.id, Hero.name).where(Hero.id == hero_id)
+    ).first()
+    return None if row is None else tuple(row)
+
+
+def get_hero_rows_since(
+    session: Session, rowid: int, limit: int = 10_000
+) -> list[tuple[int, UUID, str]]:
+    """Retrieve (rowid, id, name) tuples of heroes from a DuckDB rowid on.
+
+    Heroes are never deleted, and DuckDB numbers appended rows when their
+    transaction commits, so rowids only grow: the heroes from the rowid
+    after the last one seen are exactly those committed since.
+    """
+    row_id = literal_column("rowid")
+    statement = (
+        select(row_id, Hero.id, Hero.name)
+        .where(row_id >= rowid)
+        .order_by(row_id)
+        .limit(limit)
+    )
+
+    return [tuple(row) for row in session.exec(statement)]
+
+
+def _page(
+    statement: _SelectT,
+    limit: int,
+    after: Optional[tuple[str, UUID]],
+    name_prefix: Optional[str],
+) -> _SelectT:
+    """Restrict a hero query to one page ordered by name and id."""
+    statement = statement.order_by(Hero.name, Hero.id).limit(limit)
+    if name_prefix:
+        statement = statement.where(
+            Hero.name.startswith(name_prefix, autoescape=True)
+        )
+    if after is not None:
+        name, hero_id = after
+        statement = statement.where(
+            or_(Hero.name > name, and_(Hero.name == name, Hero.id > hero_id))
+        )
+    return statement
+
+
+def export_heroes_ndjson(
+    connection: DuckDBPyConnection, batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[bytes]:
+    """Yield all heroes as NDJSON, one chunk per batch of rows.
+
+    DuckDB renders each row as JSON, so no model objects are built.
+    """
+    cursor = connection.execute(
+        f"SELECT json_object('id', id, 'name', name) FROM {Hero.__tablename__}"
+    )
+    while rows := cursor.fetchmany(batch_rows):
+        yield "".join(f"{row}\n" for (row,) in rows).encode()
+
+
+def export_heroes_arrow(
+    connection: DuckDBPyConnection, batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[bytes]:
+    """Yield all heroes as an Arrow IPC stream, one chunk per record batch.
+
+    Requires pyarrow.
+    """
+    import pyarrow as pa  # noqa: PLC0415
+
+    reader = connection.execute(
+        f"SELECT id, name FROM {Hero.__tablename__}"
+    ).fetch_record_batch(batch_rows)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    # End of stream marker
+    yield _drain(sink)
+
+
+def export_heroes_parquet(
+    connection: DuckDBPyConnection, batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[bytes]:
+    """Yield all heroes as a Parquet file.
+
+    Parquet keeps its metadata at the end of the file, so DuckDB writes
+    the file to a temporary location first, one row group at a time, and
+    it is then read back in chunks.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "heroes.parquet")
+        connection.execute(
+            f"COPY (SELECT id, name FROM {Hero.__tablename__}) "
+            f"TO '{path}' (FORMAT PARQUET, ROW_GROUP_SIZE {batch_rows})"
+        )
+        with open(path, "rb") as file:
+            while chunk := file.read(_EXPORT_READ_BYTES):
+                yield chunk
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """Return and clear the bytes written to a buffer."""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
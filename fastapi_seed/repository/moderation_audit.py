@@ -0,0 +1,108 @@
+"""Moderation audit log repository module."""
+
+from datetime import datetime
+
+import numpy as np
+from sqlmodel import Session
+
+from fastapi_seed.models.moderation_audit import (
+    ModerationDecision,
+    ModerationScore,
+)
+
+# Percentiles of category scores reported per time bucket
+SCORE_PERCENTILES = (0.5, 0.9, 0.99)
+
+# Names under which a batch's columns are visible to DuckDB
+_DECISIONS_VIEW = "audit_decisions"
+_SCORES_VIEW = "audit_scores"
+
+
+def insert_decisions(
+    session: Session,
+    decisions: dict[str, np.ndarray],
+    scores: dict[str, np.ndarray],
+) -> None:
+    """Insert audited decisions with one statement per table.
+
+    Does not commit, so that a batch's decisions and scores are committed
+    together.
+
+    Args:
+        session: Database session whose transaction the rows join.
+        decisions: Columns of `ModerationDecision`, with ids as strings
+            and times as datetime64.
+        scores: Columns of `ModerationScore`, likewise.
+    """
+    connection = session.connection().connection.driver_connection
+    # Registered NumPy columns are scanned directly, like hero inserts
+    connection.register(_DECISIONS_VIEW, decisions)
+    connection.register(_SCORES_VIEW, scores)
+    try:
+        connection.execute(
+            f"INSERT INTO {ModerationDecision.__tablename__} "
+            "(id, created_at, model, text_sha256, text_length, flagged, "
+            "category, score) "
+            "SELECT CAST(id AS UUID), created_at, model, text_sha256, "
+            f"text_length, flagged, category, score FROM {_DECISIONS_VIEW}"
+        )
+        connection.execute(
+            f"INSERT INTO {ModerationScore.__tablename__} "
+            "(decision_id, category, created_at, score) "
+            "SELECT CAST(decision_id AS UUID), category, created_at, score "
+            f"FROM {_SCORES_VIEW}"
+        )
+    finally:
+        connection.unregister(_DECISIONS_VIEW)
+        connection.unregister(_SCORES_VIEW)
+
+
+def count_decisions(
+    session: Session, bucket_seconds: int, since: datetime, until: datetime
+) -> list[tuple[datetime, int, int]]:
+    """Count decisions and flagged decisions per time bucket in DuckDB.
+
+    Args:
+        session: Database session.
+        bucket_seconds: Width of the time buckets.
+        since: Start of the time range, inclusive, in UTC.
+        until: End of the time range, exclusive, in UTC.
+
+    Returns:
+        (bucket start, decisions, flagged decisions) tuples, by time.
+    """
+    connection = session.connection().connection.driver_connection
+    return connection.execute(
+        "SELECT time_bucket(to_seconds(?), created_at) AS bucket, "
+        "count(*), count(*) FILTER (WHERE flagged) "
+        f"FROM {ModerationDecision.__tablename__} "
+        "WHERE created_at >= ? AND created_at < ? "
+        "GROUP BY bucket ORDER BY bucket",
+        [bucket_seconds, since, until],
+    ).fetchall()
+
+
+def score_stats(
+    session: Session, bucket_seconds: int, since: datetime, until: datetime
+) -> list[tuple[datetime, str, float, list[float]]]:
+    """Compute the score distribution per time bucket and category in DuckDB.
+
+    Args:
+        session: Database session.
+        bucket_seconds: Width of the time buckets.
+        since: Start of the time range, inclusive, in UTC.
+        until: End of the time range, exclusive, in UTC.
+
+    Returns:
+        (bucket start, category, mean, `SCORE_PERCENTILES`) tuples, by
+        time and category.
+    """
+    connection = session.connection().connection.driver_connection
+    return connection.execute(
+        "SELECT time_bucket(to_seconds(?), created_at) AS bucket, category, "
+        "avg(score), quantile_cont(score, ?) "
+        f"FROM {ModerationScore.__tablename__} "
+        "WHERE created_at >= ? AND created_at < ? "
+        "GROUP BY bucket, category ORDER BY bucket, category",
+        [bucket_seconds, list(SCORE_PERCENTILES), since, until],
+    ).fetchall()
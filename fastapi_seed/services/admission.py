@@ -0,0 +1,64 @@
+"""Priorities and deadlines of moderation requests."""
+
+from __future__ import annotations
+
+import math
+import time
+from enum import IntEnum
+
+# Request headers clients set them with
+PRIORITY_HEADER = "X-Priority"
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+
+class Priority(IntEnum):
+    """Priority class of a request, lower values are served first.
+
+    When the moderation queue fills up, lower classes are rejected first,
+    so that interactive traffic keeps being served while bulk traffic backs
+    off.
+    """
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+def parse_priority(value: str | None) -> Priority:
+    """Return the priority named by a header value, NORMAL if unset.
+
+    Raises:
+        ValueError: If the value names no priority.
+    """
+    if value is None:
+        return Priority.NORMAL
+    try:
+        return Priority[value.strip().upper()]
+    except KeyError:
+        names = ", ".join(priority.name.lower() for priority in Priority)
+        raise ValueError(
+            f"Invalid priority {value!r}, expected one of {names}"
+        ) from None
+
+
+def parse_deadline(value: str | None) -> float | None:
+    """Return the deadline of a timeout header value, None if unset.
+
+    Args:
+        value: Milliseconds the client waits for the response.
+
+    Returns:
+        `time.monotonic()` time after which the response is useless.
+
+    Raises:
+        ValueError: If the value is not a positive number.
+    """
+    if value is None:
+        return None
+    try:
+        timeout_ms = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid timeout {value!r}") from None
+    if not math.isfinite(timeout_ms) or timeout_ms <= 0:
+        raise ValueError(f"Timeout must be positive, got {value!r}")
+    return time.monotonic() + timeout_ms / 1000
@@ -0,0 +1,349 @@
+"""Micro-batching scheduler for model inference."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from typing import Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised for items whose deadline passed before their batch ran."""
+
+
+@dataclass(order=True)
+class _PendingItem(Generic[ItemT, ResultT]):
+    """Item waiting in the scheduler queue, ordered by priority."""
+
+    priority: int
+    seq: int
+    item: ItemT = field(compare=False)
+    future: Future[ResultT] = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    deadline: float | None = field(compare=False)
+
+    def expired(self, now: float) -> bool:
+        """Whether the item's deadline passed at `now`."""
+        return self.deadline is not None and self.deadline <= now
+
+
+class BatchScheduler(Generic[ItemT, ResultT]):
+    """Collects concurrently submitted items and processes them in batches.
+
+    A batch is flushed as soon as either `max_batch_size` items are queued or
+    the oldest queued item has waited `max_wait_ms`. The batch function is
+    called from a single worker thread and must return one result per item,
+    in order.
+
+    The batch function may instead hand the batch off to an executor and
+    return a future of the results. The worker thread then goes on
+    collecting the next batch, with at most `max_concurrent_batches`
+    batches in flight, and the futures of the items are resolved when the
+    batch completes.
+
+    Items are batched by ascending priority, and in submission order
+    within a priority. Items whose deadline passes while they are queued
+    are dropped before reaching the batch function, and their futures fail
+    with `DeadlineExceededError`, so no work is spent on results nobody
+    waits for anymore.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[
+            [list[ItemT]], list[ResultT] | Future[list[ResultT]]
+        ],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = "batch-scheduler",
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            batch_fn: Function processing a list of items into a list of
+                results of the same length, or into a future of it.
+            max_batch_size: Maximum number of items per batch.
+            max_wait_ms: Maximum time the first item of a batch waits for
+                more items to arrive.
+            name: Name of the worker thread.
+            max_concurrent_batches: Maximum number of batches whose
+                futures are pending at the same time.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+        if max_concurrent_batches < 1:
+            raise ValueError("max_concurrent_batches must be at least 1")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queue: queue.PriorityQueue[_PendingItem[ItemT, ResultT]] = (
+            queue.PriorityQueue()
+        )
+        self._seq = itertools.count()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_concurrent_batches)
+
+        # Statistics, only written by the worker thread
+        self._batches = 0
+        self._items = 0
+        self._max_observed_batch = 0
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._expired = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the worker thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the worker thread if it is not running yet."""
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+            logger.info(
+                "%s started (max_batch_size=%d, max_wait_ms=%.1f)",
+                self.name,
+                self.max_batch_size,
+                self.max_wait_ms,
+            )
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Stop the worker thread after draining queued items.
+
+        Args:
+            timeout: Seconds to wait for the worker thread to finish.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop_event.set()
+            thread.join(timeout)
+            self._thread = None
+
+    def submit(
+        self, item: ItemT, priority: int = 0, deadline: float | None = None
+    ) -> Future[ResultT]:
+        """Queue an item and return a future resolving to its result.
+
+        Args:
+            item: Item to process.
+            priority: Items with lower values are batched first.
+            deadline: `time.monotonic()` time after which the item is
+                dropped instead of processed, or None to always process it.
+
+        Returns:
+            Future resolved with the result once the item's batch ran.
+
+        Raises:
+            RuntimeError: If the scheduler is not running.
+        """
+        if not self.running:
+            raise RuntimeError(f"{self.name} is not running")
+
+        future: Future[ResultT] = Future()
+        self._queue.put(
+            _PendingItem(
+                priority,
+                next(self._seq),
+                item,
+                future,
+                time.perf_counter(),
+                deadline,
+            )
+        )
+        return future
+
+    def queue_depth(self) -> int:
+        """Return the approximate number of items waiting for a batch."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """Return batching statistics for tuning batch size and wait time."""
+        batches = self._batches
+        items = self._items
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queue_depth(),
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": items / batches if batches else 0.0,
+            "max_observed_batch_size": self._max_observed_batch,
+            "avg_queue_wait_ms": (
+                self._total_queue_wait / items * 1000 if items else 0.0
+            ),
+            "max_queue_wait_ms": self._max_queue_wait * 1000,
+            "expired": self._expired,
+        }
+
+    def _collect_batch(self) -> list[_PendingItem[ItemT, ResultT]]:
+        """Block until a batch is ready and return it.
+
+        Expired items are dropped while collecting, so that they do not
+        take the place of live ones. Returns an empty list if the
+        scheduler is stopping and the queue is empty.
+        """
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return []
+                continue
+            if not self._drop_expired(first):
+                break
+
+        batch = [first]
+        flush_at = first.enqueued_at + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = flush_at - time.perf_counter()
+            try:
+                if remaining > 0:
+                    pending = self._queue.get(timeout=remaining)
+                else:
+                    # Wait time passed: only take what is already queued
+                    pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not self._drop_expired(pending):
+                batch.append(pending)
+        return batch
+
+    def _drop_expired(self, pending: _PendingItem[ItemT, ResultT]) -> bool:
+        """Fail an item's future if its deadline passed.
+
+        Returns:
+            Whether the item was dropped.
+        """
+        if not pending.expired(time.monotonic()):
+            return False
+        if pending.future.set_running_or_notify_cancel():
+            pending.future.set_exception(
+                DeadlineExceededError("Deadline passed while queued")
+            )
+            self._expired += 1
+        return True
+
+    def _run(self) -> None:
+        """Worker loop flushing batches until stopped."""
+        while True:
+            # Items keep queueing up while all batch slots are busy
+            self._slots.acquire()
+            batch = self._collect_batch()
+            if not batch:
+                self._slots.release()
+                break
+            self._process(batch)
+
+        # Wait for the batches still in flight
+        for _ in range(self.max_concurrent_batches):
+            self._slots.acquire()
+        for _ in range(self.max_concurrent_batches):
+            self._slots.release()
+
+    def _process(self, batch: list[_PendingItem[ItemT, ResultT]]) -> None:
+        """Run the batch function and resolve the futures of a batch.
+
+        Items whose future was cancelled while queued, or whose deadline
+        passed while waiting for a batch slot, are dropped from the batch,
+        and futures of items still running can no longer be cancelled.
+        """
+        batch = [
+            pending
+            for pending in batch
+            if not self._drop_expired(pending)
+            and pending.future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            self._slots.release()
+            return
+
+        started = time.perf_counter()
+        for pending in batch:
+            wait = started - pending.enqueued_at
+            self._total_queue_wait += wait
+            self._max_queue_wait = max(self._max_queue_wait, wait)
+        self._batches += 1
+        self._items += len(batch)
+        self._max_observed_batch = max(self._max_observed_batch, len(batch))
+
+        try:
+            results = self.batch_fn([pending.item for pending in batch])
+        except Exception as e:
+            self._resolve(batch, None, e)
+            return
+
+        if isinstance(results, Future):
+            results.add_done_callback(
+                lambda done: self._resolve_future(batch, done)
+            )
+        else:
+            self._resolve(batch, results, None)
+
+    def _resolve_future(
+        self,
+        batch: list[_PendingItem[ItemT, ResultT]],
+        done: Future[list[ResultT]],
+    ) -> None:
+        """Resolve the futures of a batch from its dispatched future."""
+        if done.cancelled():
+            self._resolve(batch, None, CancelledError())
+        elif (error := done.exception()) is not None:
+            self._resolve(batch, None, error)
+        else:
+            self._resolve(batch, done.result(), None)
+
+    def _resolve(
+        self,
+        batch: list[_PendingItem[ItemT, ResultT]],
+        results: list[ResultT] | None,
+        error: BaseException | None,
+    ) -> None:
+        """Resolve the futures of a batch and free its batch slot."""
+        try:
+            if results is not None and len(results) != len(batch):
+                error = RuntimeError(
+                    f"Batch function returned {len(results)} results "
+                    f"for {len(batch)} items"
+                )
+            if error is not None:
+                logger.error(
+                    "%s: batch of %d failed",
+                    self.name,
+                    len(batch),
+                    exc_info=error,
+                )
+                for pending in batch:
+                    pending.future.set_exception(error)
+                return
+
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+        finally:
+            self._slots.release()
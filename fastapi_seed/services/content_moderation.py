@@ -1,12 +1,31 @@
+import asyncio
 import logging
 import time
 from collections import deque
-from threading import Lock
-from typing import Dict, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Event, Lock, Thread
+from typing import Callable, ClassVar, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import torch
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
+from fastapi_seed.services.admission import Priority
+from fastapi_seed.services.batching import BatchScheduler, DeadlineExceededError
+from fastapi_seed.services.inference_backends import create_backend
+from fastapi_seed.services.inference_executor import InferenceExecutor
+from fastapi_seed.services.metrics import REGISTRY, SIZE_BUCKETS, TOKEN_BUCKETS
+from fastapi_seed.services.moderation_audit import MODERATION_AUDIT
+from fastapi_seed.services.moderation_cache import (
+    CacheSettings,
+    ModerationCache,
+)
+from fastapi_seed.services.moderation_cascade import (
+    CascadeSettings,
+    ModerationCascade,
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,13 +33,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+STAGE_SECONDS = REGISTRY.histogram(
+    "moderation_stage_seconds",
+    "Time spent in each stage of moderation inference.",
+    ("stage",),
+)
+TOKENIZE_SECONDS = STAGE_SECONDS.labels("tokenize")
+FORWARD_SECONDS = STAGE_SECONDS.labels("forward")
+POSTPROCESS_SECONDS = STAGE_SECONDS.labels("postprocess")
+BATCH_ROWS = REGISTRY.histogram(
+    "moderation_batch_rows",
+    "Texts or windows per forward pass.",
+    buckets=SIZE_BUCKETS,
+)
+TOKEN_LENGTH = REGISTRY.histogram(
+    "moderation_token_length",
+    "Tokens per text or window in a forward pass, without padding.",
+    buckets=TOKEN_BUCKETS,
+)
+
+
+@dataclass(frozen=True)
+class ModerationSettings:
+    """Model and inference settings of the moderation service.
+
+    Attributes:
+        model_name: Hugging Face model name or local path.
+        revision: Model revision to load, the default branch if None.
+        model_cache_dir: Directory the model is downloaded to and loaded
+            from, the Hugging Face default cache if None.
+        warmup_lengths: Token lengths of the forward passes run before the
+            service reports ready.
+        max_batch_size: Maximum number of texts per inference batch.
+        max_wait_ms: Maximum time a text waits for a batch to fill up.
+        inference_workers: Number of threads running forward passes.
+        max_pending: Maximum number of moderation requests in flight before
+            new ones are rejected.
+        priority_shares: Fraction of `max_pending` that requests of each
+            `Priority` may fill, from HIGH to LOW. Lower priorities are
+            rejected first as the queue fills up.
+        cache: Result cache settings, None disables the result cache.
+        cascade: Cheap first stage answering obvious texts without the
+            model, None runs every text through the model.
+        backend: Inference backend, one of `inference_backends.BACKENDS`.
+            Use `fastapi_seed.tools.check_backends` to pick the fastest
+            backend within accuracy tolerance.
+        long_text: Score texts longer than the model's maximum length in
+            overlapping windows instead of truncating them.
+        window_stride: Number of tokens shared by consecutive windows.
+        window_reducer: How window scores are combined per category, "max",
+            "mean" or a numpy-style reducer taking `axis`.
+        max_windows_per_pass: Maximum number of windows in one forward pass
+            of a scheduler batch, bounding its memory use however long the
+            texts are.
+    """
+
+    model_name: str = "KoalaAI/Text-Moderation"
+    revision: Optional[str] = None
+    model_cache_dir: Optional[str] = None
+    warmup_lengths: Tuple[int, ...] = (16, 128, 512)
+    max_batch_size: int = 16
+    max_wait_ms: float = 5.0
+    inference_workers: int = 1
+    max_pending: int = 256
+    priority_shares: Tuple[float, ...] = (1.0, 0.8, 0.5)
+    cache: Optional[CacheSettings] = field(default_factory=CacheSettings)
+    cascade: Optional[CascadeSettings] = None
+    backend: str = "eager"
+    long_text: bool = False
+    window_stride: int = 128
+    window_reducer: Union[str, Callable[..., np.ndarray]] = "max"
+    max_windows_per_pass: int = 64
+
 
 class ContentModerationService:
     _instance: Optional["ContentModerationService"] = None
     _initialized: bool = False
 
+    # Set once the model is loaded and warmed up
+    _ready: ClassVar[Event] = Event()
+    _load_error: ClassVar[Optional[BaseException]] = None
+
     # Mapping of model labels to human-readable categories
-    CATEGORY_MAPPING = {
+    CATEGORY_MAPPING: ClassVar[Dict[str, str]] = {
         "H": "Hate Speech",
         "H2": "Hate Speech (Severe)",
         "HR": "Hate Speech (Racial)",
@@ -32,28 +127,225 @@ class ContentModerationService:
         "V2": "Violence (Severe)"
     }
 
+    # Maximum number of tokens the model sees at once
+    MAX_LENGTH = 512
+
+    # Reducers combining the scores of a long text's windows
+    WINDOW_REDUCERS: ClassVar[Dict[str, Callable[..., np.ndarray]]] = {
+        "max": np.max,
+        "mean": np.mean,
+    }
+
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, model_name: str = "KoalaAI/Text-Moderation"):
+    def __init__(self, settings: Optional[ModerationSettings] = None):
+        """Load the model and start the inference subsystems once.
+
+        Args:
+            settings: Model and inference settings, the defaults if None.
+        """
         if not self._initialized:
-            self.model_name = model_name
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            settings = settings or ModerationSettings()
+            self.settings = settings
+            self.model_name = settings.model_name
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                settings.model_name,
+                revision=settings.revision,
+                cache_dir=settings.model_cache_dir,
+            )
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                settings.model_name,
+                revision=settings.revision,
+                cache_dir=settings.model_cache_dir,
+            )
             self.model.eval()  # Set to evaluation mode
+            self.id2label = self.model.config.id2label
+            model_revision = (
+                settings.revision
+                or getattr(self.model.config, "_commit_hash", None)
+                or "local"
+            )
+
+            # Optimized execution of the model, traced on a padded example
+            self.backend_name = settings.backend
+            self.backend = create_backend(
+                settings.backend,
+                self.model,
+                self.tokenizer(
+                    ["warm up", "warm up the inference backend"],
+                    return_tensors="pt",
+                    padding=True,
+                ),
+            )
+            # Quantized and traced backends replace the float32 weights
+            self.model = self.backend.model
+
+            # Long texts are scored in overlapping windows of MAX_LENGTH tokens
+            self.long_text = settings.long_text
+            self.window_stride = settings.window_stride
+            self.max_windows_per_pass = settings.max_windows_per_pass
+            self.window_reducer = self.WINDOW_REDUCERS.get(
+                settings.window_reducer, settings.window_reducer
+            )
+            if not callable(self.window_reducer):
+                raise ValueError(
+                    f"Unknown window reducer: {settings.window_reducer!r}"
+                )
+            scoring = settings.backend
+            if settings.long_text:
+                scoring += (
+                    f":window{settings.window_stride}-{settings.window_reducer}"
+                )
+
+            # Identical texts share results as long as the scoring is the same
+            self.cache: Optional[ModerationCache] = None
+            if settings.cache is not None:
+                self.cache = ModerationCache(
+                    settings.model_name,
+                    f"{model_revision}:{scoring}",
+                    settings.cache,
+                )
+
+            # Obvious texts are answered without the model; its results are
+            # never cached, so that cache hits are always the model's
+            self.cascade: Optional[ModerationCascade] = None
+            if settings.cascade is not None:
+                self.cascade = ModerationCascade.load(settings.cascade)
+                if set(self.cascade.categories) != set(self.categories):
+                    raise ValueError(
+                        f"Cascade categories {self.cascade.categories} do "
+                        f"not match the model's {self.categories}"
+                    )
 
             # Request tracking
             self.request_times = deque(maxlen=1000)  # Store last 1000 requests
             self.lock = Lock()
+
+            # Forward passes only ever run on the dedicated inference threads
+            self.executor = InferenceExecutor(
+                max_workers=settings.inference_workers,
+                max_pending=settings.max_pending,
+            )
+            if len(settings.priority_shares) != len(Priority):
+                raise ValueError(
+                    f"Expected {len(Priority)} priority shares, "
+                    f"got {len(settings.priority_shares)}"
+                )
+            self.admission_limits = {
+                priority: max(1, int(settings.max_pending * share))
+                for priority, share in zip(Priority, settings.priority_shares)
+            }
+
+            # Concurrent moderate_text calls are grouped into padded batches,
+            # with one batch in flight per inference thread
+            self.scheduler: BatchScheduler[str, Dict[str, float]] = (
+                BatchScheduler(
+                    self._run_batch,
+                    max_batch_size=settings.max_batch_size,
+                    max_wait_ms=settings.max_wait_ms,
+                    name="moderation-batcher",
+                    max_concurrent_batches=settings.inference_workers,
+                )
+            )
+            self.scheduler.start()
+
             self._initialized = True
-            logger.info("ContentModerationService initialized with model: %s", model_name)
+            logger.info(
+                "ContentModerationService initialized with model: %s",
+                settings.model_name,
+            )
+
+    @classmethod
+    def initialize(
+        cls, settings: Optional[ModerationSettings] = None
+    ) -> "ContentModerationService":
+        """Initialize the service, download the model and warm it up."""
+        service = cls(settings)
+        service.warmup()
+        cls._ready.set()
+        return service
+
+    @classmethod
+    def initialize_in_background(
+        cls, settings: Optional[ModerationSettings] = None
+    ) -> Thread:
+        """Initialize the service on a background thread.
+
+        Use `is_ready` to check whether the model is loaded and warmed up,
+        and `load_error` to find out why loading failed.
+
+        Returns:
+            The started loader thread.
+        """
+
+        def load() -> None:
+            try:
+                cls.initialize(settings)
+            except Exception as e:
+                cls._load_error = e
+                logger.exception("Loading the moderation model failed")
+
+        thread = Thread(target=load, name="moderation-loader", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """Whether the model is loaded and warmed up."""
+        return cls._ready.is_set()
 
     @classmethod
-    def initialize(cls, model_name: str = "KoalaAI/Text-Moderation") -> "ContentModerationService":
-        """Initialize the service and download the model."""
-        return cls(model_name)
+    def load_error(cls) -> Optional[BaseException]:
+        """Return the error that stopped the model from loading, if any."""
+        return cls._load_error
+
+    def warmup(self) -> None:
+        """Run a forward pass at each of the configured warmup lengths.
+
+        The first passes at a new input shape are much slower than later
+        ones, so they should not be paid for by the first requests.
+        """
+        for length in self.settings.warmup_lengths:
+            started = time.perf_counter()
+            inputs = self.tokenizer(
+                ["warm up " * length],
+                return_tensors="pt",
+                truncation=True,
+                max_length=min(length, self.MAX_LENGTH),
+            )
+            self.executor.submit(self._forward, inputs).result()
+            logger.info(
+                "Warmup pass at %d tokens took %.1f ms",
+                length,
+                (time.perf_counter() - started) * 1000,
+            )
+
+    def shutdown(self) -> None:
+        """Flush queued texts and stop the inference threads."""
+        self.scheduler.stop()
+        self.executor.shutdown()
+
+    def stats(self) -> Dict[str, dict]:
+        """Return statistics of the batching scheduler and executor."""
+        return {
+            "batching": self.scheduler.stats(),
+            "executor": self.executor.stats(),
+            "cache": self.cache.stats() if self.cache is not None else {},
+            "cascade": (
+                self.cascade.stats() if self.cascade is not None else {}
+            ),
+        }
+
+    @property
+    def categories(self) -> List[str]:
+        """Categories of the scores, in the order of the model's labels."""
+        return [
+            self.CATEGORY_MAPPING.get(self.id2label[i], self.id2label[i])
+            for i in range(len(self.id2label))
+        ]
 
     def get_request_rate(self) -> float:
         """Calculate requests per second based on the last minute of requests."""
@@ -74,26 +366,287 @@ class ContentModerationService:
             return rate
 
     def moderate_text(self, text: str) -> Dict[str, float]:
-        """Process text through the moderation model and return category scores."""
+        """Process text through the moderation model and return category scores.
+
+        Concurrent calls are queued and run as one padded batch.
+        """
         # Track request
         with self.lock:
             self.request_times.append(time.time())
 
-        # Tokenize and prepare input
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        scores = self._screen(text)
+        if scores is not None:
+            return scores
+
+        scores = dict(self._submit_text(text).result())
+        MODERATION_AUDIT.record(self.model_name, text, scores)
+        return scores
+
+    async def moderate_text_async(
+        self,
+        text: str,
+        priority: Priority = Priority.NORMAL,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """Awaitable variant of `moderate_text` for use on the event loop.
+
+        Args:
+            text: Text to score.
+            priority: Priority class, which decides how full the queue may
+                be for the text to be admitted and when it is batched.
+            deadline: `time.monotonic()` time after which the caller no
+                longer waits. The text is dropped before inference if it is
+                still queued by then.
+
+        Raises:
+            InferenceOverloadedError: If too many requests of the priority
+                are in flight.
+            DeadlineExceededError: If the deadline passed before scoring.
+        """
+        with self.lock:
+            self.request_times.append(time.time())
+
+        # Cache hits never take an in-flight slot
+        if self.cache is not None:
+            cached = self.cache.get(self.cache.key(text), record_miss=False)
+            if cached is not None:
+                MODERATION_AUDIT.record(self.model_name, text, cached)
+                return cached
+
+        # Screened texts never take an in-flight slot either
+        scores = self._screen(text)
+        if scores is not None:
+            return scores
+
+        if deadline is not None and deadline <= time.monotonic():
+            raise DeadlineExceededError("Deadline passed before queueing")
+
+        # A cancelled caller must not cancel a batch item other callers
+        # may be sharing through the cache
+        with self.executor.admit(self.admission_limits[priority]):
+            while True:
+                future = asyncio.wrap_future(
+                    self._submit_text(text, priority, deadline)
+                )
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                try:
+                    scores = dict(
+                        await asyncio.wait_for(asyncio.shield(future), timeout)
+                    )
+                    MODERATION_AUDIT.record(self.model_name, text, scores)
+                    return scores
+                except DeadlineExceededError:
+                    # The text was in flight for a caller with an earlier
+                    # deadline, queue it again with this one
+                    if deadline is not None and deadline <= time.monotonic():
+                        raise
+                except TimeoutError as e:
+                    # Only this caller's future: a queued item is dropped,
+                    # one shared through the cache is left to its callers
+                    future.cancel()
+                    raise DeadlineExceededError(
+                        "Deadline passed while queued"
+                    ) from e
+
+    def _screen(self, text: str) -> Optional[Dict[str, float]]:
+        """Return the cascade's scores of an obvious text, else None."""
+        if self.cascade is None:
+            return None
+        scores = self.cascade.screen(text)
+        if scores is not None:
+            MODERATION_AUDIT.record(self.cascade.name, text, scores)
+        return scores
+
+    def _submit_text(
+        self,
+        text: str,
+        priority: Priority = Priority.NORMAL,
+        deadline: Optional[float] = None,
+    ) -> Future[Dict[str, float]]:
+        """Queue a text for batching, sharing cached and in-flight results."""
+        if self.cache is None:
+            return self.scheduler.submit(text, priority, deadline)
+        return self.cache.get_or_compute(
+            self.cache.key(text),
+            lambda: self.scheduler.submit(text, priority, deadline),
+        )
+
+    def _run_batch(self, texts: List[str]) -> Future[List[Dict[str, float]]]:
+        """Dispatch a batch from the scheduler to the inference threads."""
+        return self.executor.submit(self.moderate_batch, texts)
+
+    def moderate_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Run a list of texts through the model in a single forward pass.
+
+        In long-text mode a batch may hold any number of windows, so they
+        are run in forward passes of at most `max_windows_per_pass` windows
+        of similar length instead.
+        """
+        if self.long_text:
+            return self._run_bucketed(texts, self.max_windows_per_pass)
+
+        # Tokenize and pad to the longest text of the batch
+        encodings, owners = self._tokenize(texts, padding=True)
 
-        # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            scores = torch.sigmoid(outputs.logits).squeeze().numpy()
+        scores = self._forward(encodings)
+        return self._reduce_windows(scores, owners, len(texts))
 
+    def moderate_texts(
+        self, texts: List[str], batch_size: int = 32
+    ) -> List[Dict[str, float]]:
+        """Moderate many texts at once and return their scores in order.
+
+        Cached texts are served from the cache, obvious texts by the
+        cascade, and only the rest are run through the model.
+
+        Args:
+            texts: Texts to moderate.
+            batch_size: Maximum number of texts per forward pass.
+        """
+        if self.cache is None and self.cascade is None:
+            results = self._run_bucketed(texts, batch_size)
+            MODERATION_AUDIT.record_many(self.model_name, texts, results)
+            return results
+
+        results: List[Optional[Dict[str, float]]] = [None] * len(texts)
+        if self.cache is not None:
+            keys = [self.cache.key(text) for text in texts]
+            results = [self.cache.get(key) for key in keys]
+        screened = set()
+        if self.cascade is not None:
+            for i, text in enumerate(texts):
+                if results[i] is None:
+                    results[i] = self._screen(text)
+                    if results[i] is not None:
+                        screened.add(i)
+        missing = [i for i, scores in enumerate(results) if scores is None]
+        if missing:
+            computed = self._run_bucketed(
+                [texts[i] for i in missing], batch_size
+            )
+            for i, scores in zip(missing, computed):
+                if self.cache is not None:
+                    self.cache.put(keys[i], scores)
+                results[i] = scores
+        # Screened texts are recorded under the cascade's name
+        scored = [i for i in range(len(texts)) if i not in screened]
+        MODERATION_AUDIT.record_many(
+            self.model_name,
+            [texts[i] for i in scored],
+            [results[i] for i in scored],
+        )
+        return results
+
+    def _run_bucketed(
+        self, texts: List[str], batch_size: int
+    ) -> List[Dict[str, float]]:
+        """Run texts through the model in batches of similar token length.
+
+        Texts are tokenized once, sorted by token length and split into
+        batches, so short texts are not padded to the longest text of the
+        whole request.
+        """
+        encodings, owners = self._tokenize(texts, padding=False)
+        keys = list(encodings.keys())
+        input_ids = encodings["input_ids"]
+        order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+
+        scores = np.empty(
+            (len(input_ids), len(self.id2label)), dtype=np.float32
+        )
+        for start in range(0, len(order), batch_size):
+            bucket = order[start : start + batch_size]
+            with TOKENIZE_SECONDS.time():
+                inputs = self.tokenizer.pad(
+                    {key: [encodings[key][i] for i in bucket] for key in keys},
+                    return_tensors="pt",
+                )
+            scores[bucket] = self._forward(inputs)
+
+        return self._reduce_windows(scores, owners, len(texts))
+
+    def _tokenize(self, texts: List[str], padding: bool):
+        """Tokenize texts, splitting long texts into windows in long-text mode.
+
+        Returns:
+            Tokenizer encodings with one row per window and, for every row,
+            the index of the text it belongs to.
+        """
+        with TOKENIZE_SECONDS.time():
+            if not self.long_text:
+                encodings = self.tokenizer(
+                    texts,
+                    return_tensors="pt" if padding else None,
+                    padding=padding,
+                    truncation=True,
+                    max_length=self.MAX_LENGTH,
+                )
+                return encodings, np.arange(len(texts))
+
+            encodings = self.tokenizer(
+                texts,
+                return_tensors="pt" if padding else None,
+                padding=padding,
+                truncation=True,
+                max_length=self.MAX_LENGTH,
+                stride=self.window_stride,
+                return_overflowing_tokens=True,
+            )
+            owners = np.asarray(encodings.pop("overflow_to_sample_mapping"))
+            return encodings, owners
+
+    def _reduce_windows(
+        self, scores: np.ndarray, owners: np.ndarray, count: int
+    ) -> List[Dict[str, float]]:
+        """Aggregate window scores into one score dict per text."""
+        with POSTPROCESS_SECONDS.time():
+            if len(scores) == count:
+                return [self._scores_to_dict(row) for row in scores]
+
+            # Windows of the same text are contiguous and in text order
+            bounds = np.searchsorted(owners, np.arange(count + 1))
+            return [
+                self._scores_to_dict(
+                    self.window_reducer(
+                        scores[bounds[i] : bounds[i + 1]], axis=0
+                    )
+                )
+                for i in range(count)
+            ]
+
+    async def moderate_texts_async(
+        self, texts: List[str], batch_size: int = 32
+    ) -> List[Dict[str, float]]:
+        """Awaitable variant of `moderate_texts` for use on the event loop.
+
+        Raises:
+            InferenceOverloadedError: If too many requests are in flight.
+        """
+        with self.executor.admit():
+            with self.lock:
+                self.request_times.append(time.time())
+
+            return await asyncio.wrap_future(
+                self.executor.submit(self.moderate_texts, texts, batch_size)
+            )
+
+    def _forward(self, inputs) -> np.ndarray:
+        """Run tokenized inputs through the backend and return label scores."""
+        with FORWARD_SECONDS.time():
+            scores = torch.sigmoid(self.backend.logits(inputs)).numpy()
+        BATCH_ROWS.observe(len(scores))
+        TOKEN_LENGTH.observe_many(inputs["attention_mask"].sum(dim=1).tolist())
+        return scores
+
+    def _scores_to_dict(self, scores) -> Dict[str, float]:
+        """Map a row of label scores to human-readable categories."""
         # Get category labels and map them to human-readable categories
-        labels = self.model.config.id2label
+        labels = self.id2label
 
         # Create result dictionary with mapped categories
-        result = {
+        return {
             self.CATEGORY_MAPPING.get(labels[i], labels[i]): float(score)
             for i, score in enumerate(scores)
         }
-
-        return result
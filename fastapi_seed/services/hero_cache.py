@@ -0,0 +1,144 @@
+"""Read-through cache of serialized hero reads."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from fastapi_seed.services.metrics import REGISTRY
+
+
+@dataclass(frozen=True)
+class HeroCacheSettings:
+    """Size and lifetime limits of the hero cache.
+
+    Attributes:
+        max_entries: Maximum number of cached pages and heroes.
+        ttl_seconds: Seconds after which an entry expires. Entries never
+            expire if None.
+    """
+
+    max_entries: int = 1024
+    ttl_seconds: float | None = 60.0
+
+
+class HeroCache:
+    """Bounded LRU/TTL cache of hero pages and heroes, as served.
+
+    Every write to the heroes table bumps a generation counter, which
+    drops all entries. Readers take the generation before querying the
+    database and store their result under it, so a result read before a
+    concurrent write commits is never cached after it.
+    """
+
+    def __init__(
+        self,
+        settings: HeroCacheSettings | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            settings: Size and lifetime limits, the defaults if None.
+            clock: Monotonic clock, replaceable in tests.
+        """
+        settings = settings or HeroCacheSettings()
+        if settings.max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = settings.max_entries
+        self.ttl_seconds = settings.ttl_seconds
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached entries, expired ones included."""
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        """Number of writes seen so far, to pass to `put`."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the cached value of a key, if present and fresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        """Cache a value read at a generation, unless a write came since.
+
+        Args:
+            key: Cache key.
+            value: Value to cache.
+            generation: `generation` taken before the value was read.
+        """
+        expires_at = (
+            self._clock() + self.ttl_seconds
+            if self.ttl_seconds is not None
+            else float("inf")
+        )
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop all entries after a write to the heroes table."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def hit_ratio(self) -> float:
+        """Return the share of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Return cache counters and size."""
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "generation": self._generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hit_ratio(),
+        }
+
+
+# Cache shared by the heroes routes and invalidated by the hero writer
+HERO_CACHE = HeroCache()
+
+REGISTRY.gauge(
+    "hero_cache_hit_ratio", "Share of hero reads served from the cache."
+).set_function(HERO_CACHE.hit_ratio)
+REGISTRY.gauge(
+    "hero_cache_entries", "Hero pages and heroes in the cache."
+).set_function(lambda: len(HERO_CACHE))
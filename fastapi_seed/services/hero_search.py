@@ -0,0 +1,323 @@
+"""In-process full-text and fuzzy search over hero names."""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+from array import array
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session
+
+from fastapi_seed.models.hero import HeroMatch
+from fastapi_seed.repository.heroes import get_hero_rows_since
+from fastapi_seed.services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Heroes read from the database and indexed at a time
+REFRESH_BATCH_ROWS = 10_000
+
+# Runs of letters and digits, in any script
+_TERM = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Return the lowercase terms of a name or query."""
+    return _TERM.findall(text.lower())
+
+
+def trigrams(term: str) -> set[str]:
+    """Return the trigrams of a term, padded to weigh its start."""
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class SearchSettings:
+    """Ranking of the hero search.
+
+    Attributes:
+        k1: BM25 term frequency saturation.
+        b: BM25 weight of name length normalization.
+        min_similarity: Minimum trigram similarity of fuzzy matches.
+    """
+
+    k1: float = 1.2
+    b: float = 0.75
+    min_similarity: float = 0.25
+
+
+class _Postings:
+    """Heroes containing a term, with the term's count in each."""
+
+    __slots__ = ("counts", "docs")
+
+    def __init__(self) -> None:
+        self.docs = array("i")
+        self.counts = array("I")
+
+
+def _top(
+    docs: np.ndarray, scores: np.ndarray, limit: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the best scored docs, by score and then by index order."""
+    if len(docs) > limit:
+        # Keep every doc tied with the last one kept, then sort only those
+        cutoff = np.partition(scores, len(scores) - limit)[-limit]
+        keep = scores >= cutoff
+        docs, scores = docs[keep], scores[keep]
+    order = np.lexsort((docs, -scores))[:limit]
+    return docs[order], scores[order]
+
+
+class HeroSearchIndex:
+    """Inverted index of hero names ranked by BM25, with a fuzzy fallback.
+
+    Names are split into terms, and a query ranks the heroes containing
+    its terms by BM25. When whole terms find fewer heroes than asked for,
+    the rest are filled with heroes sharing the most trigrams with the
+    query terms found in no name, so that partial and misspelled names
+    still match.
+
+    The index lives in memory as arrays of hero positions per term and
+    per trigram, scored with numpy. It is loaded from the heroes table by
+    the first `refresh`, and later refreshes only add the heroes committed
+    since. Heroes are added in batches, so searches are answered from the
+    heroes indexed so far while a refresh is loading.
+    """
+
+    def __init__(self, settings: SearchSettings | None = None) -> None:
+        """Initialize an empty index.
+
+        Args:
+            settings: Ranking settings, the defaults if None.
+        """
+        settings = settings or SearchSettings()
+        self.k1 = settings.k1
+        self.b = settings.b
+        self.min_similarity = settings.min_similarity
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._ids: list[UUID] = []
+        self._names: list[str] = []
+        # Number of terms and of distinct trigrams of each name
+        self._lengths = array("I")
+        self._trigram_counts = array("I")
+        self._total_length = 0
+        self._postings: dict[str, _Postings] = {}
+        self._trigram_postings: dict[str, array] = {}
+        self._next_rowid = 0
+
+    def __len__(self) -> int:
+        """Return the number of indexed heroes."""
+        return len(self._ids)
+
+    def refresh(
+        self,
+        session: Session,
+        blocking: bool = True,
+        batch_size: int = REFRESH_BATCH_ROWS,
+    ) -> int:
+        """Index the heroes committed since the last refresh.
+
+        Args:
+            session: Session to read new heroes with.
+            blocking: Wait for a running refresh to finish first. Otherwise
+                return at once, leaving new heroes to the running refresh.
+            batch_size: Number of heroes read and added at a time.
+
+        Returns:
+            Number of heroes added to the index.
+        """
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            added = 0
+            while True:
+                rows = get_hero_rows_since(
+                    session, self._next_rowid, batch_size
+                )
+                with self._lock:
+                    for _rowid, hero_id, name in rows:
+                        self._add(hero_id, name)
+                    if rows:
+                        self._next_rowid = rows[-1][0] + 1
+                added += len(rows)
+                if len(rows) < batch_size:
+                    return added
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(
+        self, read_session: Callable[[], AbstractContextManager[Session]]
+    ) -> threading.Thread:
+        """Load the index in a background thread, for startup.
+
+        Args:
+            read_session: Factory of read-only session contexts.
+
+        Returns:
+            The started thread.
+        """
+
+        def load() -> None:
+            try:
+                with read_session() as session:
+                    added = self.refresh(session)
+                logger.info("Hero search index loaded with %d heroes", added)
+            except Exception:
+                logger.exception("Failed to load the hero search index")
+
+        thread = threading.Thread(
+            target=load, name="hero-search-index", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def search(self, query: str, limit: int = 20) -> list[HeroMatch]:
+        """Return the heroes best matching a query, best first.
+
+        Args:
+            query: Words of a hero name, possibly partial or misspelled.
+            limit: Maximum number of heroes returned.
+        """
+        terms = tokenize(query)
+        if not terms or limit < 1:
+            return []
+
+        with self._lock:
+            if not self._ids:
+                return []
+            found, scores = self._bm25(terms)
+            docs, scores = _top(found, scores, limit)
+            matches = [
+                HeroMatch(id=self._ids[doc], name=self._names[doc], score=score)
+                for doc, score in zip(docs.tolist(), scores.tolist())
+            ]
+            if len(matches) < limit:
+                # Words of no name are likely misspelled or partial
+                unknown = [t for t in terms if t not in self._postings]
+                docs, scores = _top(
+                    *self._similar(unknown or terms, exclude=found),
+                    limit - len(matches),
+                )
+                matches.extend(
+                    HeroMatch(
+                        id=self._ids[doc],
+                        name=self._names[doc],
+                        score=score,
+                        fuzzy=True,
+                    )
+                    for doc, score in zip(docs.tolist(), scores.tolist())
+                )
+        return matches
+
+    def stats(self) -> dict:
+        """Return the size of the index."""
+        return {
+            "heroes": len(self),
+            "terms": len(self._postings),
+            "trigrams": len(self._trigram_postings),
+        }
+
+    def _add(self, hero_id: UUID, name: str) -> None:
+        """Index one hero."""
+        doc = len(self._ids)
+        self._ids.append(hero_id)
+        self._names.append(name)
+
+        terms = tokenize(name)
+        counts: dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(doc)
+            postings.counts.append(count)
+        self._lengths.append(len(terms))
+        self._total_length += len(terms)
+
+        name_trigrams = set().union(*map(trigrams, counts))
+        for trigram in name_trigrams:
+            docs = self._trigram_postings.get(trigram)
+            if docs is None:
+                docs = self._trigram_postings[trigram] = array("i")
+            docs.append(doc)
+        self._trigram_counts.append(len(name_trigrams))
+
+    def _bm25(self, terms: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return the heroes containing query terms and their BM25 scores."""
+        heroes = len(self._ids)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        average_length = max(self._total_length / heroes, 1.0)
+
+        docs_parts = []
+        score_parts = []
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings.docs, dtype=np.int32)
+            counts = np.frombuffer(postings.counts, dtype=np.uint32)
+            idf = math.log(1 + (heroes - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (
+                1 - self.b + self.b * lengths[docs] / average_length
+            )
+            docs_parts.append(docs)
+            score_parts.append(idf * counts * (self.k1 + 1) / (counts + norm))
+
+        if not docs_parts:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        # Copies, so that no view keeps the index arrays from growing
+        docs = np.concatenate(docs_parts)
+        scores = np.concatenate(score_parts)
+        if len(docs_parts) > 1:
+            docs, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        return docs, scores
+
+    def _similar(
+        self, terms: list[str], exclude: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return heroes sharing trigrams with query terms and how many.
+
+        Similarity is the Jaccard index of the trigram sets of the query
+        and of the name.
+        """
+        query_trigrams = set().union(*map(trigrams, terms))
+        parts = [
+            np.frombuffer(docs, dtype=np.int32)
+            for trigram in query_trigrams
+            if (docs := self._trigram_postings.get(trigram)) is not None
+        ]
+        if not parts:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+
+        shared = np.bincount(np.concatenate(parts), minlength=len(self._ids))
+        shared[exclude] = 0
+        docs = np.flatnonzero(shared)
+        shared = shared[docs]
+        name_trigrams = np.frombuffer(self._trigram_counts, dtype=np.uint32)
+        similarity = shared / (
+            len(query_trigrams) + name_trigrams[docs].astype(np.int64) - shared
+        )
+        keep = similarity >= self.min_similarity
+        return docs[keep], similarity[keep]
+
+
+# Index searched by the heroes routes
+HERO_SEARCH = HeroSearchIndex()
+
+REGISTRY.gauge(
+    "hero_search_documents", "Heroes in the name search index."
+).set_function(lambda: len(HERO_SEARCH))
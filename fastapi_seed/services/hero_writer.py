@@ -0,0 +1,121 @@
+"""Group commit of single hero creates."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import ClassVar
+
+from fastapi_seed.models.hero import Hero, HeroCreate
+from fastapi_seed.repository.database import DatabaseManager
+from fastapi_seed.repository.executor import DatabaseOverloadedError
+from fastapi_seed.repository.heroes import insert_heroes
+from fastapi_seed.services.batching import BatchScheduler
+from fastapi_seed.services.hero_cache import HERO_CACHE
+from fastapi_seed.services.metrics import REGISTRY, SIZE_BUCKETS
+
+WRITE_BATCH_ROWS = REGISTRY.histogram(
+    "hero_write_batch_rows",
+    "Heroes committed together by the hero writer.",
+    buckets=SIZE_BUCKETS,
+)
+
+
+@dataclass(frozen=True)
+class WriterSettings:
+    """Batching of the hero writer.
+
+    Attributes:
+        max_batch_size: Maximum number of heroes committed together.
+        max_wait_ms: Maximum time a hero waits for more to arrive.
+        max_pending: Maximum number of queued heroes before further ones
+            are rejected.
+    """
+
+    max_batch_size: int = 256
+    max_wait_ms: float = 2.0
+    max_pending: int = 4096
+
+
+class HeroWriter:
+    """Single writer committing concurrently created heroes together.
+
+    DuckDB allows one writer at a time, so committing every hero from its
+    own request serializes the requests on the database file. Instead,
+    heroes are queued and a single thread inserts each batch with one
+    statement in one transaction. A failed transaction fails every hero of
+    its batch.
+    """
+
+    _instance: ClassVar[HeroWriter | None] = None
+    _initialized: bool = False
+
+    def __new__(cls, *_args, **_kwargs):
+        """Return the process-wide writer."""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, settings: WriterSettings | None = None) -> None:
+        """Start the writer thread once.
+
+        Args:
+            settings: Batching settings, the defaults if None.
+        """
+        if self._initialized:
+            return
+
+        settings = settings or WriterSettings()
+        self.scheduler: BatchScheduler[HeroCreate, Hero] = BatchScheduler(
+            self._write,
+            max_batch_size=settings.max_batch_size,
+            max_wait_ms=settings.max_wait_ms,
+            name="hero-writer",
+        )
+        self.max_pending = settings.max_pending
+        self.rejected = 0
+        self.scheduler.start()
+        self._initialized = True
+
+    def submit(self, hero_create: HeroCreate) -> Future[Hero]:
+        """Queue a hero and return a future resolving once it is committed.
+
+        Raises:
+            DatabaseOverloadedError: If `max_pending` heroes are queued.
+        """
+        depth = self.scheduler.queue_depth()
+        if depth >= self.max_pending:
+            self.rejected += 1
+            raise DatabaseOverloadedError(f"{depth} heroes queued for writing")
+        return self.scheduler.submit(hero_create)
+
+    async def create_hero_async(self, hero_create: HeroCreate) -> Hero:
+        """Create a hero with the next group commit."""
+        return await asyncio.wrap_future(self.submit(hero_create))
+
+    def shutdown(self) -> None:
+        """Commit queued heroes and stop the writer thread."""
+        self.scheduler.stop()
+
+    def stats(self) -> dict:
+        """Return batching statistics of the writer."""
+        return {
+            **self.scheduler.stats(),
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    @staticmethod
+    def _write(hero_creates: list[HeroCreate]) -> list[Hero]:
+        """Insert a batch of heroes in one transaction."""
+        heroes = [Hero.model_validate(hero) for hero in hero_creates]
+        with DatabaseManager().session() as session:
+            insert_heroes(
+                session,
+                [hero.id for hero in heroes],
+                [hero.name for hero in heroes],
+            )
+        HERO_CACHE.invalidate()
+        WRITE_BATCH_ROWS.observe(len(heroes))
+        return heroes
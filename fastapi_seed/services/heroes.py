@@ -1,22 +1,410 @@
 """Heroes service module."""
 
+import asyncio
+import base64
+import json
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from importlib.util import find_spec
+from typing import Any, Callable, List, Optional, TypeVar
+from uuid import UUID
+
+from duckdb import DuckDBPyConnection
+from pydantic import TypeAdapter
+from pydantic_core import to_json
 from sqlmodel import Session
 
-from fastapi_seed.models.hero import Hero, HeroCreate, HeroRead
-from fastapi_seed.repository.heroes import create_hero, get_heroes
+from fastapi_seed.models.hero import (
+    Hero,
+    HeroCreate,
+    HeroMatch,
+    HeroPage,
+    HeroRead,
+)
+from fastapi_seed.repository.executor import DatabaseExecutor
+from fastapi_seed.repository.heroes import (
+    BULK_CHUNK_SIZE,
+    create_hero,
+    create_heroes,
+    export_heroes_arrow,
+    export_heroes_ndjson,
+    export_heroes_parquet,
+    get_hero_row,
+    get_hero_rows,
+    get_heroes,
+)
+from fastapi_seed.services.hero_cache import HeroCache
+from fastapi_seed.services.hero_search import HeroSearchIndex
+from fastapi_seed.services.hero_writer import HeroWriter
+
+_HERO_RECORDS = TypeAdapter(List[HeroRead])
+
+ResultT = TypeVar("ResultT")
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """Format heroes can be exported in.
+
+    Attributes:
+        media_type: Media type of the exported stream.
+        writer: Function yielding the stream from a DuckDB connection.
+        requires: Module the writer needs, if any.
+    """
+
+    media_type: str
+    writer: Callable[[DuckDBPyConnection], Iterator[bytes]]
+    requires: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether the module the writer needs is installed."""
+        return self.requires is None or find_spec(self.requires) is not None
+
+
+EXPORT_FORMATS = {
+    "ndjson": ExportFormat("application/x-ndjson", export_heroes_ndjson),
+    "parquet": ExportFormat(
+        "application/vnd.apache.parquet", export_heroes_parquet
+    ),
+    "arrow": ExportFormat(
+        "application/vnd.apache.arrow.stream", export_heroes_arrow, "pyarrow"
+    ),
+}
+
+
+class _CachedReads:
+    """Reads served through an optional `HeroCache`."""
+
+    cache: Optional[HeroCache] = None
+
+    def _cached(self, key: tuple) -> Any:
+        """Return a cached read, None on a miss or without a cache."""
+        return None if self.cache is None else self.cache.get(key)
+
+    def _generation(self) -> int:
+        """Return the cache generation to store a read under."""
+        return 0 if self.cache is None else self.cache.generation
+
+    def _store(self, key: tuple, value: Any, generation: int) -> None:
+        """Cache a read made at a cache generation."""
+        if self.cache is not None:
+            self.cache.put(key, value, generation)
 
+    def _invalidate(self) -> None:
+        """Drop cached reads after a write."""
+        if self.cache is not None:
+            self.cache.invalidate()
 
-class HeroesService:
+
+class HeroesService(_CachedReads):
     """Service for managing heroes."""
 
-    def __init__(self, session: Session) -> None:
-        """Initialize the HeroesService with a database session."""
+    def __init__(
+        self,
+        session: Session,
+        writer: Optional[HeroWriter] = None,
+        cache: Optional[HeroCache] = None,
+        read_session: Optional[Session] = None,
+    ) -> None:
+        """Initialize the HeroesService with a database session.
+
+        Args:
+            session: Database session.
+            writer: Writer committing single creates in groups, if any.
+            cache: Cache of serialized reads, invalidated by every create.
+                Reads go to the database every time if None.
+            read_session: Read-only session queries go through, `session`
+                if None.
+        """
         self.session = session
+        self.read_session = session if read_session is None else read_session
+        self.writer = writer
+        self.cache = cache
 
     def create_hero(self, sample_create: HeroCreate) -> Hero:
         """Create a new hero."""
-        return create_hero(self.session, sample_create)
+        try:
+            return create_hero(self.session, sample_create)
+        finally:
+            self._invalidate()
+
+    async def create_hero_async(self, hero_create: HeroCreate) -> Hero:
+        """Create a new hero through the writer's next group commit.
+
+        Without a writer, the hero is committed on its own in a thread.
+        """
+        if self.writer is None:
+            return await asyncio.to_thread(self.create_hero, hero_create)
+        try:
+            return await self.writer.create_hero_async(hero_create)
+        finally:
+            # The writer invalidates the shared cache itself
+            self._invalidate()
+
+    def create_heroes(
+        self,
+        hero_creates: Iterable[HeroCreate],
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[UUID]:
+        """Create many heroes in chunks and return their IDs."""
+        try:
+            return create_heroes(self.session, hero_creates, chunk_size)
+        finally:
+            # Earlier chunks stay committed when a later one fails
+            self._invalidate()
+
+    def export_heroes(self, export_format: str) -> Iterator[bytes]:
+        """Stream all heroes in one of `EXPORT_FORMATS`.
+
+        The export runs on its own pooled connection, checked out when
+        the stream is first read and returned when it ends, so the stream
+        can outlive the request's session.
+        """
+        writer = EXPORT_FORMATS[export_format].writer
+        engine = self.read_session.get_bind()
+
+        def stream() -> Iterator[bytes]:
+            connection = engine.raw_connection()
+            try:
+                yield from writer(connection.driver_connection)
+            finally:
+                connection.close()
+
+        return stream()
+
+    def get_heroes(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+    ) -> HeroPage:
+        """Retrieve a page of heroes ordered by name.
+
+        Args:
+            limit: Maximum number of heroes on the page.
+            cursor: `next_cursor` of the previous page, None for the first.
+            name_prefix: Only return heroes whose name starts with this.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        # One extra hero tells whether there is a next page
+        heroes = get_heroes(self.read_session, limit + 1, after, name_prefix)
+        if len(heroes) <= limit:
+            return HeroPage(items=heroes)
+        heroes = heroes[:limit]
+        last = heroes[-1]
+        return HeroPage(
+            items=heroes, next_cursor=encode_cursor(last.name, last.id)
+        )
+
+    def get_heroes_json(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        validate: bool = True,
+    ) -> tuple[bytes, Optional[str]]:
+        """Retrieve a page of heroes like `get_heroes`, serialized as JSON.
+
+        Rows are fetched as tuples and encoded once by pydantic-core, in
+        the same bytes FastAPI writes for a `List[Hero]` response.
+
+        Args:
+            limit: Maximum number of heroes on the page.
+            cursor: `next_cursor` of the previous page, None for the first.
+            name_prefix: Only return heroes whose name starts with this.
+            validate: Validate the rows against the hero schema. Rows read
+                from the heroes table already match it.
+
+        Returns:
+            The JSON list of heroes and the cursor of the next page.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        key = _page_key(limit, cursor, name_prefix)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        generation = self._generation()
+        after = decode_cursor(cursor) if cursor else None
+        rows = get_hero_rows(self.read_session, limit + 1, after, name_prefix)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        # Same field order as FastAPI's serialization of heroes loaded
+        # from the table
+        records = [{"id": hero_id, "name": name} for hero_id, name in rows]
+        if validate:
+            _HERO_RECORDS.validate_python(records)
+        page = to_json(records), next_cursor
+        self._store(key, page, generation)
+        return page
+
+    def get_hero_json(self, hero_id: UUID) -> Optional[bytes]:
+        """Retrieve a hero serialized as JSON, None if there is none."""
+        key = _hero_key(hero_id)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        generation = self._generation()
+        row = get_hero_row(self.read_session, hero_id)
+        if row is None:
+            return None
+        body = to_json({"id": row[0], "name": row[1]})
+        self._store(key, body, generation)
+        return body
+
+    def stats(self) -> dict:
+        """Return statistics of the hero cache and writer."""
+        return {
+            "cache": None if self.cache is None else self.cache.stats(),
+            "writer": None if self.writer is None else self.writer.stats(),
+        }
+
+
+class AsyncHeroesService(_CachedReads):
+    """Heroes service for async routes.
+
+    DuckDB has no async driver, so every query runs on a database executor
+    sized like the read pool, in a read-only session opened and closed on
+    the executor thread. Routes hold neither a threadpool slot nor a
+    connection while they wait, cached reads never leave the event loop,
+    and calls beyond the executor's or writer's queue depth fail at once
+    with `DatabaseOverloadedError`.
+    """
+
+    def __init__(
+        self,
+        executor: DatabaseExecutor,
+        read_session: Callable[[], AbstractContextManager[Session]],
+        writer: HeroWriter,
+        cache: Optional[HeroCache] = None,
+        search_index: Optional[HeroSearchIndex] = None,
+    ) -> None:
+        """Initialize the AsyncHeroesService.
+
+        Args:
+            executor: Executor running the queries.
+            read_session: Factory of read-only session contexts.
+            writer: Writer committing creates in groups.
+            cache: Cache of serialized reads, invalidated by every create.
+                Reads go to the database every time if None.
+            search_index: Index of hero names searched by `search_heroes`.
+        """
+        self.executor = executor
+        self.read_session = read_session
+        self.writer = writer
+        self.cache = cache
+        self.search_index = search_index or HeroSearchIndex()
+
+    async def create_hero_async(self, hero_create: HeroCreate) -> Hero:
+        """Create a new hero through the writer's next group commit."""
+        try:
+            return await self.writer.create_hero_async(hero_create)
+        finally:
+            # The writer invalidates the shared cache itself
+            self._invalidate()
+
+    async def get_heroes_json(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        validate: bool = True,
+    ) -> tuple[bytes, Optional[str]]:
+        """Retrieve a page of heroes like `HeroesService.get_heroes_json`."""
+        key = _page_key(limit, cursor, name_prefix)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        generation = self._generation()
+        page = await self._query(
+            lambda service: service.get_heroes_json(
+                limit, cursor, name_prefix, validate
+            )
+        )
+        self._store(key, page, generation)
+        return page
+
+    async def get_hero_json(self, hero_id: UUID) -> Optional[bytes]:
+        """Retrieve a hero serialized as JSON, None if there is none."""
+        key = _hero_key(hero_id)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        generation = self._generation()
+        body = await self._query(lambda service: service.get_hero_json(hero_id))
+        if body is not None:
+            self._store(key, body, generation)
+        return body
+
+    async def search_heroes(
+        self, query: str, limit: int = 20
+    ) -> list[HeroMatch]:
+        """Search heroes by name, best matches first.
+
+        Heroes committed since the last search are indexed first, unless
+        the index is still loading, in which case the heroes loaded so far
+        are searched.
+        """
+
+        def run() -> list[HeroMatch]:
+            with self.read_session() as session:
+                self.search_index.refresh(session, blocking=False)
+            return self.search_index.search(query, limit)
+
+        return await self.executor.run(run)
+
+    async def _query(
+        self, query: Callable[[HeroesService], ResultT]
+    ) -> ResultT:
+        """Run a query of an uncached service on the executor."""
+
+        def run() -> ResultT:
+            with self.read_session() as session:
+                return query(HeroesService(session))
+
+        return await self.executor.run(run)
+
+
+def _page_key(
+    limit: int, cursor: Optional[str], name_prefix: Optional[str]
+) -> tuple:
+    """Return the cache key of a page of heroes."""
+    return ("page", limit, cursor, name_prefix)
+
+
+def _hero_key(hero_id: UUID) -> tuple:
+    """Return the cache key of a hero."""
+    return ("hero", hero_id)
+
+
+def encode_cursor(name: str, hero_id: UUID) -> str:
+    """Return the opaque cursor of the page following a hero."""
+    key = json.dumps([name, str(hero_id)]).encode()
+    return base64.urlsafe_b64encode(key).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, UUID]:
+    """Return the (name, id) key encoded in a cursor.
 
-    def get_heroes(self) -> list[HeroRead]:
-        """Retrieve all heroes."""
-        return get_heroes(self.session)
+    Raises:
+        ValueError: If the cursor was not made by `encode_cursor`.
+    """
+    try:
+        name, hero_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if not isinstance(name, str) or not isinstance(hero_id, str):
+            raise TypeError("name or id is not a string")
+        return name, UUID(hero_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
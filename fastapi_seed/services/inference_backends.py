@@ -0,0 +1,249 @@
+"""Optimized inference backends for sequence classification models."""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict, dataclass
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "int8", "bf16", "compile", "torchscript")
+
+
+def _logits(outputs) -> torch.Tensor:
+    """Extract logits from model outputs of any return convention."""
+    if isinstance(outputs, tuple):
+        return outputs[0]
+    if isinstance(outputs, Mapping):
+        return outputs["logits"]
+    return outputs.logits
+
+
+class InferenceBackend:
+    """Plain float32 eager execution, the reference for all backends."""
+
+    name = "eager"
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        """Wrap an evaluation-mode model."""
+        self.model = model
+
+    def logits(self, inputs: Mapping[str, torch.Tensor]) -> torch.Tensor:
+        """Run tokenized inputs through the model and return float logits."""
+        with torch.inference_mode():
+            return _logits(self.model(**inputs)).float()
+
+
+class Int8Backend(InferenceBackend):
+    """Dynamically quantized int8 weights for all Linear layers."""
+
+    name = "int8"
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        """Quantize the Linear layers of a model."""
+        super().__init__(
+            torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        )
+
+
+class Bf16Backend(InferenceBackend):
+    """bfloat16 autocast on CPU."""
+
+    name = "bf16"
+
+    def logits(self, inputs: Mapping[str, torch.Tensor]) -> torch.Tensor:
+        """Run the model under bfloat16 autocast."""
+        autocast = torch.autocast("cpu", dtype=torch.bfloat16)
+        with torch.inference_mode(), autocast:
+            return _logits(self.model(**inputs)).float()
+
+
+class CompileBackend(InferenceBackend):
+    """Graph compiled with `torch.compile` for dynamic shapes."""
+
+    name = "compile"
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        """Compile the model; compilation happens on the first call."""
+        super().__init__(torch.compile(model, dynamic=True))
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Frozen TorchScript graph traced from example inputs."""
+
+    name = "torchscript"
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        example_inputs: Mapping[str, torch.Tensor],
+    ) -> None:
+        """Trace and freeze the model.
+
+        Args:
+            model: Model to trace.
+            example_inputs: Padded tokenized batch used for tracing.
+        """
+        with torch.no_grad():
+            traced = torch.jit.trace(
+                model, example_kwarg_inputs=dict(example_inputs), strict=False
+            )
+        super().__init__(torch.jit.freeze(traced))
+
+
+def create_backend(
+    name: str,
+    model: torch.nn.Module,
+    example_inputs: Mapping[str, torch.Tensor],
+) -> InferenceBackend:
+    """Create an inference backend by name.
+
+    Args:
+        name: One of `BACKENDS`.
+        model: Float32 model in evaluation mode.
+        example_inputs: Padded tokenized batch, used by tracing backends and
+            to warm the backend up.
+
+    Returns:
+        Backend ready to run inference.
+    """
+    if name == "eager":
+        backend = InferenceBackend(model)
+    elif name == "int8":
+        backend = Int8Backend(model)
+    elif name == "bf16":
+        backend = Bf16Backend(model)
+    elif name == "compile":
+        backend = CompileBackend(model)
+    elif name == "torchscript":
+        backend = TorchScriptBackend(model, example_inputs)
+    else:
+        raise ValueError(
+            f"Unknown inference backend {name!r}, expected one of {BACKENDS}"
+        )
+
+    backend.logits(example_inputs)
+    logger.info("Inference backend %s ready", name)
+    return backend
+
+
+@dataclass
+class BackendReport:
+    """Accuracy and speed of one backend against the float32 reference."""
+
+    backend: str
+    max_abs_error: float | None = None
+    mean_abs_error: float | None = None
+    texts_per_second: float | None = None
+    within_tolerance: bool = False
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        """Return the report as a JSON-serializable dict."""
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class ComparisonSettings:
+    """What and how to compare in `compare_backends`.
+
+    Attributes:
+        backends: Names of the backends to evaluate.
+        tolerance: Maximum absolute score difference to the reference.
+        batch_size: Number of texts per forward pass.
+        revision: Model revision to load.
+    """
+
+    backends: Sequence[str] = BACKENDS
+    tolerance: float = 0.02
+    batch_size: int = 32
+    revision: str | None = None
+
+
+def compare_backends(
+    model_name: str,
+    texts: Sequence[str],
+    settings: ComparisonSettings | None = None,
+) -> list[BackendReport]:
+    """Compare backends to float32 eager scores on a sample of texts.
+
+    Every backend gets a freshly loaded model, scores the sample once to
+    warm up and once timed. Errors are measured on sigmoid scores.
+
+    Args:
+        model_name: Hugging Face model name or local path.
+        texts: Representative sample texts.
+        settings: Backends, tolerance and batching, the defaults if None.
+
+    Returns:
+        One report per backend, in the given order.
+    """
+    settings = settings or ComparisonSettings()
+    revision = settings.revision
+    batch_size = settings.batch_size
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    batches = [
+        tokenizer(
+            list(texts[start : start + batch_size]),
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=512,
+        )
+        for start in range(0, len(texts), batch_size)
+    ]
+
+    def load_model() -> torch.nn.Module:
+        return AutoModelForSequenceClassification.from_pretrained(
+            model_name, revision=revision
+        ).eval()
+
+    def score(backend: InferenceBackend) -> torch.Tensor:
+        return torch.cat(
+            [torch.sigmoid(backend.logits(batch)) for batch in batches]
+        )
+
+    reference = score(InferenceBackend(load_model()))
+
+    reports = []
+    for name in settings.backends:
+        report = BackendReport(backend=name)
+        try:
+            backend = create_backend(name, load_model(), batches[0])
+            score(backend)
+            started = time.perf_counter()
+            scores = score(backend)
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            logger.exception("Backend %s failed", name)
+            report.error = f"{type(e).__name__}: {e}"
+            reports.append(report)
+            continue
+
+        diff = (scores - reference).abs()
+        report.max_abs_error = float(diff.max())
+        report.mean_abs_error = float(diff.mean())
+        report.texts_per_second = len(texts) / elapsed if elapsed else None
+        report.within_tolerance = report.max_abs_error <= settings.tolerance
+        reports.append(report)
+
+    return reports
+
+
+def pick_backend(reports: Sequence[BackendReport]) -> str:
+    """Return the fastest backend within tolerance, eager as fallback."""
+    candidates = [
+        report
+        for report in reports
+        if report.within_tolerance and report.texts_per_second is not None
+    ]
+    if not candidates:
+        return "eager"
+    return max(candidates, key=lambda report: report.texts_per_second).backend
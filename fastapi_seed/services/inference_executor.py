@@ -0,0 +1,112 @@
+"""Dedicated executor running model inference off the event loop."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Generator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+ResultT = TypeVar("ResultT")
+
+
+class InferenceOverloadedError(RuntimeError):
+    """Raised when the inference executor cannot accept more requests."""
+
+
+class InferenceExecutor:
+    """Size-bounded thread pool that owns model forward passes.
+
+    Forward passes are submitted with `submit` and run on a fixed number of
+    worker threads, so the asyncio event loop never executes model code.
+    Callers entering the inference path go through `admit`, which rejects
+    them with `InferenceOverloadedError` once `max_pending` requests are in
+    flight instead of letting the backlog grow without bound.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 256) -> None:
+        """Initialize the executor.
+
+        Args:
+            max_workers: Number of threads running forward passes.
+            max_pending: Maximum number of admitted requests in flight.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        logger.info(
+            "InferenceExecutor started (max_workers=%d, max_pending=%d)",
+            max_workers,
+            max_pending,
+        )
+
+    def submit(self, fn: Callable[..., ResultT], *args: Any) -> Future[ResultT]:
+        """Run a function on the inference threads.
+
+        Args:
+            fn: Function to run, typically a batched forward pass.
+            *args: Positional arguments for the function.
+
+        Returns:
+            Future resolved with the function's result.
+        """
+        return self._pool.submit(fn, *args)
+
+    @contextmanager
+    def admit(self, limit: int | None = None) -> Generator[None, None, None]:
+        """Reserve one in-flight slot for the duration of the block.
+
+        Args:
+            limit: Number of in-flight requests at which this one is
+                rejected, at most `max_pending`. Low priority callers pass
+                a smaller one to keep room for others.
+
+        Raises:
+            InferenceOverloadedError: If `limit` or `max_pending` requests
+                are already in flight.
+        """
+        if limit is None or limit > self.max_pending:
+            limit = self.max_pending
+        with self._lock:
+            if self._pending >= limit:
+                self._rejected += 1
+                raise InferenceOverloadedError(
+                    f"{self._pending} inference requests in flight"
+                )
+            self._pending += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        """Return executor saturation statistics."""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads.
+
+        Args:
+            wait: Whether to wait for running forward passes to finish.
+        """
+        self._pool.shutdown(wait=wait)
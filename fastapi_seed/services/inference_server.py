@@ -0,0 +1,498 @@
+"""Moderation served by one process to the web workers of a host.
+
+Each web worker loading its own `ContentModerationService` holds its own
+copy of the model and batches only its own requests. Instead, one process
+runs an `InferenceServer` owning the model, and the workers forward texts
+to it over a Unix domain socket with a `RemoteModerationService`, so model
+memory does not grow with the number of workers and texts from all of
+them share batches.
+
+Every frame is a little-endian header of payload length (uint32), request
+id (uint32) and frame kind (uint8), followed by the payload:
+
+- HELLO: sent by the server on connect, JSON with the score categories.
+- MODERATE: priority (uint8), milliseconds left until the deadline
+  (uint32, 0 for none) and one UTF-8 text, scored through the batching
+  scheduler.
+- MODERATE_MANY: batch size (uint16), text count (uint32), the byte length
+  of each text (uint32) and the concatenated UTF-8 texts.
+- STATS: empty, answered with the service statistics as JSON.
+- OK: float32 scores, one row of categories per text, or the JSON stats.
+- OVERLOADED, FAILED and EXPIRED: a UTF-8 error message, EXPIRED when
+  the deadline passed before the text was scored.
+
+Responses carry the id of their request and are sent as soon as they are
+ready, so a connection has any number of requests in flight.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import math
+import os
+import struct
+import time
+from enum import IntEnum
+from typing import TYPE_CHECKING, ClassVar
+
+import numpy as np
+
+from fastapi_seed.services.admission import Priority
+from fastapi_seed.services.batching import DeadlineExceededError
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.moderation_audit import MODERATION_AUDIT
+
+if TYPE_CHECKING:
+    from fastapi_seed.services.content_moderation import (
+        ContentModerationService,
+    )
+
+logger = logging.getLogger(__name__)
+
+Scores = dict[str, float]
+
+_HEADER = struct.Struct("<IIB")
+_TEXTS_HEADER = struct.Struct("<HI")
+_TEXT_HEADER = struct.Struct("<BI")
+
+# Larger frames are a protocol error rather than a request
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class Frame(IntEnum):
+    """Kind of a protocol frame."""
+
+    HELLO = 0
+    MODERATE = 1
+    MODERATE_MANY = 2
+    STATS = 3
+    OK = 4
+    OVERLOADED = 5
+    FAILED = 6
+    EXPIRED = 7
+
+
+class InferenceUnavailableError(InferenceOverloadedError):
+    """Raised when the inference server cannot be reached.
+
+    Like overload, this is temporary: the client reconnects on its own.
+    """
+
+
+def encode_frame(kind: Frame, request_id: int, payload: bytes = b"") -> bytes:
+    """Return a frame with its header."""
+    return _HEADER.pack(len(payload), request_id, kind) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """Read a frame and return its kind, request id and payload.
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection closes mid-frame.
+        ConnectionError: If the frame exceeds `MAX_FRAME_BYTES`.
+    """
+    length, request_id, kind = _HEADER.unpack(
+        await reader.readexactly(_HEADER.size)
+    )
+    if length > MAX_FRAME_BYTES:
+        raise ConnectionError(f"Frame of {length} bytes is too large")
+    return kind, request_id, await reader.readexactly(length)
+
+
+def encode_text(text: str, priority: Priority, deadline: float | None) -> bytes:
+    """Return the MODERATE payload of a text."""
+    timeout_ms = 0
+    if deadline is not None:
+        # Deadlines are sent as time left, monotonic clocks are per host
+        # at best; at least 1 ms, since 0 stands for no deadline
+        timeout_ms = max(1, math.ceil((deadline - time.monotonic()) * 1000))
+    return _TEXT_HEADER.pack(priority, timeout_ms) + text.encode()
+
+
+def decode_text(payload: bytes) -> tuple[str, Priority, float | None]:
+    """Return the text, priority and deadline of a MODERATE payload."""
+    priority, timeout_ms = _TEXT_HEADER.unpack_from(payload)
+    deadline = None
+    if timeout_ms:
+        deadline = time.monotonic() + timeout_ms / 1000
+    text = payload[_TEXT_HEADER.size :].decode()
+    return text, Priority(priority), deadline
+
+
+def encode_texts(texts: list[str], batch_size: int) -> bytes:
+    """Return the MODERATE_MANY payload of texts."""
+    encoded = [text.encode() for text in texts]
+    lengths = struct.pack(f"<{len(encoded)}I", *map(len, encoded))
+    return b"".join(
+        [_TEXTS_HEADER.pack(batch_size, len(encoded)), lengths, *encoded]
+    )
+
+
+def decode_texts(payload: bytes) -> tuple[int, list[str]]:
+    """Return the batch size and texts of a MODERATE_MANY payload."""
+    batch_size, count = _TEXTS_HEADER.unpack_from(payload)
+    lengths = struct.unpack_from(f"<{count}I", payload, _TEXTS_HEADER.size)
+    texts = []
+    offset = _TEXTS_HEADER.size + 4 * count
+    for length in lengths:
+        texts.append(payload[offset : offset + length].decode())
+        offset += length
+    return batch_size, texts
+
+
+def encode_scores(results: list[Scores], categories: list[str]) -> bytes:
+    """Return the OK payload of score dicts."""
+    rows = [[scores[category] for category in categories] for scores in results]
+    return np.asarray(rows, dtype="<f4").tobytes()
+
+
+def decode_scores(payload: bytes, categories: list[str]) -> list[Scores]:
+    """Return the score dicts of an OK payload."""
+    rows = np.frombuffer(payload, dtype="<f4").reshape(-1, len(categories))
+    return [dict(zip(categories, row.tolist())) for row in rows]
+
+
+class InferenceServer:
+    """Serves a moderation service to local clients over a Unix socket.
+
+    Single texts from all connections go through the service's batching
+    scheduler together, and the service's executor rejects requests beyond
+    its `max_pending`, or the share of it of their priority, with an
+    OVERLOADED response.
+    """
+
+    def __init__(self, service: ContentModerationService, path: str) -> None:
+        """Initialize the server.
+
+        Args:
+            service: Initialized moderation service.
+            path: Path of the Unix socket to listen on.
+        """
+        self.service = service
+        self.path = path
+        self.categories = service.categories
+        self._hello = encode_frame(
+            Frame.HELLO,
+            0,
+            json.dumps(
+                {"categories": self.categories, "model": service.model_name}
+            ).encode(),
+        )
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._requests = 0
+
+    async def serve(self) -> None:
+        """Accept connections until cancelled."""
+        # A socket file left behind by a killed server would fail the bind
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, self.path)
+        logger.info("InferenceServer listening on %s", self.path)
+        try:
+            # Not serve_forever, whose cancellation waits for the clients
+            # to hang up; closing their connections ends the handlers
+            await asyncio.get_running_loop().create_future()
+        finally:
+            server.close()
+            for writer in self._writers:
+                writer.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+
+    def stats(self) -> dict:
+        """Return connection statistics."""
+        return {"connections": len(self._writers), "requests": self._requests}
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests of a connection until it closes."""
+        self._writers.add(writer)
+        tasks: set[asyncio.Task] = set()
+        writer.write(self._hello)
+        try:
+            while True:
+                kind, request_id, payload = await read_frame(reader)
+                self._requests += 1
+                task = asyncio.create_task(
+                    self._respond(writer, kind, request_id, payload)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            if not isinstance(e, asyncio.IncompleteReadError) or e.partial:
+                logger.warning("Dropping inference client: %s", e)
+        finally:
+            self._writers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        kind: int,
+        request_id: int,
+        payload: bytes,
+    ) -> None:
+        """Answer one request."""
+        try:
+            response, body = Frame.OK, await self._dispatch(kind, payload)
+        except InferenceOverloadedError as e:
+            response, body = Frame.OVERLOADED, str(e).encode()
+        except DeadlineExceededError as e:
+            response, body = Frame.EXPIRED, str(e).encode()
+        except Exception as e:
+            logger.exception("Inference request failed")
+            response, body = Frame.FAILED, f"{type(e).__name__}: {e}".encode()
+        if writer.is_closing():
+            return
+        writer.write(encode_frame(response, request_id, body))
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+
+    async def _dispatch(self, kind: int, payload: bytes) -> bytes:
+        """Run a request on the service and return the OK payload."""
+        if kind == Frame.MODERATE:
+            scores = await self.service.moderate_text_async(
+                *decode_text(payload)
+            )
+            return encode_scores([scores], self.categories)
+        if kind == Frame.MODERATE_MANY:
+            batch_size, texts = decode_texts(payload)
+            results = await self.service.moderate_texts_async(texts, batch_size)
+            return encode_scores(results, self.categories)
+        if kind == Frame.STATS:
+            stats = {**self.service.stats(), "server": self.stats()}
+            return json.dumps(stats).encode()
+        raise ValueError(f"Unknown request kind {kind}")
+
+
+class RemoteModerationService:
+    """Moderation service forwarding texts to an `InferenceServer`.
+
+    Stands in for `ContentModerationService` in the routes of a web worker
+    that does not load the model. The connection is opened on the event
+    loop `start` runs on and reopened whenever it drops; requests made
+    while it is down, or in flight when it drops, fail with
+    `InferenceUnavailableError`.
+    """
+
+    _instance: ClassVar[RemoteModerationService | None] = None
+    _initialized: bool = False
+
+    def __new__(cls, *_args, **_kwargs):
+        """Return the process-wide client."""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_pending: int = 256,
+        reconnect_delay: float = 0.5,
+    ) -> None:
+        """Set up the client once.
+
+        Args:
+            path: Path of the inference server's Unix socket.
+            max_pending: Maximum number of requests of this process in
+                flight before new ones are rejected.
+            reconnect_delay: Seconds between connection attempts.
+        """
+        if not self._initialized:
+            if path is None:
+                raise ValueError("The inference server socket is required")
+            self.path = path
+            self.max_pending = max_pending
+            self.reconnect_delay = reconnect_delay
+            self.categories: list[str] = []
+            self.model_name = ""
+            self._writer: asyncio.StreamWriter | None = None
+            self._pending: dict[int, asyncio.Future] = {}
+            self._ids = itertools.count(1)
+            self._loop: asyncio.AbstractEventLoop | None = None
+            self._task: asyncio.Task | None = None
+            self._connects = 0
+            self._rejected = 0
+            self._initialized = True
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """Whether the client is connected to the inference server."""
+        instance = cls._instance
+        return instance is not None and instance._writer is not None  # noqa: SLF001
+
+    @classmethod
+    def load_error(cls) -> BaseException | None:
+        """Return None: connection failures are retried, not fatal."""
+        return None
+
+    def start(self) -> None:
+        """Connect to the server from the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def close(self) -> None:
+        """Close the connection and stop reconnecting."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        """Return the server's statistics and those of this client.
+
+        Blocks on a round trip to the server, so it must not be called
+        from the event loop thread.
+        """
+        if self._loop is None:
+            raise RuntimeError("RemoteModerationService is not started")
+        server = asyncio.run_coroutine_threadsafe(
+            self._request(Frame.STATS, b""), self._loop
+        ).result(timeout=5)
+        return {
+            **json.loads(server),
+            "client": {
+                "max_pending": self.max_pending,
+                "pending": len(self._pending),
+                "rejected": self._rejected,
+                "connects": self._connects,
+            },
+        }
+
+    async def moderate_text_async(
+        self,
+        text: str,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
+    ) -> Scores:
+        """Score a text in the server's next batch.
+
+        The priority and deadline apply on the server, like they do in
+        `ContentModerationService.moderate_text_async`.
+
+        Raises:
+            InferenceOverloadedError: If too many requests are in flight
+                here or on the server.
+            DeadlineExceededError: If the deadline passed before scoring.
+        """
+        if deadline is not None and deadline <= time.monotonic():
+            raise DeadlineExceededError("Deadline passed before sending")
+        payload = await self._request(
+            Frame.MODERATE, encode_text(text, priority, deadline)
+        )
+        scores = decode_scores(payload, self.categories)[0]
+        MODERATION_AUDIT.record(self.model_name, text, scores)
+        return scores
+
+    async def moderate_texts_async(
+        self, texts: list[str], batch_size: int = 32
+    ) -> list[Scores]:
+        """Score many texts at once, like `moderate_texts_async` locally.
+
+        Raises:
+            InferenceOverloadedError: If too many requests are in flight
+                here or on the server.
+        """
+        if not texts:
+            return []
+        payload = await self._request(
+            Frame.MODERATE_MANY, encode_texts(texts, batch_size)
+        )
+        results = decode_scores(payload, self.categories)
+        MODERATION_AUDIT.record_many(self.model_name, texts, results)
+        return results
+
+    async def _request(self, kind: Frame, payload: bytes) -> bytes:
+        """Send a request and return the payload of its OK response."""
+        writer = self._writer
+        if writer is None:
+            raise InferenceUnavailableError("Inference server not connected")
+        if len(self._pending) >= self.max_pending:
+            self._rejected += 1
+            raise InferenceOverloadedError(
+                f"{len(self._pending)} inference requests in flight"
+            )
+
+        # Id 0 is the server's hello
+        request_id = next(self._ids) % 0xFFFFFFFF + 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(encode_frame(kind, request_id, payload))
+            await writer.drain()
+            response, body = await future
+        finally:
+            self._pending.pop(request_id, None)
+
+        if response == Frame.OVERLOADED:
+            raise InferenceOverloadedError(body.decode())
+        if response == Frame.EXPIRED:
+            raise DeadlineExceededError(body.decode())
+        if response == Frame.FAILED:
+            raise RuntimeError(f"Inference server failed: {body.decode()}")
+        return body
+
+    async def _run(self) -> None:
+        """Keep a connection open and resolve requests with responses."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.debug("Inference server unreachable: %s", e)
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            try:
+                kind, _, payload = await read_frame(reader)
+                if kind != Frame.HELLO:
+                    raise ConnectionError(f"Expected hello, got frame {kind}")
+                hello = json.loads(payload)
+                self.categories = hello["categories"]
+                self.model_name = hello["model"]
+                self._writer = writer
+                self._connects += 1
+                logger.info("Connected to inference server at %s", self.path)
+                while True:
+                    kind, request_id, payload = await read_frame(reader)
+                    future = self._pending.get(request_id)
+                    if future is not None and not future.done():
+                        future.set_result((kind, payload))
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                logger.warning("Inference server connection lost: %s", e)
+            finally:
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(
+                            InferenceUnavailableError(
+                                "Inference server connection lost"
+                            )
+                        )
+            await asyncio.sleep(self.reconnect_delay)
+
+
+def moderation_service_class() -> (
+    type[ContentModerationService] | type[RemoteModerationService]
+):
+    """Return the class of the service moderating texts in this process.
+
+    That is `RemoteModerationService` once this process forwards texts to
+    an inference server, and `ContentModerationService` otherwise.
+    """
+    if RemoteModerationService._instance is not None:  # noqa: SLF001
+        return RemoteModerationService
+    # Only processes loading the model import torch
+    from fastapi_seed.services.content_moderation import (  # noqa: PLC0415
+        ContentModerationService,
+    )
+
+    return ContentModerationService
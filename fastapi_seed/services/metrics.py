@@ -0,0 +1,289 @@
+"""In-process metrics exposed in the Prometheus text format."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Generator, Iterable, Sequence
+from contextlib import contextmanager
+from typing import Callable
+
+# Bucket upper bounds, in the unit of the observed values
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 384, 512)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format label pairs as `{name="value",...}`."""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Named metric with one child per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Return the child for the given label values, in label order."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}"
+                )
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> Iterable[str]:
+        """Yield the lines of the metric in the Prometheus text format."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in list(self._children.items()):
+            yield from self._render_child(values, child)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, values, child) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class _HistogramChild:
+    """Counts of observations per preallocated bucket."""
+
+    __slots__ = ("_lock", "bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        """Record several observations at once."""
+        values = list(values)
+        indexes = [bisect_left(self.bounds, value) for value in values]
+        total = float(sum(values))
+        with self._lock:
+            for index in indexes:
+                self.counts[index] += 1
+            self.sum += total
+
+    @contextmanager
+    def time(self) -> Generator[None, None, None]:
+        """Observe the duration of the block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets.
+
+    Buckets are allocated once per label combination, so an observation is
+    a bisection and an increment.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        """Initialize the histogram.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+            labelnames: Names of the labels distinguishing children.
+            buckets: Increasing bucket upper bounds, without +Inf.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+
+    def observe(self, value: float) -> None:
+        """Record an observation on the histogram without labels."""
+        self.labels().observe(value)
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        """Record observations on the histogram without labels."""
+        self.labels().observe_many(values)
+
+    def time(self):
+        """Observe the duration of a block on the histogram without labels."""
+        return self.labels().time()
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child) -> Iterable[str]:
+        with child._lock:  # noqa: SLF001
+            counts = list(child.counts)
+            total = child.sum
+        cumulative = 0
+        for bound, count in zip((*child.bounds, math.inf), counts):
+            cumulative += count
+            labels = _format_labels(
+                (*self.labelnames, "le"), (*values, _format_value(bound))
+            )
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _GaugeChild:
+    """Current value, set directly or read from a function."""
+
+    __slots__ = ("_lock", "function", "value")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the value."""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the value."""
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Set the value."""
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from a function whenever metrics are rendered."""
+        self.function = function
+
+    def get(self) -> float:
+        """Return the current value."""
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, such as requests in flight."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge without labels."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge without labels."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Set the gauge without labels."""
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the gauge without labels from a function."""
+        self.labels().set_function(function)
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def _render_child(self, values, child) -> Iterable[str]:
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}{labels} {_format_value(child.get())}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register a histogram, or return the one with the same name."""
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """Register a gauge, or return the one with the same name."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"{metric.name} is already registered")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+# Registry rendered by the /metrics route
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,346 @@
+"""Write-behind audit log of moderation decisions."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, NamedTuple
+from uuid import uuid4
+
+import numpy as np
+from sqlmodel import Session, SQLModel
+
+from fastapi_seed.models.moderation_audit import (
+    CategoryScoreStats,
+    ModerationAnalytics,
+    ModerationBucket,
+    ModerationDecision,
+    ModerationScore,
+)
+from fastapi_seed.repository.moderation_audit import (
+    count_decisions,
+    insert_decisions,
+    score_stats,
+)
+from fastapi_seed.services.metrics import REGISTRY, SIZE_BUCKETS
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from fastapi_seed.repository.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_ROWS = REGISTRY.histogram(
+    "moderation_audit_flush_rows",
+    "Decisions written together by the moderation audit log.",
+    buckets=SIZE_BUCKETS,
+)
+
+Scores = dict[str, float]
+
+
+@dataclass(frozen=True)
+class AuditSettings:
+    """Buffering of the moderation audit log.
+
+    Attributes:
+        capacity: Maximum number of decisions buffered in memory. While
+            the database falls behind, the oldest buffered decisions are
+            dropped, and counted, instead of growing the buffer.
+        flush_rows: Number of buffered decisions that starts a flush.
+        flush_interval_s: Maximum seconds between flushes.
+        flag_threshold: Score of a category other than `safe_categories`
+            from which a decision is flagged.
+        safe_categories: Categories whose score never flags a decision.
+    """
+
+    capacity: int = 50_000
+    flush_rows: int = 5_000
+    flush_interval_s: float = 1.0
+    flag_threshold: float = 0.5
+    safe_categories: frozenset[str] = frozenset({"Safe Content"})
+
+
+class _Decision(NamedTuple):
+    """Decision waiting in the buffer."""
+
+    created_at: float
+    model: str
+    text_sha256: str
+    text_length: int
+    scores: Scores
+
+
+class ModerationAuditLog:
+    """Keeps every moderation decision in DuckDB, off the request path.
+
+    Recording a decision hashes its text and appends it to a bounded ring
+    buffer. A background thread moves the buffer to the database with one
+    insert per table and one transaction per flush, once `flush_rows`
+    decisions are buffered or `flush_interval_s` passed. A failed flush
+    puts its decisions back in the buffer to be retried, as far as they
+    fit. Until `start` is called, decisions are not recorded.
+    """
+
+    def __init__(self, settings: AuditSettings | None = None) -> None:
+        """Initialize the log.
+
+        Args:
+            settings: Buffering settings, the defaults if None.
+        """
+        self.settings = settings or AuditSettings()
+        self._buffer: deque[_Decision] = deque(maxlen=self.settings.capacity)
+        self._lock = threading.Lock()
+        # Serializes flushes of the thread and of callers
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._database: DatabaseManager | None = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.flushes = 0
+
+    def __len__(self) -> int:
+        """Return the number of buffered decisions."""
+        return len(self._buffer)
+
+    @property
+    def running(self) -> bool:
+        """Whether decisions are recorded and flushed."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, database: DatabaseManager) -> None:
+        """Create the audit tables and start flushing to a database."""
+        SQLModel.metadata.create_all(
+            database.engine,
+            tables=[ModerationDecision.__table__, ModerationScore.__table__],
+        )
+        self._database = database
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="moderation-audit", daemon=True
+        )
+        self._thread.start()
+
+    def shutdown(self, timeout: float | None = 10.0) -> None:
+        """Flush the buffered decisions and stop the flush thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def record(self, model: str, text: str, scores: Scores) -> None:
+        """Buffer a decision, to be written with the next flush.
+
+        Args:
+            model: Name of the model that scored the text.
+            text: Scored text, of which only the hash and length are kept.
+            scores: Scores per category, which must not be changed later.
+        """
+        if self._thread is None:
+            return
+        decision = _Decision(
+            time.time(),
+            model,
+            hashlib.sha256(text.encode()).hexdigest(),
+            len(text),
+            scores,
+        )
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(decision)
+            self.recorded += 1
+            full = len(self._buffer) >= self.settings.flush_rows
+        if full:
+            self._wake.set()
+
+    def record_many(
+        self, model: str, texts: Sequence[str], results: Sequence[Scores]
+    ) -> None:
+        """Buffer the decisions of texts scored together."""
+        for text, scores in zip(texts, results):
+            self.record(model, text, scores)
+
+    def flush(self) -> int:
+        """Write the buffered decisions now.
+
+        Returns:
+            The number of decisions written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch or self._database is None:
+                return 0
+            try:
+                with self._database.session() as session:
+                    insert_decisions(session, *self._columns(batch))
+            except Exception:
+                logger.exception(
+                    "Writing %d moderation decisions failed", len(batch)
+                )
+                self.write_errors += 1
+                self._requeue(batch)
+                return 0
+            self.flushes += 1
+            self.written += len(batch)
+            AUDIT_FLUSH_ROWS.observe(len(batch))
+            return len(batch)
+
+    def stats(self) -> dict:
+        """Return buffering and writing statistics."""
+        return {
+            "capacity": self.settings.capacity,
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "flushes": self.flushes,
+        }
+
+    def _run(self) -> None:
+        """Flush periodically and when the buffer fills, until stopped."""
+        while not self._stop_event.is_set():
+            self._wake.wait(self.settings.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+        # Decisions recorded while the last flush ran
+        self.flush()
+
+    def _requeue(self, batch: list[_Decision]) -> None:
+        """Put the decisions of a failed flush back, oldest first."""
+        with self._lock:
+            space = self.settings.capacity - len(self._buffer)
+            kept = batch[len(batch) - space :] if space > 0 else []
+            self.dropped += len(batch) - len(kept)
+            self._buffer.extendleft(reversed(kept))
+
+    def _columns(
+        self, batch: list[_Decision]
+    ) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+        """Return the decision and score columns of a batch."""
+        ids = np.array([str(uuid4()) for _ in batch], dtype=object)
+        created_at = (
+            np.array([decision.created_at for decision in batch]) * 1e6
+        ).astype("datetime64[us]")
+        flagged = np.zeros(len(batch), dtype=bool)
+        top_categories = np.empty(len(batch), dtype=object)
+        top_scores = np.zeros(len(batch))
+        score_columns = []
+
+        # Decisions of a model share their categories, so each group of
+        # decisions with the same categories is one matrix of scores
+        groups: dict[tuple[str, ...], list[int]] = {}
+        for i, decision in enumerate(batch):
+            groups.setdefault(tuple(decision.scores), []).append(i)
+        for categories, rows in groups.items():
+            index = np.array(rows, dtype=np.intp)
+            matrix = np.array(
+                [list(batch[i].scores.values()) for i in rows], dtype=float
+            ).reshape(len(rows), len(categories))
+            unsafe = np.array(
+                [c not in self.settings.safe_categories for c in categories],
+                dtype=bool,
+            )
+            flagged[index] = (
+                matrix[:, unsafe] >= self.settings.flag_threshold
+            ).any(axis=1)
+            top = matrix.argmax(axis=1)
+            top_categories[index] = np.array(categories, dtype=object)[top]
+            top_scores[index] = matrix[np.arange(len(rows)), top]
+            score_columns.append(
+                (
+                    np.repeat(index, len(categories)),
+                    np.tile(np.array(categories, dtype=object), len(rows)),
+                    matrix.ravel(),
+                )
+            )
+
+        owners, categories, scores = (
+            np.concatenate(column) for column in zip(*score_columns)
+        )
+        return (
+            {
+                "id": ids,
+                "created_at": created_at,
+                "model": np.array([d.model for d in batch], dtype=object),
+                "text_sha256": np.array(
+                    [d.text_sha256 for d in batch], dtype=object
+                ),
+                "text_length": np.array(
+                    [d.text_length for d in batch], dtype=np.int64
+                ),
+                "flagged": flagged,
+                "category": top_categories,
+                "score": top_scores,
+            },
+            {
+                "decision_id": ids[owners],
+                "category": categories,
+                "created_at": created_at[owners],
+                "score": scores,
+            },
+        )
+
+
+def moderation_analytics(
+    session: Session, bucket_seconds: int, since: datetime, until: datetime
+) -> ModerationAnalytics:
+    """Aggregate the audited decisions of a time range per time bucket.
+
+    Counting and percentiles run in DuckDB, so only one row per bucket
+    and category is read back whatever the number of decisions.
+
+    Args:
+        session: Database session.
+        bucket_seconds: Width of the time buckets.
+        since: Start of the time range, inclusive, in UTC.
+        until: End of the time range, exclusive, in UTC.
+    """
+    buckets = {
+        start: ModerationBucket(
+            start=start,
+            decisions=decisions,
+            flagged=flagged,
+            flagged_rate=flagged / decisions,
+            categories={},
+        )
+        for start, decisions, flagged in count_decisions(
+            session, bucket_seconds, since, until
+        )
+    }
+    for start, category, mean, (p50, p90, p99) in score_stats(
+        session, bucket_seconds, since, until
+    ):
+        if start in buckets:
+            buckets[start].categories[category] = CategoryScoreStats(
+                mean=mean, p50=p50, p90=p90, p99=p99
+            )
+    return ModerationAnalytics(
+        bucket_seconds=bucket_seconds, buckets=list(buckets.values())
+    )
+
+
+# Decisions of the moderation service, recorded once started
+MODERATION_AUDIT = ModerationAuditLog()
+
+REGISTRY.gauge(
+    "moderation_audit_buffered",
+    "Moderation decisions waiting to be written to the audit log.",
+).set_function(lambda: len(MODERATION_AUDIT))
@@ -0,0 +1,256 @@
+"""Content-addressed cache for moderation results."""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable
+
+Scores = dict[str, float]
+
+# Rough per-entry overhead of the OrderedDict slot and the key string
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different spellings share a cache entry.
+
+    Applies Unicode NFC normalization and collapses runs of whitespace,
+    neither of which changes how the tokenizer splits the text.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _follow(source: Future[Scores]) -> Future[Scores]:
+    """Return a new future resolved with a copy of the source's outcome."""
+    target: Future[Scores] = Future()
+
+    def copy(done: Future[Scores]) -> None:
+        if done.cancelled():
+            target.cancel()
+            return
+        if not target.set_running_or_notify_cancel():
+            return
+        if done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(dict(done.result()))
+
+    source.add_done_callback(copy)
+    return target
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    """Size and lifetime limits of a moderation cache.
+
+    Attributes:
+        max_entries: Maximum number of cached results.
+        max_bytes: Maximum estimated memory used by cached results. No byte
+            limit if None.
+        ttl_seconds: Seconds after which an entry expires. Entries never
+            expire if None.
+    """
+
+    max_entries: int = 10_000
+    max_bytes: int | None = None
+    ttl_seconds: float | None = 3600.0
+
+
+class ModerationCache:
+    """Bounded LRU/TTL cache of moderation scores with request coalescing.
+
+    Entries are keyed by a hash of the normalized text, the model name and
+    the model revision, so switching models never serves stale scores. The
+    cache is bounded both by entry count and by an estimated byte budget.
+    Identical texts requested while a computation is in flight share that
+    computation instead of running the model again.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: str,
+        settings: CacheSettings | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            model_name: Name of the model producing the scores.
+            revision: Revision of the model producing the scores.
+            settings: Size and lifetime limits, the defaults if None.
+            clock: Monotonic clock, replaceable in tests.
+        """
+        settings = settings or CacheSettings()
+        if settings.max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = settings.max_entries
+        self.max_bytes = settings.max_bytes
+        self.ttl_seconds = settings.ttl_seconds
+        self._clock = clock
+        self._namespace = f"{model_name}@{revision}\0".encode()
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, scores)
+        self._entries: OrderedDict[str, tuple[float, int, Scores]] = (
+            OrderedDict()
+        )
+        self._inflight: dict[str, Future[Scores]] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, text: str) -> str:
+        """Return the cache key for a text."""
+        digest = hashlib.blake2b(self._namespace, digest_size=16)
+        digest.update(normalize_text(text).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, record_miss: bool = True) -> Scores | None:
+        """Return a copy of the cached scores for a key, if present.
+
+        Args:
+            key: Cache key from `key`.
+            record_miss: Whether to count a miss. Disable when the lookup is
+                followed by `get_or_compute`, which counts it.
+        """
+        with self._lock:
+            scores = self._lookup(key)
+            if scores is None:
+                if record_miss:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            return dict(scores)
+
+    def put(self, key: str, scores: Scores) -> None:
+        """Store scores for a key, evicting least recently used entries."""
+        size = (
+            _ENTRY_OVERHEAD_BYTES
+            + sys.getsizeof(scores)
+            + len(scores) * sys.getsizeof(0.0)
+        )
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = (
+            self._clock() + self.ttl_seconds
+            if self.ttl_seconds is not None
+            else float("inf")
+        )
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (expires_at, size, dict(scores))
+            self._bytes += size
+            self._evict()
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], Future[Scores]]
+    ) -> Future[Scores]:
+        """Return a future for the scores of a key, computing them once.
+
+        A cached result resolves immediately. If the same key is already
+        being computed, the caller waits for that computation. Otherwise
+        `compute` is called and its result cached on success. Every caller
+        gets its own future, so cancelling one never cancels the shared
+        computation.
+
+        Args:
+            key: Cache key from `key`.
+            compute: Function starting the computation and returning its
+                future.
+        """
+        with self._lock:
+            scores = self._lookup(key)
+            if scores is not None:
+                self.hits += 1
+                done: Future[Scores] = Future()
+                done.set_result(dict(scores))
+                return done
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.coalesced += 1
+                return _follow(inflight)
+
+            self.misses += 1
+            inflight = compute()
+            self._inflight[key] = inflight
+
+        inflight.add_done_callback(lambda f: self._complete(key, f))
+        return _follow(inflight)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return cache counters and current memory use."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _lookup(self, key: str) -> Scores | None:
+        """Return cached scores and mark them recently used.
+
+        Must be called with the lock held.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, scores = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._bytes -= size
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return scores
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until within budget.
+
+        Must be called with the lock held.
+        """
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def _complete(self, key: str, future: Future[Scores]) -> None:
+        """Cache the result of a finished computation."""
+        # Store before releasing the in-flight slot so that no lookup in
+        # between misses both
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, future.result())
+        with self._lock:
+            self._inflight.pop(key, None)
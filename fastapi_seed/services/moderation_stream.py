@@ -0,0 +1,329 @@
+"""Streaming moderation of newline-delimited JSON (NDJSON) input."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import threading
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.ndjson import aiter_lines
+
+if TYPE_CHECKING:
+    from fastapi_seed.services.content_moderation import (
+        ContentModerationService,
+    )
+
+# Attempts to score a batch of a streamed request while inference is
+# saturated, with exponential backoff starting at OVERLOAD_BACKOFF seconds
+OVERLOAD_RETRIES = 8
+OVERLOAD_BACKOFF = 0.05
+
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class StreamSettings:
+    """How NDJSON input lines are read and batched.
+
+    Attributes:
+        text_field: Field holding the text in JSON objects.
+        id_field: Field copied from input to output records, if any.
+        batch_size: Number of lines scored together.
+        queue_depth: Maximum number of batches buffered between stages.
+    """
+
+    text_field: str = "text"
+    id_field: str | None = None
+    batch_size: int = 64
+    queue_depth: int = 4
+
+
+@dataclass
+class _Entry:
+    """One parsed input line."""
+
+    line: int
+    id: Any = None
+    text: str | None = None
+    error: str | None = None
+
+
+def _parse_line(
+    line_no: int, line: str | bytes, settings: StreamSettings
+) -> _Entry | None:
+    """Parse an input line holding a JSON object or a JSON string.
+
+    Returns None for blank lines.
+    """
+    if not line.strip():
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return _Entry(line_no, error=f"invalid JSON: {e}")
+
+    if isinstance(record, str):
+        return _Entry(line_no, text=record)
+    if not isinstance(record, dict):
+        return _Entry(line_no, error="expected a JSON object or string")
+
+    entry_id = record.get(settings.id_field) if settings.id_field else None
+    text = record.get(settings.text_field)
+    if not isinstance(text, str):
+        return _Entry(
+            line_no, entry_id, error=f"missing text in {settings.text_field!r}"
+        )
+    return _Entry(line_no, entry_id, text=text)
+
+
+def _batches(
+    lines: Iterable[str | bytes], settings: StreamSettings, start_line: int
+) -> Iterator[list[_Entry]]:
+    """Group parsed lines into batches, skipping lines before start_line."""
+    batch: list[_Entry] = []
+    for line_no, line in enumerate(lines):
+        if line_no < start_line:
+            continue
+        entry = _parse_line(line_no, line, settings)
+        if entry is None:
+            continue
+        batch.append(entry)
+        if len(batch) >= settings.batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _records(
+    batch: list[_Entry],
+    scores: list[dict[str, float]] | None,
+    id_field: str | None,
+    error: str | None = None,
+) -> list[dict]:
+    """Build output records of a batch in input order.
+
+    If `error` is given, the batch was not scored and every line reports
+    that error.
+    """
+    results = iter(scores or [])
+    records = []
+    for entry in batch:
+        record: dict[str, Any] = {"line": entry.line}
+        if id_field:
+            record[id_field] = entry.id
+        if entry.error is None and error is None:
+            record["scores"] = next(results)
+        else:
+            record["error"] = entry.error or error
+        records.append(record)
+    return records
+
+
+def _texts(batch: list[_Entry]) -> list[str]:
+    """Return the texts of the valid entries of a batch."""
+    return [entry.text for entry in batch if entry.text is not None]
+
+
+class _LinePipeline:
+    """Reader and inference threads connected by bounded queues."""
+
+    def __init__(
+        self,
+        service: ContentModerationService,
+        batches: Iterator[list[_Entry]],
+        settings: StreamSettings,
+    ) -> None:
+        self.service = service
+        self.batches = batches
+        self.settings = settings
+        self.stop = threading.Event()
+        self.parsed: queue.Queue = queue.Queue(maxsize=settings.queue_depth)
+        self.scored: queue.Queue = queue.Queue(maxsize=settings.queue_depth)
+
+    def put(self, target: queue.Queue, item: Any) -> bool:
+        """Put an item unless the pipeline is stopping."""
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(self) -> None:
+        """Parse input lines into batches."""
+        try:
+            for batch in self.batches:
+                if not self.put(self.parsed, batch):
+                    return
+        except Exception as e:
+            self.put(self.parsed, e)
+            return
+        self.put(self.parsed, _DONE)
+
+    def infer(self) -> None:
+        """Score parsed batches on the service's inference executor."""
+        while not self.stop.is_set():
+            try:
+                batch = self.parsed.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if batch is _DONE or isinstance(batch, Exception):
+                self.put(self.scored, batch)
+                return
+            texts = _texts(batch)
+            try:
+                scores = (
+                    self.service.executor.submit(
+                        self.service.moderate_texts,
+                        texts,
+                        self.settings.batch_size,
+                    ).result()
+                    if texts
+                    else []
+                )
+            except Exception as e:
+                self.put(self.scored, e)
+                return
+            records = _records(batch, scores, self.settings.id_field)
+            if not self.put(self.scored, records):
+                return
+
+    def run(self) -> Iterator[dict]:
+        """Start the threads and yield scored records in input order."""
+        threads = [
+            threading.Thread(target=self.read, name="moderation-stream-read"),
+            threading.Thread(target=self.infer, name="moderation-stream-infer"),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while (item := self.scored.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+
+def moderate_lines(
+    service: ContentModerationService,
+    lines: Iterable[str | bytes],
+    settings: StreamSettings | None = None,
+    start_line: int = 0,
+) -> Iterator[dict]:
+    """Moderate NDJSON lines through a bounded read/infer/write pipeline.
+
+    A reader thread parses lines into batches, which are scored on the
+    service's inference executor while the caller writes the previous
+    results. At most `queue_depth` batches wait between stages, so memory
+    use does not grow with the size of the input.
+
+    Args:
+        service: Initialized moderation service.
+        lines: Input lines, each a JSON object or a JSON string.
+        settings: Input fields and batching, the defaults if None.
+        start_line: Number of input lines to skip, for resuming.
+
+    Yields:
+        One record per non-blank input line with its zero-based line
+        number and either its scores or an error.
+    """
+    settings = settings or StreamSettings()
+    batches = _batches(lines, settings, start_line)
+    return _LinePipeline(service, batches, settings).run()
+
+
+async def _score_with_retries(
+    service: ContentModerationService, texts: list[str], batch_size: int
+) -> list[dict[str, float]] | None:
+    """Score texts, waiting out short inference saturation.
+
+    Returns None if inference stayed saturated for all retries.
+    """
+    if not texts:
+        return []
+    delay = OVERLOAD_BACKOFF
+    for _ in range(OVERLOAD_RETRIES):
+        try:
+            return await service.moderate_texts_async(texts, batch_size)
+        except InferenceOverloadedError:
+            await asyncio.sleep(delay)
+            delay *= 2
+    return None
+
+
+async def stream_moderated_lines(
+    service: ContentModerationService,
+    chunks: AsyncIterable[bytes],
+    settings: StreamSettings | None = None,
+) -> AsyncIterator[bytes]:
+    """Moderate an NDJSON byte stream and yield NDJSON result lines.
+
+    The request body is read by a producer task into a bounded queue while
+    earlier batches are scored on the inference executor, and results are
+    yielded as soon as each batch is done. Short inference saturation is
+    retried with backoff. If it persists, the lines of the current batch
+    report an overload error and the stream ends, so the client can resume
+    from the first line without scores.
+
+    Args:
+        service: Initialized moderation service.
+        chunks: Raw body chunks of the NDJSON input.
+        settings: Input fields and batching, the defaults if None.
+
+    Yields:
+        Encoded NDJSON output lines.
+    """
+    settings = settings or StreamSettings()
+    batches: asyncio.Queue = asyncio.Queue(maxsize=settings.queue_depth)
+
+    async def produce() -> None:
+        batch: list[_Entry] = []
+        line_no = 0
+        try:
+            async for line in aiter_lines(chunks):
+                if line is None:
+                    entry = _Entry(line_no, error="line too long")
+                else:
+                    entry = _parse_line(line_no, line, settings)
+                line_no += 1
+                if entry is None:
+                    continue
+                batch.append(entry)
+                if len(batch) >= settings.batch_size:
+                    await batches.put(batch)
+                    batch = []
+        finally:
+            # Also when reading the body fails, the lines read so far are
+            # scored and the stream ends; awaiting the producer then raises
+            # the error. A cancelled producer has no consumer left
+            if not asyncio.current_task().cancelling():
+                if batch:
+                    await batches.put(batch)
+                await batches.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (batch := await batches.get()) is not None:
+            scores = await _score_with_retries(
+                service, _texts(batch), settings.batch_size
+            )
+            error = "moderation overloaded" if scores is None else None
+            yield "".join(
+                json.dumps(record) + "\n"
+                for record in _records(batch, scores, settings.id_field, error)
+            ).encode()
+            if error is not None:
+                return
+        await producer
+    finally:
+        producer.cancel()
@@ -0,0 +1,36 @@
+"""Reading newline-delimited JSON (NDJSON) request bodies."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterable, AsyncIterator
+
+# Lines longer than this are reported as errors instead of being buffered
+MAX_LINE_BYTES = 1 << 20
+
+
+async def aiter_lines(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[bytes | None]:
+    """Split a byte stream into lines with bounded buffering.
+
+    Yields None in place of lines longer than `MAX_LINE_BYTES`, which are
+    dropped instead of buffered.
+    """
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if skipping:
+                # Tail of an oversized line
+                skipping = False
+                continue
+            yield line
+        if len(buffer) > MAX_LINE_BYTES:
+            if not skipping:
+                yield None
+            skipping = True
+            buffer = b""
+    if buffer and not skipping:
+        yield buffer
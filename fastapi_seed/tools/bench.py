@@ -0,0 +1,473 @@
+"""Benchmark the heroes and moderation routes of the running application.
+
+Usage:
+    python -m fastapi_seed.tools.bench --concurrency 1 8 32 -o bench.json
+
+Starts the application with uvicorn in a subprocess, on an empty database
+and with a tiny locally generated moderation model unless --model is
+given, so that no network access is needed. Each scenario is then driven
+at each concurrency level by as many client threads with keep-alive
+connections, and one JSON report with the throughput and latency
+percentiles of every run is printed and optionally written to a file.
+With --inference-server, the application forwards moderation to a
+separate `fastapi_seed.tools.serve_inference` process, as web workers do
+in multi-worker deployments. With --timeout-ms, moderation requests carry
+that deadline, and goodput only counts the responses that met it, to see
+whether load shedding keeps goodput up under overload.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+
+import numpy as np
+
+from fastapi_seed.tools.tiny_model import build_tiny_model
+
+SAMPLE_TEXTS = [
+    "Thanks for the quick reply, see you tomorrow!",
+    "I will find you and hurt you.",
+    "Buy cheap followers now, limited offer!!!",
+    "This movie was absolutely terrible, what a waste of time.",
+    "People like you should not be allowed to speak.",
+    "Can someone recommend a good book about databases?",
+]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Request sent repeatedly by a benchmark run.
+
+    Attributes:
+        method: HTTP method.
+        path: Request path.
+        body: Function returning the JSON body of the n-th request, if any.
+        headers: Extra request headers.
+    """
+
+    method: str
+    path: str
+    body: Callable[[int], object] | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def _moderation_text(unique: bool) -> Callable[[int], object]:
+    """Return the body of the n-th moderation request."""
+
+    def body(n: int) -> object:
+        text = SAMPLE_TEXTS[n % len(SAMPLE_TEXTS)]
+        # A distinct text per request bypasses the moderation cache
+        return {"text": f"{text} #{n}" if unique else text}
+
+    return body
+
+
+def scenarios(
+    unique_texts: bool, timeout_ms: int | None = None
+) -> dict[str, Scenario]:
+    """Return the benchmark scenarios by name.
+
+    Args:
+        unique_texts: Send a distinct text per moderation request.
+        timeout_ms: Deadline of moderation requests, none if None.
+    """
+    moderation_headers = {}
+    if timeout_ms is not None:
+        moderation_headers["X-Request-Timeout-Ms"] = str(timeout_ms)
+    return {
+        "heroes_list": Scenario("GET", "/heroes/?limit=100"),
+        "heroes_get_missing": Scenario(
+            "GET", "/heroes/00000000-0000-0000-0000-000000000000"
+        ),
+        "heroes_search": Scenario("GET", "/heroes/search?q=hero+42"),
+        "heroes_create": Scenario(
+            "POST", "/heroes/", lambda n: {"name": f"bench hero {n}"}
+        ),
+        "moderate": Scenario(
+            "POST",
+            "/content-moderation/moderate",
+            _moderation_text(unique_texts),
+            moderation_headers,
+        ),
+    }
+
+
+@dataclass
+class RunResult:
+    """Throughput and latency of one scenario at one concurrency."""
+
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    goodput_rps: float
+    latency_ms: dict[str, float]
+
+
+def summarize(
+    scenario: str,
+    concurrency: int,
+    latencies: Sequence[float],
+    errors: int,
+    duration: float,
+) -> RunResult:
+    """Summarize the latencies in seconds of one run.
+
+    Args:
+        scenario: Scenario name.
+        concurrency: Number of concurrent clients.
+        latencies: Latency of every request, failed ones included.
+        errors: Number of failed requests.
+        duration: Wall time of the run in seconds.
+    """
+    good = len(latencies) - errors
+    milliseconds = np.asarray(latencies, dtype=float) * 1000
+    latency_ms = {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    if len(milliseconds):
+        p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+        latency_ms = {
+            "mean": float(milliseconds.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(milliseconds.max()),
+        }
+    return RunResult(
+        scenario=scenario,
+        concurrency=concurrency,
+        requests=len(milliseconds),
+        errors=errors,
+        duration_s=duration,
+        throughput_rps=len(milliseconds) / duration if duration else 0.0,
+        goodput_rps=good / duration if duration else 0.0,
+        latency_ms=latency_ms,
+    )
+
+
+def run(
+    port: int,
+    name: str,
+    scenario: Scenario,
+    concurrency: int,
+    numbers: range,
+) -> RunResult:
+    """Send requests of a scenario from concurrent keep-alive clients.
+
+    Args:
+        port: Port of the application on localhost.
+        name: Scenario name, for the result.
+        scenario: Requests to send.
+        concurrency: Number of client threads.
+        numbers: Numbers of the requests to send, so that bodies differ
+            across runs.
+
+    Successful responses slower than the scenario's X-Request-Timeout-Ms
+    do not count towards goodput, as their client would have given up.
+    """
+    pending = iter(numbers)
+    lock = threading.Lock()
+    latencies: list[float] = []
+    errors = 0
+    good = 0
+    timeout_ms = scenario.headers.get("X-Request-Timeout-Ms")
+    in_time = float("inf") if timeout_ms is None else int(timeout_ms) / 1000
+
+    def client() -> None:
+        nonlocal errors, good
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        own_latencies = []
+        own_errors = 0
+        own_good = 0
+        try:
+            while (n := next(pending, None)) is not None:
+                body = None
+                headers = dict(scenario.headers)
+                if scenario.body is not None:
+                    body = json.dumps(scenario.body(n))
+                    headers["Content-Type"] = "application/json"
+                started = time.perf_counter()
+                try:
+                    connection.request(
+                        scenario.method, scenario.path, body, headers
+                    )
+                    response = connection.getresponse()
+                    response.read()
+                    failed = response.status >= HTTPStatus.BAD_REQUEST and (
+                        response.status != HTTPStatus.NOT_FOUND
+                    )
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    failed = True
+                latency = time.perf_counter() - started
+                own_latencies.append(latency)
+                own_errors += failed
+                own_good += not failed and latency <= in_time
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors += own_errors
+                good += own_good
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    result = summarize(name, concurrency, latencies, errors, duration)
+    result.goodput_rps = good / duration if duration else 0.0
+    return result
+
+
+def _free_port() -> int:
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(port: int, method: str, path: str, body=None) -> int:
+    """Send one request and return its status."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        headers = {"Content-Type": "application/json"} if body else {}
+        connection.request(
+            method, path, json.dumps(body) if body else None, headers
+        )
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def _environment(model: str) -> dict[str, str]:
+    """Return the environment of the benchmarked processes."""
+    return {
+        **os.environ,
+        "MODERATION_MODEL_NAME": model,
+        "HF_HUB_OFFLINE": "1",
+        "PYTHONPATH": os.pathsep.join(
+            filter(
+                None,
+                [
+                    str(Path(__file__).resolve().parents[2]),
+                    os.environ.get("PYTHONPATH"),
+                ],
+            )
+        ),
+    }
+
+
+def start_inference_server(
+    workdir: Path, env: dict[str, str]
+) -> tuple[subprocess.Popen, Path]:
+    """Start a shared inference server and wait until it listens.
+
+    Returns:
+        The server process and the path of its socket.
+
+    Raises:
+        RuntimeError: If the server exits or is not listening in time.
+    """
+    path = workdir / "moderation.sock"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "fastapi_seed.tools.serve_inference", path],
+        cwd=workdir,
+        env=env,
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(
+                f"Inference server exited with {server.returncode}"
+            )
+        if path.exists():
+            return server, path
+        time.sleep(0.2)
+    stop_app(server)
+    raise RuntimeError("Inference server was not listening in time")
+
+
+def start_app(
+    workdir: Path, env: dict[str, str], port: int
+) -> subprocess.Popen:
+    """Start the application and wait until moderation is ready.
+
+    Raises:
+        RuntimeError: If the application exits or is not ready in time.
+    """
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "fastapi_seed.app:create_app",
+            "--factory",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=workdir,
+        env=env,
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Application exited with {server.returncode}")
+        try:
+            if _request(port, "GET", "/health/ready") == HTTPStatus.OK:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_app(server)
+    raise RuntimeError("Application was not ready in time")
+
+
+def stop_app(server: subprocess.Popen) -> None:
+    """Shut the application or inference server down gracefully."""
+    server.send_signal(signal.SIGINT)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks."""
+    all_scenarios = scenarios(unique_texts=False)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(all_scenarios),
+        default=list(all_scenarios),
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32]
+    )
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Requests per run"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=100, help="Unmeasured requests first"
+    )
+    parser.add_argument(
+        "--heroes", type=int, default=10_000, help="Heroes created first"
+    )
+    parser.add_argument(
+        "--unique-texts",
+        action="store_true",
+        help="Send a distinct text per moderation request",
+    )
+    parser.add_argument(
+        "--model", help="Moderation model, a tiny generated one if omitted"
+    )
+    parser.add_argument(
+        "--inference-server",
+        action="store_true",
+        help="Serve moderation from a separate inference server process",
+    )
+    parser.add_argument(
+        "--timeout-ms",
+        type=int,
+        help="Deadline sent with moderation requests",
+    )
+    parser.add_argument("-o", "--output", help="File to write the report to")
+    args = parser.parse_args(argv)
+
+    selected = scenarios(args.unique_texts, args.timeout_ms)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="fastapi-seed-bench-") as tmp:
+        workdir = Path(tmp)
+        model = args.model
+        if model is None:
+            model = str(build_tiny_model(workdir / "tiny-model"))
+
+        env = _environment(model)
+        processes = []
+        if args.inference_server:
+            inference, path = start_inference_server(workdir, env)
+            processes.append(inference)
+            env["MODERATION_SERVER_SOCKET"] = str(path)
+        port = _free_port()
+        processes.append(start_app(workdir, env, port))
+        try:
+            heroes = [{"name": f"hero {i}"} for i in range(args.heroes)]
+            if heroes:
+                _request(port, "POST", "/heroes/bulk", heroes)
+
+            # Request numbers keep growing so no two creates share a name
+            numbers = itertools.count(step=args.warmup + args.requests)
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    first = next(numbers)
+                    warmup = range(first, first + args.warmup)
+                    measured = range(warmup.stop, warmup.stop + args.requests)
+                    scenario = selected[name]
+                    run(port, name, scenario, concurrency, warmup)
+                    result = run(port, name, scenario, concurrency, measured)
+                    results.append(result)
+                    print(
+                        f"{name} x{concurrency}: "
+                        f"{result.throughput_rps:.0f} req/s, "
+                        f"{result.goodput_rps:.0f} good/s, "
+                        f"p50 {result.latency_ms['p50']:.2f} ms, "
+                        f"p99 {result.latency_ms['p99']:.2f} ms, "
+                        f"{result.errors} errors",
+                        file=sys.stderr,
+                    )
+        finally:
+            # The application first, while it can still reach the server
+            for process in reversed(processes):
+                stop_app(process)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "model": args.model or "tiny",
+        "settings": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "heroes": args.heroes,
+            "unique_texts": args.unique_texts,
+            "inference_server": args.inference_server,
+            "timeout_ms": args.timeout_ms,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
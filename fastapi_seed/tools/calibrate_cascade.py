@@ -0,0 +1,200 @@
+"""Train a moderation cascade and calibrate its thresholds on a sample.
+
+Usage:
+    python -m fastapi_seed.tools.calibrate_cascade samples.jsonl -o cascade.npz
+
+Each sample line is a JSON object with the text and, optionally, the full
+model's scores; texts without scores are scored with the model first. The
+n-gram model is trained to reproduce the scores of all but a held out
+share of the sample, on which every pair of thresholds is evaluated. Terms
+of a --lexicon file, one per line, always escalate.
+
+Prints one JSON report per pair of thresholds with its escalation rate and
+agreement with the full model, followed by the thresholds escalating
+least at --min-agreement. Serve the cascade with MODERATION_CASCADE_PATH
+and those thresholds in MODERATION_CASCADE_CLEAR_BELOW and
+MODERATION_CASCADE_FLAG_ABOVE.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from fastapi_seed.services.moderation_cascade import (
+    CascadeSettings,
+    HashedNgramModel,
+    ModerationCascade,
+    TrainingSettings,
+    calibrate,
+    first_stage_throughput,
+    pick_thresholds,
+)
+
+
+def read_samples(
+    path: str, text_field: str, scores_field: str
+) -> tuple[list[str], list[dict[str, float] | None]]:
+    """Read texts and their scores, if any, from a JSONL file."""
+    texts, scores = [], []
+    with open(path, encoding="utf-8") as samples:
+        for line in samples:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record[text_field])
+                scores.append(record.get(scores_field))
+    return texts, scores
+
+
+def score_missing(
+    texts: list[str], scores: list[dict[str, float] | None], args
+) -> float | None:
+    """Score the texts without scores with the full model, in place.
+
+    Returns:
+        The model's throughput in texts per second, None if no text
+        needed scoring.
+    """
+    missing = [i for i, text_scores in enumerate(scores) if text_scores is None]
+    if not missing:
+        return None
+
+    # Only imported when needed, so calibrating on scored samples does
+    # not load torch
+    from fastapi_seed.services.content_moderation import (  # noqa: PLC0415
+        ContentModerationService,
+        ModerationSettings,
+    )
+
+    service = ContentModerationService.initialize(
+        ModerationSettings(
+            model_name=args.model, backend=args.backend, cache=None
+        )
+    )
+    try:
+        started = time.perf_counter()
+        computed = service.moderate_texts(
+            [texts[i] for i in missing], args.batch_size
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        service.shutdown()
+    for i, text_scores in zip(missing, computed):
+        scores[i] = text_scores
+    return len(missing) / max(elapsed, 1e-9)
+
+
+def threshold(value: str) -> float | None:
+    """Parse a threshold, where "none" disables it."""
+    return None if value.lower() == "none" else float(value)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the calibration."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples", help="JSONL file with sample texts")
+    parser.add_argument(
+        "-o", "--output", help="Cascade file to write, not written if omitted"
+    )
+    parser.add_argument(
+        "--cascade", help="Evaluate this cascade file instead of training"
+    )
+    parser.add_argument(
+        "--lexicon", help="Words and phrases that always escalate, one a line"
+    )
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--scores-field", default="scores")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--features", type=int, default=TrainingSettings.n_features
+    )
+    parser.add_argument("--epochs", type=int, default=TrainingSettings.epochs)
+    parser.add_argument(
+        "--clear-below",
+        type=float,
+        nargs="+",
+        default=[0.01, 0.02, 0.05, 0.1, 0.2],
+    )
+    parser.add_argument(
+        "--flag-above",
+        type=threshold,
+        nargs="+",
+        default=[None, 0.9, 0.95, 0.99],
+    )
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--model", default="KoalaAI/Text-Moderation")
+    parser.add_argument("--backend", default="eager")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    texts, scores = read_samples(
+        args.samples, args.text_field, args.scores_field
+    )
+    if not texts:
+        parser.error(f"No samples in {args.samples}")
+    model_throughput = score_missing(texts, scores, args)
+
+    if args.cascade:
+        cascade = ModerationCascade.load(CascadeSettings(path=args.cascade))
+        categories = cascade.categories
+        evaluated = np.arange(len(texts))
+    else:
+        categories = list(scores[0])
+        order = np.random.default_rng(args.seed).permutation(len(texts))
+        holdout = max(1, int(len(texts) * args.holdout))
+        evaluated, trained = order[:holdout], order[holdout:]
+        lexicon = []
+        if args.lexicon:
+            lexicon = Path(args.lexicon).read_text(encoding="utf-8").split("\n")
+        cascade = ModerationCascade(
+            HashedNgramModel.train(
+                [texts[i] for i in trained],
+                np.array([[scores[i][c] for c in categories] for i in trained]),
+                categories,
+                TrainingSettings(
+                    n_features=args.features,
+                    epochs=args.epochs,
+                    seed=args.seed,
+                ),
+            ),
+            [term for term in lexicon if term.strip()],
+        )
+        if args.output:
+            cascade.save(args.output)
+
+    sample = [texts[i] for i in evaluated]
+    reports = calibrate(
+        cascade,
+        sample,
+        np.array([[scores[i][c] for c in categories] for i in evaluated]),
+        itertools.product(args.clear_below, args.flag_above),
+    )
+    for report in reports:
+        print(json.dumps(report.to_dict()))
+
+    recommended = pick_thresholds(reports, args.min_agreement)
+    screening = first_stage_throughput(cascade, sample)
+    summary = {
+        "evaluated": len(sample),
+        "first_stage_texts_per_second": screening,
+        "model_texts_per_second": model_throughput,
+        "recommended": recommended.to_dict() if recommended else None,
+    }
+    if recommended is not None and model_throughput is not None:
+        # Every text is screened, and escalated texts also run the model
+        summary["estimated_texts_per_second"] = 1 / (
+            1 / screening + recommended.escalation_rate / model_throughput
+        )
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Compare moderation inference backends against the float32 reference.
+
+Usage:
+    python -m fastapi_seed.tools.check_backends --samples samples.jsonl
+
+Prints one JSON report per backend with its score error and throughput,
+followed by the fastest backend within tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Iterator
+
+from fastapi_seed.services.inference_backends import (
+    BACKENDS,
+    ComparisonSettings,
+    compare_backends,
+    pick_backend,
+)
+
+DEFAULT_SAMPLES = [
+    "Thanks for the quick reply, see you tomorrow!",
+    "I will find you and hurt you.",
+    "Buy cheap followers now, limited offer!!!",
+    "This movie was absolutely terrible, what a waste of time.",
+    "People like you should not be allowed to speak.",
+    "Can someone recommend a good book about databases?",
+]
+
+
+def read_samples(path: str, text_field: str) -> Iterator[str]:
+    """Read texts from a JSONL file with one object per line."""
+    with open(path, encoding="utf-8") as samples:
+        for line in samples:
+            if line.strip():
+                yield json.loads(line)[text_field]
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the backend comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="KoalaAI/Text-Moderation")
+    parser.add_argument("--revision", default=None)
+    parser.add_argument(
+        "--samples", help="JSONL file with sample texts, built-in if omitted"
+    )
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS)
+    )
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    texts = (
+        list(read_samples(args.samples, args.text_field))
+        if args.samples
+        else DEFAULT_SAMPLES
+    )
+    reports = compare_backends(
+        args.model,
+        texts,
+        ComparisonSettings(
+            backends=args.backends,
+            tolerance=args.tolerance,
+            batch_size=args.batch_size,
+            revision=args.revision,
+        ),
+    )
+    for report in reports:
+        print(json.dumps(report.to_dict()))
+    print(json.dumps({"recommended_backend": pick_backend(reports)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
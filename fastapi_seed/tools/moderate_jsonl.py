@@ -0,0 +1,107 @@
+"""Moderate a JSONL file and write scores as JSONL.
+
+Usage:
+    python -m fastapi_seed.tools.moderate_jsonl input.jsonl -o scores.jsonl
+
+Each output line holds the zero-based input line number and either the
+scores or an error. After an interruption, pass the line number following
+the last written record as --start-line to append the remaining results.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from fastapi_seed.services.content_moderation import (
+    ContentModerationService,
+    ModerationSettings,
+)
+from fastapi_seed.services.inference_backends import BACKENDS
+from fastapi_seed.services.moderation_stream import (
+    StreamSettings,
+    moderate_lines,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the bulk moderation."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL input file, - for stdin")
+    parser.add_argument(
+        "-o", "--output", help="JSONL output, stdout if omitted"
+    )
+    parser.add_argument("--start-line", type=int, default=0)
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queue-depth", type=int, default=4)
+    parser.add_argument("--model", default="KoalaAI/Text-Moderation")
+    parser.add_argument("--backend", choices=BACKENDS, default="eager")
+    parser.add_argument("--long-text", action="store_true")
+    parser.add_argument("--log-every", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    # Bulk inputs rarely repeat texts, so skip the result cache
+    service = ContentModerationService.initialize(
+        ModerationSettings(
+            model_name=args.model,
+            backend=args.backend,
+            long_text=args.long_text,
+            cache=None,
+        )
+    )
+
+    source = (
+        sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")  # noqa: SIM115
+    )
+    # Resumed runs append to the results written so far
+    mode = "a" if args.start_line else "w"
+    sink = (
+        sys.stdout
+        if args.output is None
+        else open(args.output, mode, encoding="utf-8")  # noqa: SIM115
+    )
+
+    started = time.perf_counter()
+    written = 0
+    try:
+        for record in moderate_lines(
+            service,
+            source,
+            StreamSettings(
+                text_field=args.text_field,
+                id_field=args.id_field,
+                batch_size=args.batch_size,
+                queue_depth=args.queue_depth,
+            ),
+            start_line=args.start_line,
+        ):
+            sink.write(json.dumps(record) + "\n")
+            written += 1
+            if written % args.log_every == 0:
+                logger.info(
+                    "%d records, next start line %d, %.1f records/s",
+                    written,
+                    record["line"] + 1,
+                    written / (time.perf_counter() - started),
+                )
+    finally:
+        sink.flush()
+        if sink is not sys.stdout:
+            sink.close()
+        if source is not sys.stdin:
+            source.close()
+        service.shutdown()
+
+    logger.info("Done: %d records", written)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
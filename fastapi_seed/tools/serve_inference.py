@@ -0,0 +1,43 @@
+r"""Serve the moderation model to the web workers of this host.
+
+Usage:
+    python -m fastapi_seed.tools.serve_inference /run/moderation.sock
+    MODERATION_SERVER_SOCKET=/run/moderation.sock \
+        uvicorn fastapi_seed.app:create_app --factory --workers 4
+
+The model is loaded with the application's moderation settings, including
+MODERATION_MODEL_NAME, and the socket is only created once it is warmed
+up. Web workers started with MODERATION_SERVER_SOCKET forward moderation
+to this process instead of loading the model, and report ready once
+connected.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+from fastapi_seed.app import moderation_settings
+from fastapi_seed.services.content_moderation import ContentModerationService
+from fastapi_seed.services.inference_server import InferenceServer
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the inference server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("socket", help="Path of the Unix socket to create")
+    args = parser.parse_args(argv)
+
+    service = ContentModerationService.initialize(moderation_settings())
+    try:
+        asyncio.run(InferenceServer(service, args.socket).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
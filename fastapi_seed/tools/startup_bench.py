@@ -0,0 +1,192 @@
+"""Measure the cold-start cost of the application per feature profile.
+
+Usage:
+    python -m fastapi_seed.tools.startup_bench -o startup.json
+    python -m fastapi_seed.tools.startup_bench --budget heroes=1.5,250
+
+Each run imports `fastapi_seed.app`, creates the app and runs its
+startup in a fresh interpreter, and records the time of each step, the
+whole process time including interpreter startup, the peak RSS once the
+app is started, and whether torch was imported. The report holds the
+median of each per profile. With --budget PROFILE=SECONDS,MB, the exit
+status is 1 if a profile's median time to start serving (import,
+creation and startup) or RSS exceeds its budget, so cold-start
+regressions fail CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROFILES = ("heroes", "moderation", "heroes,moderation")
+
+# Run in a fresh interpreter, so nothing is imported beforehand
+_PROBE = """
+import asyncio, json, resource, sys, time
+started = time.perf_counter()
+from fastapi_seed.app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1].split(","))
+created = time.perf_counter()
+
+async def start():
+    global serving, rss
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter()
+        # Kilobytes on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+asyncio.run(start())
+print(json.dumps({
+    "import_s": imported - started,
+    "create_s": created - imported,
+    "startup_s": serving - created,
+    "ready_s": serving - started,
+    "rss_mb": rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    "modules": len(sys.modules),
+    "torch": "torch" in sys.modules,
+}))
+"""
+
+
+def measure_startup(profile: str) -> dict:
+    """Start the app with a profile in a fresh interpreter.
+
+    The app runs in a temporary directory, with a new hero database and
+    the Hugging Face hub offline, so the moderation model loading in the
+    background fails at once instead of downloading.
+
+    Args:
+        profile: Comma-separated features to enable.
+
+    Returns:
+        Seconds to import, create and start the app, in total until it
+        serves, and to run the whole process, peak RSS in MB once
+        started, the number of imported modules and whether torch was
+        imported.
+
+    Raises:
+        subprocess.CalledProcessError: If the app cannot be started.
+    """
+    env = {
+        **os.environ,
+        "HF_HUB_OFFLINE": "1",
+        "PYTHONPATH": os.pathsep.join(
+            filter(
+                None,
+                [
+                    str(Path(__file__).resolve().parents[2]),
+                    os.environ.get("PYTHONPATH"),
+                ],
+            )
+        ),
+    }
+    with tempfile.TemporaryDirectory(prefix="fastapi-seed-startup-") as tmp:
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, profile],
+            capture_output=True,
+            check=True,
+            cwd=tmp,
+            env=env,
+            text=True,
+        ).stdout
+        process_s = time.perf_counter() - started
+    return {**json.loads(output.splitlines()[-1]), "process_s": process_s}
+
+
+def summarize(runs: list[dict]) -> dict:
+    """Return the median of each measurement of a profile's runs."""
+    return {
+        "runs": len(runs),
+        **{
+            key: statistics.median(run[key] for run in runs)
+            for key in (
+                "import_s",
+                "create_s",
+                "startup_s",
+                "ready_s",
+                "process_s",
+                "rss_mb",
+            )
+        },
+        "modules": max(run["modules"] for run in runs),
+        "imports_torch": any(run["torch"] for run in runs),
+    }
+
+
+def _budget(value: str) -> tuple[str, float, float]:
+    """Parse a PROFILE=SECONDS,MB budget."""
+    try:
+        profile, limits = value.split("=")
+        seconds, megabytes = limits.split(",")
+        return profile, float(seconds), float(megabytes)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"Expected PROFILE=SECONDS,MB, got {value!r}"
+        ) from e
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per profile"
+    )
+    parser.add_argument(
+        "--budget",
+        type=_budget,
+        action="append",
+        default=[],
+        help="Maximum median seconds to serve and RSS MB of a profile",
+    )
+    parser.add_argument("-o", "--output", help="File to write the report to")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for profile in args.profiles:
+        runs = [measure_startup(profile) for _ in range(args.repeat)]
+        results[profile] = summarize(runs)
+        print(
+            f"{profile}: ready in {results[profile]['ready_s']:.2f} s, "
+            f"{results[profile]['rss_mb']:.0f} MB",
+            file=sys.stderr,
+        )
+
+    exceeded = [
+        f"{profile}: ready in {results[profile]['ready_s']:.2f} s "
+        f"(budget {seconds} s), {results[profile]['rss_mb']:.0f} MB "
+        f"(budget {megabytes} MB)"
+        for profile, seconds, megabytes in args.budget
+        if profile in results
+        and (
+            results[profile]["ready_s"] > seconds
+            or results[profile]["rss_mb"] > megabytes
+        )
+    ]
+
+    report = {
+        "python": sys.version.split()[0],
+        "results": results,
+        "exceeded": exceeded,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    for message in exceeded:
+        print(f"Startup budget exceeded: {message}", file=sys.stderr)
+    return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
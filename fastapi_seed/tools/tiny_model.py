@@ -0,0 +1,104 @@
+"""Generate a tiny stand-in moderation model for offline benchmarks.
+
+Usage:
+    python -m fastapi_seed.tools.tiny_model OUTPUT_DIR
+
+The model has the labels of the moderation model and seeded random
+weights, so its scores are meaningless but reproducible. It loads into
+`ContentModerationService` with `ModerationSettings(model_name=OUTPUT_DIR)`
+without network access, and runs a forward pass in about a millisecond.
+"""
+
+from __future__ import annotations
+
+import argparse
+import string
+import sys
+from pathlib import Path
+
+import torch
+from transformers import (
+    BertConfig,
+    BertForSequenceClassification,
+    BertTokenizerFast,
+)
+
+from fastapi_seed.services.content_moderation import ContentModerationService
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+# Whole words in the vocabulary besides single characters
+WORDS = [
+    "the", "you", "is", "to", "and", "of", "this", "that", "for",
+    "will", "hurt", "find", "buy", "now", "good", "bad", "warm", "up",
+]  # fmt: skip
+
+
+def build_tiny_model(
+    path: str | Path,
+    seed: int = 0,
+    hidden_size: int = 32,
+    num_layers: int = 2,
+) -> Path:
+    """Write a tiny sequence classification model and its tokenizer.
+
+    Args:
+        path: Directory to write the model to, created if missing.
+        seed: Seed of the random weights.
+        hidden_size: Width of the model.
+        num_layers: Number of transformer layers.
+
+    Returns:
+        The model directory, to pass as the model name.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    characters = string.ascii_lowercase + string.digits + string.punctuation
+    vocab = [
+        *SPECIAL_TOKENS,
+        *characters,
+        *(f"##{character}" for character in characters),
+        *WORDS,
+    ]
+    vocab_file = path / "vocab.txt"
+    vocab_file.write_text("\n".join(vocab) + "\n", encoding="utf-8")
+    tokenizer = BertTokenizerFast(
+        vocab_file=str(vocab_file),
+        model_max_length=ContentModerationService.MAX_LENGTH,
+    )
+
+    labels = list(ContentModerationService.CATEGORY_MAPPING)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=2,
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=ContentModerationService.MAX_LENGTH,
+        num_labels=len(labels),
+        id2label=dict(enumerate(labels)),
+        label2id={label: i for i, label in enumerate(labels)},
+        problem_type="multi_label_classification",
+    )
+    torch.manual_seed(seed)
+    model = BertForSequenceClassification(config)
+
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Write the tiny model."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="Directory to write the model to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(build_tiny_model(args.output, seed=args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Tests for content moderation routes."""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+from fastapi_seed.api.content_moderation import get_moderation_service, router
+from fastapi_seed.repository.database import DatabaseManager
+from fastapi_seed.services.admission import Priority
+from fastapi_seed.services.batching import DeadlineExceededError
+from fastapi_seed.services.content_moderation import ContentModerationService
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.moderation_audit import ModerationAuditLog
+from fastapi_seed.services.moderation_stream import stream_moderated_lines
+
+
+@pytest.fixture
+def app():
+    """Create test app."""
+    test_app = FastAPI()
+    test_app.include_router(router)
+    return test_app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return TestClient(app)
+
+
+@pytest.fixture
+def mock_service(client, mocker):
+    """Override the moderation service with a mock."""
+    service = mocker.Mock()
+    service.moderate_text_async = mocker.AsyncMock()
+    service.moderate_texts_async = mocker.AsyncMock()
+    mocker.patch.object(
+        client.app,
+        "dependency_overrides",
+        {get_moderation_service: lambda: service},
+    )
+    return service
+
+
+class TestModerateContent:
+    """Test moderate endpoint."""
+
+    def test_moderate_success(self, client, mock_service):
+        """Test successful moderation."""
+        # Arrange
+        scores = {"Safe Content": 0.98, "Violence": 0.01}
+        mock_service.moderate_text_async.return_value = scores
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate", json={"text": "hello"}
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"scores": scores, "request_rate": 0.0}
+        mock_service.moderate_text_async.assert_awaited_once_with(
+            "hello", Priority.NORMAL, None
+        )
+
+    def test_moderate_priority_and_deadline(self, client, mock_service):
+        """Test the admission headers are passed to the service."""
+        # Arrange
+        mock_service.moderate_text_async.return_value = {"Violence": 0.5}
+        started = time.monotonic()
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate",
+            json={"text": "hello"},
+            headers={"X-Priority": "low", "X-Request-Timeout-Ms": "250"},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        text, priority, deadline = (
+            mock_service.moderate_text_async.await_args.args
+        )
+        assert (text, priority) == ("hello", Priority.LOW)
+        assert started + 0.25 <= deadline <= time.monotonic() + 0.25
+
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            {"X-Priority": "urgent"},
+            {"X-Request-Timeout-Ms": "soon"},
+            {"X-Request-Timeout-Ms": "0"},
+        ],
+    )
+    def test_moderate_invalid_admission(self, client, mock_service, headers):
+        """Test unknown priorities and invalid timeouts are rejected."""
+        response = client.post(
+            "/content-moderation/moderate", json={"text": "hi"}, headers=headers
+        )
+
+        assert response.status_code == 422
+        mock_service.moderate_text_async.assert_not_awaited()
+
+    def test_moderate_deadline_exceeded(self, client, mock_service):
+        """Test a text dropped at its deadline returns 504."""
+        # Arrange
+        mock_service.moderate_text_async.side_effect = DeadlineExceededError(
+            "late"
+        )
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate", json={"text": "hello"}
+        )
+
+        # Assert
+        assert response.status_code == 504
+
+    def test_moderate_overloaded(self, client, mock_service):
+        """Test saturated inference returns a fast 429."""
+        # Arrange
+        mock_service.moderate_text_async.side_effect = InferenceOverloadedError(
+            "full"
+        )
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate", json={"text": "hello"}
+        )
+
+        # Assert
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+    def test_moderate_before_model_ready(self, client, mocker):
+        """Test moderation fails fast while the model is loading."""
+        # Arrange
+        mocker.patch.object(
+            ContentModerationService, "is_ready", return_value=False
+        )
+        mocker.patch.object(
+            ContentModerationService, "load_error", return_value=None
+        )
+        service_init = mocker.patch.object(ContentModerationService, "__init__")
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate", json={"text": "hello"}
+        )
+
+        # Assert
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+        service_init.assert_not_called()
+
+    def test_moderate_invalid_data(self, client, mock_service):
+        """Test moderation without text is rejected."""
+        response = client.post("/content-moderation/moderate", json={})
+
+        assert response.status_code == 422
+        mock_service.moderate_text_async.assert_not_called()
+
+
+class TestModerateContentBatch:
+    """Test batch moderate endpoint."""
+
+    def test_moderate_batch_success(self, client, mock_service):
+        """Test scores are returned in input order."""
+        # Arrange
+        results = [{"Safe Content": 0.9}, {"Safe Content": 0.1}]
+        mock_service.moderate_texts_async.return_value = results
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate/batch",
+            json={"texts": ["hello", "go away"]},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"results": results, "request_rate": 0.0}
+        mock_service.moderate_texts_async.assert_awaited_once_with(
+            ["hello", "go away"]
+        )
+
+    def test_moderate_batch_empty(self, client, mock_service):
+        """Test an empty batch is rejected."""
+        response = client.post(
+            "/content-moderation/moderate/batch", json={"texts": []}
+        )
+
+        assert response.status_code == 422
+        mock_service.moderate_texts_async.assert_not_called()
+
+
+class TestModerateContentStream:
+    """Test streaming moderate endpoint."""
+
+    def test_moderate_stream(self, client, mock_service):
+        """Test NDJSON lines are scored in order with per-line errors."""
+        # Arrange
+        mock_service.moderate_texts_async.side_effect = lambda texts, _: [
+            {"Safe Content": float(len(text))} for text in texts
+        ]
+        body = '{"id": 7, "text": "hello"}\nnot json\n\n"hey"\n'
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate/stream?id_field=id",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records[0] == {
+            "line": 0,
+            "id": 7,
+            "scores": {"Safe Content": 5.0},
+        }
+        assert records[1]["line"] == 1
+        assert "error" in records[1]
+        assert records[2] == {
+            "line": 3,
+            "id": None,
+            "scores": {"Safe Content": 3.0},
+        }
+
+    def test_moderate_stream_body_error(self, mock_service):
+        """Test a failing body read ends the stream after the lines read."""
+        # Arrange
+        mock_service.moderate_texts_async.side_effect = lambda texts, _: [
+            {"Safe Content": 1.0} for _ in texts
+        ]
+
+        async def chunks():
+            yield b'"hello"\n"hey'
+            raise ClientDisconnect()
+
+        async def collect(output):
+            async for chunk in stream_moderated_lines(mock_service, chunks()):
+                output.append(json.loads(chunk))
+
+        # Act
+        records = []
+        with pytest.raises(ClientDisconnect):
+            asyncio.run(asyncio.wait_for(collect(records), timeout=5))
+
+        # Assert
+        assert records == [{"line": 0, "scores": {"Safe Content": 1.0}}]
+
+    def test_moderate_stream_overloaded(self, client, mock_service, mocker):
+        """Test persistent overload ends the stream with error records."""
+        # Arrange
+        mocker.patch(
+            "fastapi_seed.services.moderation_stream.OVERLOAD_BACKOFF", 0
+        )
+        mock_service.moderate_texts_async.side_effect = (
+            InferenceOverloadedError("full")
+        )
+
+        # Act
+        response = client.post(
+            "/content-moderation/moderate/stream",
+            content='"hello"\n"hey"\n',
+        )
+
+        # Assert
+        assert response.status_code == 200
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records == [
+            {"line": 0, "error": "moderation overloaded"},
+            {"line": 1, "error": "moderation overloaded"},
+        ]
+
+
+@pytest.fixture
+def audited(tmp_path, mocker):
+    """Create a database with two audited decisions."""
+    mocker.patch.object(DatabaseManager, "_instance", None)
+    manager = DatabaseManager(
+        db_file=str(tmp_path / "moderation.db"),
+        pool_size=1,
+        max_overflow=0,
+        timeout=1,
+    )
+    log = ModerationAuditLog()
+    log.start(manager)
+    log.record_many(
+        "model",
+        ["hello", "hit"],
+        [{"Safe Content": 0.9, "Violence": 0.1}, {"Violence": 0.7}],
+    )
+    log.shutdown()
+    yield manager
+    manager.dispose()
+
+
+@pytest.mark.usefixtures("audited")
+class TestModerationAnalytics:
+    """Test moderation analytics endpoint."""
+
+    def test_analytics_last_day(self, client):
+        """Test decisions of the last day are aggregated per hour."""
+        response = client.get("/content-moderation/analytics")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["bucket_seconds"] == 3600
+        assert [b["decisions"] for b in body["buckets"]] == [2]
+        assert body["buckets"][0]["flagged_rate"] == 0.5
+        assert set(body["buckets"][0]["categories"]) == {
+            "Safe Content",
+            "Violence",
+        }
+
+    def test_analytics_time_range(self, client):
+        """Test an aware time range without decisions has no buckets."""
+        response = client.get(
+            "/content-moderation/analytics",
+            params={
+                "bucket": "minute",
+                "since": "2020-01-01T01:00:00+01:00",
+                "until": "2020-01-01T01:00:00Z",
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json()["buckets"] == []
+
+    @pytest.mark.parametrize(
+        ("bucket", "since"),
+        [("minute", "2000-01-01T00:00:00"), ("week", None)],
+    )
+    def test_analytics_invalid(self, client, bucket, since):
+        """Test too many or unknown buckets are rejected."""
+        params = {"bucket": bucket}
+        if since:
+            params["since"] = since
+
+        response = client.get("/content-moderation/analytics", params=params)
+
+        assert response.status_code == 422
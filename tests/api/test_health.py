@@ -0,0 +1,88 @@
+"""Tests for health check routes."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_seed.api.health import router
+from fastapi_seed.services.content_moderation import ContentModerationService
+
+
+@pytest.fixture
+def app():
+    """Create test app."""
+    test_app = FastAPI()
+    test_app.include_router(router)
+    return test_app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return TestClient(app)
+
+
+class TestHealth:
+    """Test liveness and readiness probes."""
+
+    def test_live(self, client):
+        """Test liveness does not depend on the model."""
+        response = client.get("/health/live")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "alive"}
+
+    def test_ready(self, client, mocker):
+        """Test readiness once the model is loaded."""
+        mocker.patch.object(
+            ContentModerationService, "is_ready", return_value=True
+        )
+
+        response = client.get("/health/ready")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+    def test_not_ready_while_loading(self, client, mocker):
+        """Test readiness fails while the model is loading."""
+        mocker.patch.object(
+            ContentModerationService, "is_ready", return_value=False
+        )
+        mocker.patch.object(
+            ContentModerationService, "load_error", return_value=None
+        )
+
+        response = client.get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json() == {"status": "loading"}
+
+    def test_not_ready_after_failure(self, client, mocker):
+        """Test readiness reports why loading failed."""
+        mocker.patch.object(
+            ContentModerationService, "is_ready", return_value=False
+        )
+        mocker.patch.object(
+            ContentModerationService,
+            "load_error",
+            return_value=OSError("no such model"),
+        )
+
+        response = client.get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json() == {
+            "status": "failed",
+            "error": "OSError: no such model",
+        }
+
+    def test_ready_without_moderation(self, client, app, mocker):
+        """Test an app serving no moderation is ready without the model."""
+        app.state.features = frozenset({"heroes"})
+        is_ready = mocker.patch.object(ContentModerationService, "is_ready")
+
+        response = client.get("/health/ready")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+        is_ready.assert_not_called()
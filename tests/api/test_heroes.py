@@ -1,12 +1,22 @@
 """Tests for heroes routes."""
 
+import base64
+import json
+from uuid import uuid4
+
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from pydantic_core import to_json
 
-from fastapi_seed.api.dependencies.services import get_heroes_service
+from fastapi_seed.api.dependencies.services import (
+    get_async_heroes_service,
+    get_heroes_service,
+)
 from fastapi_seed.api.heroes import router
-from fastapi_seed.models.hero import Hero, HeroCreate
+from fastapi_seed.models.hero import Hero, HeroCreate, HeroMatch
+from fastapi_seed.repository.executor import DatabaseOverloadedError
+from fastapi_seed.services.heroes import EXPORT_FORMATS, decode_cursor
 
 
 @pytest.fixture
@@ -44,11 +54,13 @@ class TestCreateHero:
         """Test successful hero creation."""
         # Arrange
         mock_service = mocker.Mock()
-        mock_service.create_hero.return_value = sample_hero
+        mock_service.create_hero_async = mocker.AsyncMock(
+            return_value=sample_hero
+        )
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
 
         # Act
@@ -57,7 +69,9 @@ class TestCreateHero:
         # Assert
         assert response.status_code == 200
         assert response.json() == sample_hero.model_dump()
-        mock_service.create_hero.assert_called_once_with(sample_hero_create)
+        mock_service.create_hero_async.assert_awaited_once_with(
+            sample_hero_create
+        )
 
     def test_create_hero_invalid_data(self, client, mocker):
         """Test hero creation with invalid data."""
@@ -66,7 +80,7 @@ class TestCreateHero:
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
         invalid_data = {"name": ""}  # Missing required fields
 
@@ -75,7 +89,7 @@ class TestCreateHero:
 
         # Assert
         assert response.status_code == 422
-        mock_service.create_hero.assert_not_called()
+        mock_service.create_hero_async.assert_not_called()
 
     def test_create_hero_service_error(
         self, client, mocker, sample_hero_create
@@ -83,11 +97,13 @@ class TestCreateHero:
         """Test hero creation when service raises an error."""
         # Arrange
         mock_service = mocker.Mock()
-        mock_service.create_hero.side_effect = Exception("Database error")
+        mock_service.create_hero_async = mocker.AsyncMock(
+            side_effect=Exception("Database error")
+        )
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
 
         # Act
@@ -95,7 +111,9 @@ class TestCreateHero:
 
         # Assert
         assert response.status_code == 500
-        mock_service.create_hero.assert_called_once_with(sample_hero_create)
+        mock_service.create_hero_async.assert_awaited_once_with(
+            sample_hero_create
+        )
 
 
 class TestReadHeroes:
@@ -109,11 +127,16 @@ class TestReadHeroes:
             Hero(id=2, name="Iron Man", secret_name="Tony Stark", age=45),
         ]
         mock_service = mocker.Mock()
-        mock_service.get_heroes.return_value = heroes
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            return_value=(
+                to_json([hero.model_dump() for hero in heroes]),
+                None,
+            )
+        )
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
 
         # Act
@@ -122,17 +145,21 @@ class TestReadHeroes:
         # Assert
         assert response.status_code == 200
         assert response.json() == [hero.model_dump() for hero in heroes]
-        mock_service.get_heroes.assert_called_once_with()
+        mock_service.get_heroes_json.assert_awaited_once_with(
+            100, None, None, validate=False
+        )
 
     def test_read_heroes_empty_list(self, client, mocker):
         """Test heroes retrieval when no heroes exist."""
         # Arrange
         mock_service = mocker.Mock()
-        mock_service.get_heroes.return_value = []
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            return_value=(b"[]", None)
+        )
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
 
         # Act
@@ -141,17 +168,21 @@ class TestReadHeroes:
         # Assert
         assert response.status_code == 200
         assert response.json() == []
-        mock_service.get_heroes.assert_called_once_with()
+        mock_service.get_heroes_json.assert_awaited_once_with(
+            100, None, None, validate=False
+        )
 
     def test_read_heroes_service_error(self, client, mocker):
         """Test heroes retrieval when service raises an error."""
         # Arrange
         mock_service = mocker.Mock()
-        mock_service.get_heroes.side_effect = Exception("Database error")
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            side_effect=Exception("Database error")
+        )
         mocker.patch.object(
             client.app,
             "dependency_overrides",
-            {get_heroes_service: lambda: mock_service},
+            {get_async_heroes_service: lambda: mock_service},
         )
 
         # Act
@@ -159,7 +190,109 @@ class TestReadHeroes:
 
         # Assert
         assert response.status_code == 500
-        mock_service.get_heroes.assert_called_once_with()
+        mock_service.get_heroes_json.assert_awaited_once_with(
+            100, None, None, validate=False
+        )
+
+    @pytest.mark.parametrize(
+        ("method", "path", "json"),
+        [
+            ("get_heroes_json", "/heroes/", None),
+            ("get_hero_json", f"/heroes/{uuid4()}", None),
+            ("search_heroes", "/heroes/search?q=storm", None),
+            ("create_hero_async", "/heroes/", {"name": "Storm"}),
+        ],
+    )
+    def test_overloaded_database(self, client, mocker, method, path, json):
+        """Test calls the database cannot queue fail fast with a 503."""
+        # Arrange
+        mock_service = mocker.Mock()
+        setattr(
+            mock_service,
+            method,
+            mocker.AsyncMock(side_effect=DatabaseOverloadedError("busy")),
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        if json is None:
+            response = client.get(path)
+        else:
+            response = client.post(path, json=json)
+
+        # Assert
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_read_heroes_next_page(self, client, mocker):
+        """Test the next page cursor is returned in a header."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            return_value=(b"[]", "next")
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get(
+            "/heroes/", params={"limit": 1, "cursor": "abc", "name_prefix": "S"}
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["X-Next-Cursor"] == "next"
+        mock_service.get_heroes_json.assert_awaited_once_with(
+            1, "abc", "S", validate=False
+        )
+
+    def test_read_heroes_invalid_cursor(self, client, mocker):
+        """Test an invalid cursor is a client error."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            side_effect=ValueError("Invalid cursor")
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get("/heroes/", params={"cursor": "abc"})
+
+        # Assert
+        assert response.status_code == 400
+        assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.parametrize("key", [["a", 5], [5, str(uuid4())], "ab"])
+    def test_read_heroes_wrong_type_cursor(self, client, mocker, key):
+        """Test a well-formed cursor holding the wrong types is a 400."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mock_service.get_heroes_json = mocker.AsyncMock(
+            side_effect=lambda _limit, cursor, *_, **__: decode_cursor(cursor)
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+        cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+        # Act
+        response = client.get("/heroes/", params={"cursor": cursor})
+
+        # Assert
+        assert response.status_code == 400
 
 
 class TestRouterConfiguration:
@@ -172,3 +305,263 @@ class TestRouterConfiguration:
     def test_router_tags(self):
         """Test router has correct tags."""
         assert router.tags == ["heroes"]
+
+
+class TestReadHero:
+    """Test read hero endpoint."""
+
+    def test_read_hero(self, client, mocker):
+        """Test a hero is returned by id."""
+        # Arrange
+        hero_id = uuid4()
+        mock_service = mocker.Mock()
+        mock_service.get_hero_json = mocker.AsyncMock(
+            return_value=to_json({"id": hero_id, "name": "Storm"})
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get(f"/heroes/{hero_id}")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"id": str(hero_id), "name": "Storm"}
+        mock_service.get_hero_json.assert_awaited_once_with(hero_id)
+
+    def test_read_missing_hero(self, client, mocker):
+        """Test an unknown id is not found."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mock_service.get_hero_json = mocker.AsyncMock(return_value=None)
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get(f"/heroes/{uuid4()}")
+
+        # Assert
+        assert response.status_code == 404
+
+
+class TestSearchHeroes:
+    """Test search heroes endpoint."""
+
+    def test_search_heroes(self, client, mocker):
+        """Test matches are returned best first."""
+        # Arrange
+        hero_id = uuid4()
+        mock_service = mocker.Mock()
+        mock_service.search_heroes = mocker.AsyncMock(
+            return_value=[
+                HeroMatch(id=hero_id, name="Storm", score=1.5),
+                HeroMatch(id=uuid4(), name="Strom", score=0.5, fuzzy=True),
+            ]
+        )
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get("/heroes/search", params={"q": "storm"})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json()[0] == {
+            "id": str(hero_id),
+            "name": "Storm",
+            "score": 1.5,
+            "fuzzy": False,
+        }
+        assert response.json()[1]["fuzzy"]
+        mock_service.search_heroes.assert_awaited_once_with("storm", 20)
+
+    def test_search_requires_query(self, client, mocker):
+        """Test a missing or empty query is rejected."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_async_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        responses = [
+            client.get("/heroes/search"),
+            client.get("/heroes/search", params={"q": ""}),
+        ]
+
+        # Assert
+        assert [response.status_code for response in responses] == [422, 422]
+
+
+class TestExportHeroes:
+    """Test export heroes endpoint."""
+
+    @pytest.mark.parametrize(
+        ("request_options", "export_format"),
+        [
+            ({}, "ndjson"),
+            ({"params": {"format": "parquet"}}, "parquet"),
+            (
+                {
+                    "headers": {
+                        "Accept": "text/html, application/vnd.apache.parquet"
+                    }
+                },
+                "parquet",
+            ),
+        ],
+    )
+    def test_export_heroes(
+        self, client, mocker, request_options, export_format
+    ):
+        """Test the format is chosen by query parameter or Accept header."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mock_service.export_heroes.return_value = iter([b"a", b"b"])
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get("/heroes/export", **request_options)
+
+        # Assert
+        assert response.status_code == 200
+        assert (
+            response.headers["content-type"]
+            == EXPORT_FORMATS[export_format].media_type
+        )
+        assert response.content == b"ab"
+        mock_service.export_heroes.assert_called_once_with(export_format)
+
+    def test_export_unknown_format(self, client, mocker):
+        """Test an unsupported format is not acceptable."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.get("/heroes/export", params={"format": "csv"})
+
+        # Assert
+        assert response.status_code == 406
+        mock_service.export_heroes.assert_not_called()
+
+
+class TestCreateHeroesBulk:
+    """Test bulk create heroes endpoint."""
+
+    def test_create_heroes_from_list(self, client, mocker):
+        """Test a JSON list is created in one call."""
+        # Arrange
+        ids = [uuid4(), uuid4()]
+        mock_service = mocker.Mock()
+        mock_service.create_heroes.return_value = ids
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.post(
+            "/heroes/bulk", json=[{"name": "Storm"}, {"name": "Rogue"}]
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"ids": [str(hero_id) for hero_id in ids]}
+        mock_service.create_heroes.assert_called_once_with(
+            [HeroCreate(name="Storm"), HeroCreate(name="Rogue")]
+        )
+
+    def test_create_heroes_from_ndjson(self, client, mocker):
+        """Test an NDJSON body is created chunk by chunk."""
+        # Arrange
+        mocker.patch("fastapi_seed.api.heroes.BULK_CHUNK_SIZE", 2)
+        mock_service = mocker.Mock()
+        mock_service.create_heroes.side_effect = lambda chunk: [
+            uuid4() for _ in chunk
+        ]
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+        body = '{"name": "Storm"}\n\n{"name": "Rogue"}\n{"name": "Cyclops"}\n'
+
+        # Act
+        response = client.post(
+            "/heroes/bulk",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert len(response.json()["ids"]) == 3
+        assert mock_service.create_heroes.call_args_list == [
+            mocker.call([HeroCreate(name="Storm"), HeroCreate(name="Rogue")]),
+            mocker.call([HeroCreate(name="Cyclops")]),
+        ]
+
+    def test_create_heroes_invalid_line(self, client, mocker):
+        """Test an invalid NDJSON line reports the heroes already created."""
+        # Arrange
+        mocker.patch("fastapi_seed.api.heroes.BULK_CHUNK_SIZE", 1)
+        mock_service = mocker.Mock()
+        mock_service.create_heroes.side_effect = lambda chunk: [
+            uuid4() for _ in chunk
+        ]
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.post(
+            "/heroes/bulk",
+            content='{"name": "Storm"}\n{"alias": "Rogue"}\n',
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        # Assert
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["line"] == 1
+        assert detail["created"] == 1
+
+    def test_create_heroes_invalid_list(self, client, mocker):
+        """Test an invalid JSON list is rejected before inserting."""
+        # Arrange
+        mock_service = mocker.Mock()
+        mocker.patch.object(
+            client.app,
+            "dependency_overrides",
+            {get_heroes_service: lambda: mock_service},
+        )
+
+        # Act
+        response = client.post("/heroes/bulk", json=[{"alias": "Storm"}])
+
+        # Assert
+        assert response.status_code == 422
+        mock_service.create_heroes.assert_not_called()
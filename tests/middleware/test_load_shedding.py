@@ -0,0 +1,107 @@
+"""Tests for the load shedding middleware."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_seed.middleware.load_shedding import LoadSheddingMiddleware
+
+
+@pytest.fixture
+def app():
+    """Create an app with moderation routes and another route."""
+    test_app = FastAPI()
+
+    @test_app.post("/content-moderation/moderate")
+    async def moderate():
+        return {"ok": True}
+
+    @test_app.post("/content-moderation/moderate/batch")
+    async def moderate_batch():
+        return {"ok": True}
+
+    @test_app.get("/content-moderation/stats")
+    async def stats():
+        return {}
+
+    @test_app.get("/content-moderation/analytics")
+    async def analytics():
+        return {}
+
+    @test_app.get("/heroes")
+    async def heroes():
+        return []
+
+    return test_app
+
+
+def client_at(app, rps):
+    """Create a client whose requests arrive at a request rate."""
+    shedding = LoadSheddingMiddleware(app, max_rps=10)
+
+    async def tracked(scope, receive, send):
+        # Stands in for RPSTrackerMiddleware
+        scope.setdefault("state", {})["rps"] = rps
+        await shedding(scope, receive, send)
+
+    return TestClient(tracked), shedding
+
+
+class TestLoadSheddingMiddleware:
+    """Test load shedding middleware."""
+
+    def test_passes_below_max_rps(self, app):
+        """Test requests are served while the rate is within the limit."""
+        client, shedding = client_at(app, rps=10)
+
+        response = client.post("/content-moderation/moderate")
+
+        assert response.status_code == 200
+        assert shedding.shed == 0
+
+    def test_sheds_above_max_rps(self, app):
+        """Test moderation requests get an early 429 with Retry-After."""
+        # Arrange
+        client, shedding = client_at(app, rps=11)
+
+        # Act
+        shed = client.post("/content-moderation/moderate")
+        low = client.post(
+            "/content-moderation/moderate", headers={"X-Priority": "low"}
+        )
+        other = client.get("/heroes")
+
+        # Assert
+        assert shed.status_code == 429
+        assert shed.headers["Retry-After"] == "1"
+        assert low.status_code == 429
+        assert other.status_code == 200
+        assert shedding.shed == 2
+
+    def test_read_only_routes_not_shed(self, app):
+        """Test only the scoring routes are shed, not stats and analytics."""
+        # Arrange
+        client, shedding = client_at(app, rps=100)
+
+        # Act
+        batch = client.post("/content-moderation/moderate/batch")
+        stats = client.get("/content-moderation/stats")
+        analytics = client.get("/content-moderation/analytics")
+
+        # Assert
+        assert batch.status_code == 429
+        assert stats.status_code == 200
+        assert analytics.status_code == 200
+        assert shedding.shed == 1
+
+    @pytest.mark.parametrize("priority", ["high", "urgent"])
+    def test_high_priority_not_shed(self, app, priority):
+        """Test exempt and invalid priorities are left to the route."""
+        client, shedding = client_at(app, rps=100)
+
+        response = client.post(
+            "/content-moderation/moderate", headers={"X-Priority": priority}
+        )
+
+        assert response.status_code == 200
+        assert shedding.shed == 0
@@ -0,0 +1,39 @@
+"""Tests for the request metrics middleware and route."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_seed.api.metrics import router
+from fastapi_seed.middleware.metrics import MetricsMiddleware
+
+
+class TestMetricsMiddleware:
+    """Test request metrics."""
+
+    def test_latency_recorded_per_route_and_status(self):
+        """Test requests show up in the exposed latency histogram."""
+        # Arrange
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(router)
+
+        @app.get("/items/{item_id}")
+        def read_item(item_id: int):
+            return {"id": item_id}
+
+        client = TestClient(app)
+
+        # Act
+        client.get("/items/1")
+        client.get("/items/2")
+        response = client.get("/metrics")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        assert (
+            'http_request_duration_seconds_count{route="GET /items/{item_id}",'
+            'status="200"} 2'
+        ) in lines
+        assert "http_requests_in_flight 1.0" in lines
@@ -0,0 +1,108 @@
+"""Tests for the request rate tracking middleware."""
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from fastapi_seed.middleware.routes import UNMATCHED_ROUTE
+from fastapi_seed.middleware.rps_tracker import (
+    RateCounter,
+    RPSTrackerMiddleware,
+)
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Create a fake clock."""
+    return FakeClock()
+
+
+class TestRateCounter:
+    """Test the per-second ring counter."""
+
+    def test_counts_beyond_old_request_cap(self, clock):
+        """Test high rates are not capped by a bounded request log."""
+        counter = RateCounter(window_size=10, clock=clock)
+        clock.now += 10
+
+        for _ in range(5000):
+            counter.record()
+
+        assert counter.count() == 5000
+        assert counter.rate() == 500.0
+
+    def test_old_seconds_leave_window(self, clock):
+        """Test requests older than the window are no longer counted."""
+        counter = RateCounter(window_size=10, clock=clock)
+        counter.record()
+        clock.now += 5
+        counter.record()
+        counter.record()
+
+        clock.now += 6
+        assert counter.count() == 2
+
+        clock.now += 30
+        assert counter.count() == 0
+
+    def test_rate_averaged_over_elapsed_time_at_startup(self, clock):
+        """Test the rate is not diluted by the window right after start."""
+        counter = RateCounter(window_size=60, clock=clock)
+        clock.now += 2
+
+        for _ in range(10):
+            counter.record()
+
+        assert counter.rate() == 5.0
+
+
+class TestRPSTrackerMiddleware:
+    """Test the middleware."""
+
+    @pytest.fixture
+    def app(self):
+        """Create an app tracked by the middleware."""
+        test_app = FastAPI()
+        test_app.add_middleware(RPSTrackerMiddleware)
+
+        @test_app.get("/items/{item_id}")
+        def read_item(item_id: int, request: Request):
+            if item_id < 0:
+                raise HTTPException(status_code=404)
+            return {"rps": request.state.rps}
+
+        return test_app
+
+    def test_rates_per_route_and_status(self, app):
+        """Test requests are broken down by route template and status."""
+        # Arrange
+        client = TestClient(app)
+
+        # Act
+        first = client.get("/items/1")
+        client.get("/items/2")
+        client.get("/items/-1")
+        client.get("/nowhere")
+
+        # Assert
+        assert first.json()["rps"] > 0
+        tracker = app.middleware_stack.app
+        snapshot = tracker.snapshot()
+        assert snapshot["rps"] > 0
+        assert set(snapshot["routes"]) == {
+            "GET /items/{item_id}",
+            UNMATCHED_ROUTE,
+        }
+        assert tracker.routes["GET /items/{item_id}"].count() == 3
+        assert tracker.statuses[200].count() == 2
+        assert tracker.statuses[404].count() == 2
@@ -0,0 +1,71 @@
+"""Tests for the database manager."""
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import func, select
+
+from fastapi_seed.models.hero import Hero
+from fastapi_seed.repository.database import DatabaseManager
+
+
+@pytest.fixture
+def manager(tmp_path, mocker):
+    """Create a database manager of its own on an empty database."""
+    mocker.patch.object(DatabaseManager, "_instance", None)
+    manager = DatabaseManager(
+        db_file=str(tmp_path / "heroes.db"),
+        pool_size=1,
+        max_overflow=0,
+        timeout=1,
+    )
+    yield manager
+    manager.dispose()
+
+
+def _count(session):
+    return session.exec(select(func.count()).select_from(Hero)).one()
+
+
+class TestReadSession:
+    """Test sessions on the read-only pool."""
+
+    def test_reads_committed_writes(self, manager):
+        """Test a read session sees heroes committed by a write session."""
+        # Arrange
+        with manager.session() as session:
+            session.add(Hero(name="Storm"))
+
+        # Act
+        with manager.read_session() as session:
+            count = _count(session)
+
+        # Assert
+        assert count == 1
+
+    def test_writes_fail(self, manager):
+        """Test a read session cannot write."""
+        with manager.read_session() as session:
+            session.add(Hero(name="Storm"))
+            with pytest.raises(OperationalError, match="read-only"):
+                session.commit()
+
+        with manager.read_session() as session:
+            assert _count(session) == 0
+
+    def test_reads_do_not_wait_for_write_pool(self, manager):
+        """Test reads use their own pool while the write pool is exhausted."""
+        with manager.session() as write_session:
+            # Arrange
+            write_session.add(Hero(name="Storm"))
+            write_session.flush()
+
+            # Act
+            with manager.read_session() as session:
+                count = _count(session)
+                read_checked_out = manager.read_engine.pool.checkedout()
+
+            # Assert
+            assert manager.engine.pool.checkedout() == 1
+            assert read_checked_out == 1
+            # The uncommitted hero is not visible to the read
+            assert count == 0
@@ -0,0 +1,67 @@
+"""Tests for the database executor."""
+
+import asyncio
+import threading
+
+import pytest
+
+from fastapi_seed.repository.executor import (
+    DatabaseExecutor,
+    DatabaseOverloadedError,
+)
+
+
+@pytest.fixture
+def executor():
+    """Create an executor with one thread and two pending slots."""
+    database_executor = DatabaseExecutor(
+        max_workers=1, max_pending=2, name="test-db"
+    )
+    yield database_executor
+    database_executor.shutdown()
+
+
+class TestDatabaseExecutor:
+    """Test database executor."""
+
+    def test_run_on_executor_thread(self, executor):
+        """Test calls run on the executor's threads."""
+        name = asyncio.run(
+            executor.run(lambda: threading.current_thread().name)
+        )
+
+        assert name.startswith("test-db")
+
+    def test_rejects_when_saturated(self, executor):
+        """Test calls beyond max_pending fail at once."""
+        # Arrange
+        gate = threading.Event()
+
+        async def saturate():
+            blocked = [
+                asyncio.ensure_future(executor.run(gate.wait, 5))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+            try:
+                with pytest.raises(DatabaseOverloadedError):
+                    await executor.run(int)
+                return executor.stats()
+            finally:
+                gate.set()
+                await asyncio.gather(*blocked)
+
+        # Act
+        stats = asyncio.run(saturate())
+
+        # Assert
+        assert stats["pending"] == 2
+        assert stats["rejected"] == 1
+        assert executor.stats()["pending"] == 0
+
+    def test_releases_slot_on_error(self, executor):
+        """Test a failing call gives its slot back."""
+        with pytest.raises(ValueError, match="invalid literal"):
+            asyncio.run(executor.run(int, "boom"))
+
+        assert executor.stats()["pending"] == 0
@@ -0,0 +1,64 @@
+"""Tests for the heroes repository."""
+
+from uuid import uuid4
+
+import pytest
+from duckdb import ConstraintException
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from fastapi_seed.models.hero import Hero, HeroCreate
+from fastapi_seed.repository.heroes import create_heroes
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Create a session on an empty DuckDB database."""
+    engine = create_engine(f"duckdb:///{tmp_path / 'heroes.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _count(session):
+    return session.exec(select(func.count()).select_from(Hero)).one()
+
+
+class TestCreateHeroes:
+    """Test bulk hero creation."""
+
+    def test_create_heroes_returns_ids_in_order(self, session):
+        """Test every hero is inserted under the returned ID."""
+        # Arrange
+        names = [f"hero {i}" for i in range(7)]
+
+        # Act
+        ids = create_heroes(
+            session, (HeroCreate(name=name) for name in names), chunk_size=3
+        )
+
+        # Assert
+        assert len(ids) == 7
+        assert [session.get(Hero, hero_id).name for hero_id in ids] == names
+
+    def test_failed_chunk_is_rolled_back(self, session, mocker):
+        """Test earlier chunks stay committed when a chunk fails."""
+        # Arrange
+        hero_creates = [HeroCreate(name=f"hero {i}") for i in range(4)]
+        duplicate = uuid4()
+        mocker.patch(
+            "fastapi_seed.repository.heroes.uuid4",
+            side_effect=[uuid4(), uuid4(), duplicate, duplicate],
+        )
+
+        # Act
+        with pytest.raises(ConstraintException):
+            create_heroes(session, hero_creates, chunk_size=2)
+
+        # Assert
+        assert _count(session) == 2
+
+    def test_create_no_heroes(self, session):
+        """Test an empty input creates nothing."""
+        assert create_heroes(session, []) == []
+        assert _count(session) == 0
@@ -0,0 +1,251 @@
+"""Tests for the micro-batching scheduler."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fastapi_seed.services.batching import BatchScheduler, DeadlineExceededError
+
+
+@pytest.fixture
+def batches():
+    """Record of batches passed to the batch function."""
+    return []
+
+
+@pytest.fixture
+def scheduler(batches):
+    """Create a running scheduler doubling its inputs."""
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batch_scheduler = BatchScheduler(double, max_batch_size=4, max_wait_ms=50)
+    batch_scheduler.start()
+    yield batch_scheduler
+    batch_scheduler.stop()
+
+
+class TestBatchScheduler:
+    """Test batch scheduler."""
+
+    def test_single_item_flushed_after_max_wait(self, scheduler, batches):
+        """Test a lone item is processed once the wait time elapsed."""
+        # Act
+        result = scheduler.submit(21).result(timeout=1)
+
+        # Assert
+        assert result == 42
+        assert batches == [[21]]
+
+    def test_concurrent_items_share_batch(self, scheduler, batches):
+        """Test concurrent submissions are grouped up to max batch size."""
+        # Arrange
+        barrier = threading.Barrier(6)
+        results = {}
+
+        def worker(value):
+            barrier.wait()
+            results[value] = scheduler.submit(value).result(timeout=1)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        assert results == {i: i * 2 for i in range(6)}
+        assert max(len(batch) for batch in batches) <= 4
+        assert len(batches) < 6
+        stats = scheduler.stats()
+        assert stats["items"] == 6
+        assert stats["batches"] == len(batches)
+
+    def test_batch_error_propagates_to_all_items(self):
+        """Test an exception in the batch function fails every item."""
+
+        # Arrange
+        def fail(_items):
+            raise ValueError("model error")
+
+        batch_scheduler = BatchScheduler(fail, max_batch_size=2, max_wait_ms=50)
+        batch_scheduler.start()
+
+        # Act
+        futures = [batch_scheduler.submit(i) for i in range(2)]
+
+        # Assert
+        for future in futures:
+            with pytest.raises(ValueError, match="model error"):
+                future.result(timeout=1)
+        batch_scheduler.stop()
+
+    def test_stop_drains_queue(self, batches):
+        """Test stopping the scheduler processes already queued items."""
+
+        # Arrange
+        def slow_identity(items):
+            time.sleep(0.01)
+            batches.append(list(items))
+            return list(items)
+
+        batch_scheduler = BatchScheduler(
+            slow_identity, max_batch_size=1, max_wait_ms=0
+        )
+        batch_scheduler.start()
+        futures = [batch_scheduler.submit(i) for i in range(3)]
+
+        # Act
+        batch_scheduler.stop()
+
+        # Assert
+        assert [future.result(timeout=0) for future in futures] == [0, 1, 2]
+
+    def test_cancelled_items_do_not_stop_worker(self):
+        """Test cancelling waiters mid-batch keeps the scheduler working."""
+        # Arrange
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_identity(items):
+            started.set()
+            release.wait(timeout=1)
+            return list(items)
+
+        batch_scheduler = BatchScheduler(
+            blocking_identity, max_batch_size=1, max_wait_ms=0
+        )
+        batch_scheduler.start()
+        running = batch_scheduler.submit(1)
+        started.wait(timeout=1)
+        queued = batch_scheduler.submit(2)
+
+        # Act
+        running_cancelled = running.cancel()
+        queued_cancelled = queued.cancel()
+        release.set()
+
+        # Assert
+        assert not running_cancelled
+        assert queued_cancelled
+        assert running.result(timeout=1) == 1
+        assert batch_scheduler.submit(3).result(timeout=1) == 3
+        assert batch_scheduler.stats()["items"] == 2
+        batch_scheduler.stop()
+
+    def test_higher_priority_batched_first(self, batches):
+        """Test queued items are batched by priority, then in order."""
+        # Arrange
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_identity(items):
+            started.set()
+            release.wait(timeout=1)
+            batches.append(list(items))
+            return list(items)
+
+        batch_scheduler = BatchScheduler(
+            blocking_identity, max_batch_size=1, max_wait_ms=0
+        )
+        batch_scheduler.start()
+        running = batch_scheduler.submit("running")
+        started.wait(timeout=1)
+        futures = [
+            batch_scheduler.submit(item, priority)
+            for item, priority in [("low", 2), ("high", 0), ("normal", 1)]
+        ]
+        futures.append(batch_scheduler.submit("high again", 0))
+
+        # Act
+        release.set()
+        for future in [running, *futures]:
+            future.result(timeout=1)
+
+        # Assert
+        assert batches == [
+            ["running"],
+            ["high"],
+            ["high again"],
+            ["normal"],
+            ["low"],
+        ]
+        batch_scheduler.stop()
+
+    def test_expired_items_dropped(self, batches):
+        """Test items past their deadline never reach the batch function."""
+        # Arrange
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_identity(items):
+            started.set()
+            release.wait(timeout=1)
+            batches.append(list(items))
+            return list(items)
+
+        batch_scheduler = BatchScheduler(
+            blocking_identity, max_batch_size=4, max_wait_ms=0
+        )
+        batch_scheduler.start()
+        running = batch_scheduler.submit(1, deadline=time.monotonic() + 0.05)
+        started.wait(timeout=1)
+        expiring = batch_scheduler.submit(2, deadline=time.monotonic() + 0.05)
+        waiting = batch_scheduler.submit(3, deadline=time.monotonic() + 5)
+
+        # Act
+        time.sleep(0.1)
+        release.set()
+
+        # Assert
+        assert running.result(timeout=1) == 1
+        with pytest.raises(DeadlineExceededError):
+            expiring.result(timeout=1)
+        assert waiting.result(timeout=1) == 3
+        assert batches == [[1], [3]]
+        assert batch_scheduler.stats()["expired"] == 1
+        batch_scheduler.stop()
+
+    def test_dispatched_batches_run_concurrently(self):
+        """Test batches returning futures overlap up to the slot limit."""
+        # Arrange
+        barrier = threading.Barrier(2, timeout=1)
+        pool = ThreadPoolExecutor(max_workers=2)
+
+        def wait_for_other_batch(items):
+            barrier.wait()
+            return list(items)
+
+        batch_scheduler = BatchScheduler(
+            lambda items: pool.submit(wait_for_other_batch, items),
+            max_batch_size=1,
+            max_wait_ms=0,
+            max_concurrent_batches=2,
+        )
+        batch_scheduler.start()
+
+        # Act
+        futures = [batch_scheduler.submit(i) for i in range(2)]
+
+        # Assert
+        assert [future.result(timeout=1) for future in futures] == [0, 1]
+        batch_scheduler.stop()
+        pool.shutdown()
+
+    def test_submit_requires_running_scheduler(self):
+        """Test submitting to a stopped scheduler fails fast."""
+        batch_scheduler = BatchScheduler(list, max_batch_size=2)
+
+        with pytest.raises(RuntimeError):
+            batch_scheduler.submit(1)
+
+    def test_invalid_batch_size(self):
+        """Test batch size must be positive."""
+        with pytest.raises(ValueError, match="max_batch_size"):
+            BatchScheduler(list, max_batch_size=0)
@@ -0,0 +1,92 @@
+"""Tests for the hero cache."""
+
+import pytest
+
+from fastapi_seed.services.hero_cache import HeroCache, HeroCacheSettings
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Create a fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    """Create a small cache."""
+    return HeroCache(
+        HeroCacheSettings(max_entries=2, ttl_seconds=10), clock=clock
+    )
+
+
+class TestHeroCache:
+    """Test the hero cache."""
+
+    def test_put_and_get(self, cache):
+        """Test a stored value is returned and counted as a hit."""
+        cache.put("a", b"[]", cache.generation)
+
+        assert cache.get("a") == b"[]"
+        assert cache.get("b") is None
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_entries_expire(self, cache, clock):
+        """Test entries are dropped after their TTL."""
+        # Arrange
+        cache.put("a", b"[]", cache.generation)
+
+        # Act
+        clock.now = 10
+
+        # Assert
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted(self, cache):
+        """Test the cache keeps at most max_entries."""
+        # Arrange
+        cache.put("a", 1, cache.generation)
+        cache.put("b", 2, cache.generation)
+        cache.get("a")
+
+        # Act
+        cache.put("c", 3, cache.generation)
+
+        # Assert
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_invalidate_drops_entries(self, cache):
+        """Test a write drops every cached read."""
+        # Arrange
+        cache.put("a", 1, cache.generation)
+
+        # Act
+        cache.invalidate()
+
+        # Assert
+        assert cache.get("a") is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_read_before_write_is_not_cached(self, cache):
+        """Test a value read before a concurrent write is discarded."""
+        # Arrange
+        generation = cache.generation
+        cache.invalidate()
+
+        # Act
+        cache.put("a", 1, generation)
+
+        # Assert
+        assert cache.get("a") is None
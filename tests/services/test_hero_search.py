@@ -0,0 +1,106 @@
+"""Tests for the hero name search index."""
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from fastapi_seed.models.hero import HeroCreate
+from fastapi_seed.repository.heroes import create_heroes
+from fastapi_seed.services.hero_search import HeroSearchIndex, tokenize
+
+NAMES = [
+    "Spider-Man",
+    "Spider-Woman",
+    "Iron Man",
+    "Man of Steel",
+    "Wolverine",
+    "Storm",
+]
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Create a session on a DuckDB database with a few heroes."""
+    engine = create_engine(f"duckdb:///{tmp_path / 'heroes.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        create_heroes(session, (HeroCreate(name=name) for name in NAMES))
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def index(session):
+    """Create an index of the test heroes."""
+    hero_index = HeroSearchIndex()
+    hero_index.refresh(session)
+    return hero_index
+
+
+def _names(matches):
+    return [match.name for match in matches]
+
+
+class TestHeroSearchIndex:
+    """Test searching hero names."""
+
+    def test_tokenize(self):
+        """Test names are split into lowercase words."""
+        assert tokenize("Spider-Man_2 Élan") == ["spider", "man", "2", "élan"]
+
+    def test_words_rank_by_bm25(self, index):
+        """Test heroes with more and rarer query words rank first."""
+        # Act
+        matches = index.search("spider man", limit=4)
+
+        # Assert
+        assert _names(matches[:2]) == ["Spider-Man", "Spider-Woman"]
+        assert _names(matches[2:]) == ["Iron Man", "Man of Steel"]
+        assert not any(match.fuzzy for match in matches)
+        assert matches[0].score > matches[1].score > matches[2].score
+
+    def test_misspelled_name_is_fuzzy(self, index):
+        """Test similar names are returned when no word matches."""
+        matches = index.search("wolverin", limit=1)
+
+        assert _names(matches) == ["Wolverine"]
+        assert matches[0].fuzzy
+
+    def test_fuzzy_fills_word_matches(self, index):
+        """Test fuzzy matches follow word matches, without repeats."""
+        matches = index.search("storm spid", limit=3)
+
+        assert matches[0].name == "Storm"
+        assert not matches[0].fuzzy
+        assert _names(matches[1:]) == ["Spider-Man", "Spider-Woman"]
+        assert all(match.fuzzy for match in matches[1:])
+
+    def test_no_match(self, index):
+        """Test unrelated and empty queries find nothing."""
+        assert index.search("xyzzy") == []
+        assert index.search("--") == []
+
+    def test_refresh_adds_new_heroes(self, index, session):
+        """Test a refresh only indexes heroes committed since the last."""
+        # Arrange
+        create_heroes(session, [HeroCreate(name="Storm Rider")])
+
+        # Act
+        added = index.refresh(session, batch_size=2)
+
+        # Assert
+        assert added == 1
+        assert len(index) == len(NAMES) + 1
+        assert index.refresh(session) == 0
+        assert _names(index.search("rider")) == ["Storm Rider"]
+
+    def test_refresh_in_batches(self, session):
+        """Test a refresh reads and indexes heroes in batches."""
+        # Arrange
+        index = HeroSearchIndex()
+
+        # Act
+        added = index.refresh(session, batch_size=4)
+
+        # Assert
+        assert added == len(NAMES)
+        assert index.stats()["heroes"] == len(NAMES)
@@ -0,0 +1,119 @@
+"""Tests for the hero writer."""
+
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from fastapi_seed.models.hero import Hero, HeroCreate
+from fastapi_seed.repository.executor import DatabaseOverloadedError
+from fastapi_seed.repository.heroes import insert_heroes
+from fastapi_seed.services.hero_writer import HeroWriter, WriterSettings
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Create an empty DuckDB database."""
+    engine = create_engine(f"duckdb:///{tmp_path / 'heroes.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def create_writer(engine, mocker):
+    """Return a factory of writers committing to the test database."""
+
+    @contextmanager
+    def session():
+        with Session(engine) as session:
+            yield session
+            session.commit()
+
+    database = mocker.patch("fastapi_seed.services.hero_writer.DatabaseManager")
+    database.return_value.session = session
+    writers = []
+
+    def create(settings):
+        HeroWriter._instance = None
+        writer = HeroWriter(settings)
+        writers.append(writer)
+        return writer
+
+    yield create
+    for writer in writers:
+        writer.shutdown()
+    HeroWriter._instance = None
+
+
+class TestHeroWriter:
+    """Test group commit of hero creates."""
+
+    def test_concurrent_creates_share_a_commit(
+        self, create_writer, engine, mocker
+    ):
+        """Test heroes queued together are inserted in one transaction."""
+        # Arrange
+        writer = create_writer(WriterSettings(max_batch_size=8))
+        insert = mocker.patch(
+            "fastapi_seed.services.hero_writer.insert_heroes",
+            wraps=insert_heroes,
+        )
+        # Hold the writer so that all heroes queue up behind the first one
+        gate = threading.Event()
+        writer.scheduler.batch_fn = _gated(writer.scheduler.batch_fn, gate)
+
+        # Act
+        futures = [
+            writer.submit(HeroCreate(name=f"hero {i}")) for i in range(5)
+        ]
+        gate.set()
+        heroes = [future.result(timeout=5) for future in futures]
+
+        # Assert
+        assert [hero.name for hero in heroes] == [f"hero {i}" for i in range(5)]
+        assert insert.call_count <= 2
+        with Session(engine) as session:
+            assert (
+                session.exec(select(func.count()).select_from(Hero)).one() == 5
+            )
+            assert session.get(Hero, heroes[3].id).name == "hero 3"
+
+    def test_failed_commit_fails_its_batch(self, create_writer, mocker):
+        """Test every hero of a failed transaction gets the error."""
+        # Arrange
+        writer = create_writer(WriterSettings(max_wait_ms=20))
+        mocker.patch(
+            "fastapi_seed.services.hero_writer.insert_heroes",
+            side_effect=RuntimeError("disk full"),
+        )
+
+        # Act
+        futures = [writer.submit(HeroCreate(name=name)) for name in "ab"]
+
+        # Assert
+        for future in futures:
+            with pytest.raises(RuntimeError, match="disk full"):
+                future.result(timeout=5)
+
+    def test_full_queue_rejects_creates(self, create_writer, mocker):
+        """Test heroes beyond max_pending are rejected at once."""
+        # Arrange
+        writer = create_writer(WriterSettings(max_pending=2))
+        mocker.patch.object(writer.scheduler, "queue_depth", return_value=2)
+
+        # Act
+        with pytest.raises(DatabaseOverloadedError):
+            writer.submit(HeroCreate(name="Storm"))
+
+        # Assert
+        assert writer.stats()["rejected"] == 1
+
+
+def _gated(batch_fn, gate):
+    def run(items):
+        gate.wait(timeout=5)
+        return batch_fn(items)
+
+    return run
@@ -0,0 +1,246 @@
+"""Tests for the heroes service."""
+
+import asyncio
+import json
+from contextlib import contextmanager
+from uuid import uuid4
+
+import duckdb
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import Session, SQLModel, create_engine
+
+from fastapi_seed.models.hero import HeroCreate
+from fastapi_seed.repository.executor import DatabaseExecutor
+from fastapi_seed.repository.heroes import get_hero_rows
+from fastapi_seed.services.hero_cache import HeroCache
+from fastapi_seed.services.heroes import AsyncHeroesService, HeroesService
+
+NAMES = ["Storm", "Rogue", "Cyclops", "Sto_rm", "Strider"]
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Create a service on a DuckDB database with a few heroes."""
+    engine = create_engine(f"duckdb:///{tmp_path / 'heroes.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        service = HeroesService(session)
+        service.create_heroes(HeroCreate(name=name) for name in NAMES)
+        yield service
+    engine.dispose()
+
+
+class TestGetHeroes:
+    """Test paging through heroes."""
+
+    def test_pages_follow_cursors(self, service):
+        """Test cursors walk through every hero once, ordered by name."""
+        # Arrange
+        names = []
+        cursor = None
+
+        # Act
+        while True:
+            page = service.get_heroes(limit=2, cursor=cursor)
+            names.extend(hero.name for hero in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        # Assert
+        assert names == ["Cyclops", "Rogue", "Sto_rm", "Storm", "Strider"]
+
+    def test_last_full_page_has_no_cursor(self, service):
+        """Test a page ending exactly at the last hero has no cursor."""
+        page = service.get_heroes(limit=5)
+
+        assert len(page.items) == 5
+        assert page.next_cursor is None
+
+    def test_name_prefix(self, service):
+        """Test the prefix is matched literally, wildcards included."""
+        # Act
+        page = service.get_heroes(name_prefix="Sto_")
+
+        # Assert
+        assert [hero.name for hero in page.items] == ["Sto_rm"]
+
+    def test_invalid_cursor(self, service):
+        """Test a cursor not made by the service is rejected."""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            service.get_heroes(cursor="bm90IGEgY3Vyc29y")
+
+    def test_reads_use_read_session(self, service, mocker):
+        """Test queries go through the read session when there is one."""
+        # Arrange
+        session = mocker.Mock()
+        read_service = HeroesService(session, read_session=service.session)
+
+        # Act
+        page = read_service.get_heroes()
+
+        # Assert
+        assert len(page.items) == len(NAMES)
+        session.exec.assert_not_called()
+
+
+class TestGetHeroesJson:
+    """Test the serialized hero pages."""
+
+    @pytest.mark.parametrize("validate", [True, False])
+    def test_same_bytes_as_json_response(self, service, validate):
+        """Test pages match the JSON FastAPI writes for heroes."""
+        # Arrange
+        service.create_heroes([HeroCreate(name='Ne\x00w "\u00e9\u2028"')])
+        page = service.get_heroes(limit=3)
+        expected = JSONResponse(
+            jsonable_encoder(
+                [{"id": hero.id, "name": hero.name} for hero in page.items]
+            )
+        ).body
+
+        # Act
+        body, next_cursor = service.get_heroes_json(limit=3, validate=validate)
+
+        # Assert
+        assert body == expected
+        assert next_cursor == page.next_cursor
+
+    def test_pages_follow_cursors(self, service):
+        """Test cursors of serialized pages walk through every hero."""
+        # Arrange
+        names = []
+        cursor = None
+
+        # Act
+        while True:
+            body, cursor = service.get_heroes_json(limit=2, cursor=cursor)
+            names.extend(hero["name"] for hero in json.loads(body))
+            if cursor is None:
+                break
+
+        # Assert
+        assert names == sorted(NAMES)
+
+
+class TestHeroCache:
+    """Test reads served from the hero cache."""
+
+    @pytest.fixture
+    def cached_service(self, service):
+        """Attach a cache to the service."""
+        service.cache = HeroCache()
+        return service
+
+    def test_page_is_cached(self, cached_service, mocker):
+        """Test a repeated page is served without querying."""
+        # Arrange
+        rows = mocker.patch(
+            "fastapi_seed.services.heroes.get_hero_rows",
+            wraps=get_hero_rows,
+        )
+        first = cached_service.get_heroes_json(limit=2)
+
+        # Act
+        second = cached_service.get_heroes_json(limit=2)
+
+        # Assert
+        assert second == first
+        rows.assert_called_once()
+        assert cached_service.cache.stats()["hits"] == 1
+
+    def test_create_invalidates_pages(self, cached_service):
+        """Test a created hero shows up on the next read."""
+        # Arrange
+        cached_service.get_heroes_json(limit=10)
+
+        # Act
+        cached_service.create_heroes([HeroCreate(name="Banshee")])
+        body, _ = cached_service.get_heroes_json(limit=10)
+
+        # Assert
+        assert "Banshee" in [hero["name"] for hero in json.loads(body)]
+
+    def test_hero_by_id(self, cached_service):
+        """Test a hero is read by id and cached."""
+        # Arrange
+        (hero_id,) = cached_service.create_heroes([HeroCreate(name="Banshee")])
+
+        # Act
+        body = cached_service.get_hero_json(hero_id)
+        cached = cached_service.get_hero_json(hero_id)
+
+        # Assert
+        assert json.loads(body) == {"id": str(hero_id), "name": "Banshee"}
+        assert cached == body
+        assert cached_service.get_hero_json(uuid4()) is None
+
+
+class TestAsyncHeroesService:
+    """Test the heroes service of async routes."""
+
+    @pytest.fixture
+    def async_service(self, service, mocker):
+        """Create an async service reading the test database."""
+
+        @contextmanager
+        def read_session():
+            yield service.session
+
+        executor = DatabaseExecutor(max_workers=1, name="test-read")
+        yield AsyncHeroesService(
+            executor, read_session, writer=mocker.Mock(), cache=HeroCache()
+        )
+        executor.shutdown()
+
+    def test_cached_page_stays_on_event_loop(self, async_service, mocker):
+        """Test a cached page is served without running on the executor."""
+        # Arrange
+        run = mocker.spy(async_service.executor, "run")
+        first = asyncio.run(async_service.get_heroes_json(limit=2))
+
+        # Act
+        second = asyncio.run(async_service.get_heroes_json(limit=2))
+
+        # Assert
+        assert second == first
+        assert [hero["name"] for hero in json.loads(first[0])] == [
+            "Cyclops",
+            "Rogue",
+        ]
+        run.assert_called_once()
+
+    def test_missing_hero_is_not_cached(self, async_service):
+        """Test a hero that is not found is looked up again."""
+        body = asyncio.run(async_service.get_hero_json(uuid4()))
+
+        assert body is None
+        assert len(async_service.cache) == 0
+
+
+class TestExportHeroes:
+    """Test exporting every hero."""
+
+    def test_export_ndjson(self, service):
+        """Test every hero is exported as one JSON line."""
+        # Act
+        body = b"".join(service.export_heroes("ndjson"))
+
+        # Assert
+        records = [json.loads(line) for line in body.splitlines()]
+        assert sorted(record["name"] for record in records) == sorted(NAMES)
+        assert set(records[0]) == {"id", "name"}
+
+    def test_export_parquet(self, service, tmp_path):
+        """Test the Parquet export holds every hero."""
+        # Arrange
+        path = tmp_path / "heroes.parquet"
+
+        # Act
+        path.write_bytes(b"".join(service.export_heroes("parquet")))
+
+        # Assert
+        rows = duckdb.sql(f"SELECT name FROM '{path}'").fetchall()
+        assert sorted(name for (name,) in rows) == sorted(NAMES)
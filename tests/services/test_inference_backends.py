@@ -0,0 +1,35 @@
+"""Tests for inference backend selection."""
+
+import pytest
+
+from fastapi_seed.services.inference_backends import (
+    BackendReport,
+    create_backend,
+    pick_backend,
+)
+
+
+class TestPickBackend:
+    """Test picking a backend from accuracy reports."""
+
+    def test_fastest_within_tolerance(self):
+        """Test the fastest accurate backend wins over faster inaccurate."""
+        reports = [
+            BackendReport("eager", 0.0, 0.0, 100.0, True),
+            BackendReport("int8", 0.05, 0.01, 400.0, False),
+            BackendReport("torchscript", 0.0, 0.0, 150.0, True),
+        ]
+
+        assert pick_backend(reports) == "torchscript"
+
+    def test_eager_fallback(self):
+        """Test eager is used when no backend succeeded."""
+        reports = [BackendReport("compile", error="RuntimeError: no compiler")]
+
+        assert pick_backend(reports) == "eager"
+
+
+def test_unknown_backend():
+    """Test an unknown backend name is rejected."""
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        create_backend("onnx", model=None, example_inputs={})
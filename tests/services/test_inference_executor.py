@@ -0,0 +1,54 @@
+"""Tests for the inference executor."""
+
+import threading
+
+import pytest
+
+from fastapi_seed.services.inference_executor import (
+    InferenceExecutor,
+    InferenceOverloadedError,
+)
+
+
+@pytest.fixture
+def executor():
+    """Create an executor with two in-flight slots."""
+    inference_executor = InferenceExecutor(max_workers=1, max_pending=2)
+    yield inference_executor
+    inference_executor.shutdown()
+
+
+class TestInferenceExecutor:
+    """Test inference executor."""
+
+    def test_submit_runs_on_inference_thread(self, executor):
+        """Test submitted functions run outside the calling thread."""
+        future = executor.submit(lambda: threading.current_thread().name)
+
+        assert future.result(timeout=1).startswith("inference")
+
+    def test_admit_rejects_when_saturated(self, executor):
+        """Test callers beyond max_pending are rejected."""
+        with executor.admit(), executor.admit():
+            with pytest.raises(InferenceOverloadedError), executor.admit():
+                pass
+            assert executor.stats()["pending"] == 2
+
+        stats = executor.stats()
+        assert stats["pending"] == 0
+        assert stats["rejected"] == 1
+
+    def test_admit_below_limit(self, executor):
+        """Test a lower limit rejects while slots are left for others."""
+        with executor.admit(limit=1):
+            with pytest.raises(InferenceOverloadedError), executor.admit(1):
+                pass
+            with executor.admit(limit=5):
+                assert executor.stats()["pending"] == 2
+
+    def test_admit_releases_slot_on_error(self, executor):
+        """Test a failing caller gives its slot back."""
+        with pytest.raises(ValueError, match="boom"), executor.admit():
+            raise ValueError("boom")
+
+        assert executor.stats()["pending"] == 0
@@ -0,0 +1,237 @@
+"""Tests for the shared inference server and its client."""
+
+import asyncio
+import time
+
+import pytest
+
+from fastapi_seed.services.admission import Priority
+from fastapi_seed.services.batching import DeadlineExceededError
+from fastapi_seed.services.content_moderation import ContentModerationService
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.inference_server import (
+    InferenceServer,
+    InferenceUnavailableError,
+    RemoteModerationService,
+    decode_scores,
+    decode_text,
+    decode_texts,
+    encode_scores,
+    encode_text,
+    encode_texts,
+    moderation_service_class,
+)
+
+CATEGORIES = ["Safe Content", "Violence"]
+
+
+class StubService:
+    """Moderation service scoring texts by their length."""
+
+    categories = CATEGORIES
+    model_name = "stub"
+
+    def __init__(self):
+        self.batches = []
+        self.admissions = []
+
+    async def moderate_text_async(
+        self, text, priority=Priority.NORMAL, deadline=None
+    ):
+        self.admissions.append((priority, deadline))
+        if text == "overload":
+            raise InferenceOverloadedError("busy")
+        if text == "fail":
+            raise ValueError("broken")
+        if text == "late":
+            raise DeadlineExceededError("dropped")
+        return _scores(text)
+
+    async def moderate_texts_async(self, texts, batch_size):
+        self.batches.append((texts, batch_size))
+        return [_scores(text) for text in texts]
+
+    def stats(self):
+        return {"batching": {"batches": len(self.batches)}}
+
+
+def _scores(text):
+    return {"Safe Content": 1 / (1 + len(text)), "Violence": 0.5}
+
+
+@pytest.fixture
+def remote(mocker):
+    """Reset the client singleton around a test."""
+    mocker.patch.object(RemoteModerationService, "_instance", None)
+
+
+async def _serve(path, service):
+    """Start a server and a connected client."""
+    server = asyncio.create_task(InferenceServer(service, path).serve())
+    client = RemoteModerationService(path, reconnect_delay=0.01)
+    client.start()
+    while not RemoteModerationService.is_ready():
+        await asyncio.sleep(0.01)
+    return server, client
+
+
+async def _stop(server, client):
+    server.cancel()
+    await client.close()
+
+
+class TestProtocol:
+    """Test encoding requests and responses."""
+
+    def test_texts_round_trip(self):
+        """Test texts and batch size survive encoding."""
+        texts = ["", "hello", "naïve ✓", "x" * 1000]
+
+        assert decode_texts(encode_texts(texts, 16)) == (16, texts)
+
+    def test_text_round_trip(self):
+        """Test the deadline is sent as time left."""
+        deadline = time.monotonic() + 2
+
+        text, priority, received = decode_text(
+            encode_text("naïve", Priority.LOW, deadline)
+        )
+
+        assert (text, priority) == ("naïve", Priority.LOW)
+        assert received == pytest.approx(deadline, abs=0.05)
+        assert decode_text(encode_text("", Priority.HIGH, None)) == (
+            "",
+            Priority.HIGH,
+            None,
+        )
+
+    def test_scores_round_trip(self):
+        """Test scores are sent as float32 in category order."""
+        results = [{"Violence": 0.25, "Safe Content": 0.75}] * 2
+
+        payload = encode_scores(results, CATEGORIES)
+
+        assert len(payload) == 2 * len(CATEGORIES) * 4
+        assert decode_scores(payload, CATEGORIES) == results
+
+
+@pytest.mark.usefixtures("remote")
+class TestRemoteModerationService:
+    """Test forwarding moderation to an inference server."""
+
+    def test_moderates_through_server(self, tmp_path):
+        """Test single and many texts are scored by the server."""
+        service = StubService()
+
+        async def run():
+            server, client = await _serve(str(tmp_path / "s.sock"), service)
+            try:
+                single, many = await asyncio.gather(
+                    client.moderate_text_async("hi", Priority.HIGH),
+                    client.moderate_texts_async(["a", "bcd"], batch_size=8),
+                )
+                stats = await asyncio.to_thread(client.stats)
+            finally:
+                await _stop(server, client)
+            return single, many, stats
+
+        single, many, stats = asyncio.run(run())
+
+        assert single == pytest.approx(_scores("hi"))
+        assert many == [
+            pytest.approx(_scores("a")),
+            pytest.approx(_scores("bcd")),
+        ]
+        assert service.admissions == [(Priority.HIGH, None)]
+        assert service.batches == [(["a", "bcd"], 8)]
+        assert stats["batching"] == {"batches": 1}
+        assert stats["server"]["connections"] == 1
+        assert stats["client"]["pending"] == 0
+
+    def test_server_errors(self, tmp_path):
+        """Test overload and failures on the server are raised here."""
+
+        async def run():
+            server, client = await _serve(
+                str(tmp_path / "s.sock"), StubService()
+            )
+            try:
+                with pytest.raises(InferenceOverloadedError, match="busy"):
+                    await client.moderate_text_async("overload")
+                with pytest.raises(RuntimeError, match="ValueError: broken"):
+                    await client.moderate_text_async("fail")
+                with pytest.raises(DeadlineExceededError, match="dropped"):
+                    await client.moderate_text_async("late")
+                with pytest.raises(DeadlineExceededError):
+                    await client.moderate_text_async(
+                        "hi", deadline=time.monotonic()
+                    )
+            finally:
+                await _stop(server, client)
+
+        asyncio.run(run())
+
+    def test_full_client_rejects(self, tmp_path):
+        """Test requests beyond max_pending are rejected locally."""
+        # Arrange
+        service = StubService()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(text, *_):
+            started.set()
+            await release.wait()
+            return _scores(text)
+
+        service.moderate_text_async = slow
+
+        async def run():
+            path = str(tmp_path / "s.sock")
+            server, client = await _serve(path, service)
+            client.max_pending = 1
+            try:
+                first = asyncio.create_task(client.moderate_text_async("a"))
+                await started.wait()
+                # Act
+                with pytest.raises(InferenceOverloadedError):
+                    await client.moderate_text_async("b")
+                release.set()
+                return await first
+            finally:
+                await _stop(server, client)
+
+        # Assert
+        assert asyncio.run(run()) == pytest.approx(_scores("a"))
+
+    def test_lost_connection(self, tmp_path):
+        """Test in-flight requests fail when the server goes away."""
+        service = StubService()
+
+        async def hang(*_):
+            await asyncio.Event().wait()
+
+        service.moderate_text_async = hang
+
+        async def run():
+            server, client = await _serve(str(tmp_path / "s.sock"), service)
+            request = asyncio.create_task(client.moderate_text_async("a"))
+            await asyncio.sleep(0.05)
+            server.cancel()
+            try:
+                with pytest.raises(InferenceUnavailableError):
+                    await request
+                with pytest.raises(InferenceUnavailableError):
+                    await client.moderate_text_async("b")
+                return RemoteModerationService.is_ready()
+            finally:
+                await client.close()
+
+        assert not asyncio.run(run())
+
+    def test_service_class(self):
+        """Test routes use the client once it is set up."""
+        assert moderation_service_class() is ContentModerationService
+
+        RemoteModerationService("unused.sock")
+
+        assert moderation_service_class() is RemoteModerationService
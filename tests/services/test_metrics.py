@@ -0,0 +1,64 @@
+"""Tests for the in-process metrics."""
+
+import pytest
+
+from fastapi_seed.services.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    """Create an empty registry."""
+    return MetricsRegistry()
+
+
+class TestMetrics:
+    """Test histograms, gauges and their text format."""
+
+    def test_histogram_renders_cumulative_buckets(self, registry):
+        """Test observations land in their bucket and counts accumulate."""
+        # Arrange
+        histogram = registry.histogram(
+            "latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)
+        )
+
+        # Act
+        histogram.labels("GET /").observe(0.05)
+        histogram.labels("GET /").observe_many([0.5, 2.0])
+
+        # Assert
+        assert registry.render().splitlines() == [
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="GET /",le="0.1"} 1',
+            'latency_seconds_bucket{route="GET /",le="1.0"} 2',
+            'latency_seconds_bucket{route="GET /",le="+Inf"} 3',
+            'latency_seconds_sum{route="GET /"} 2.55',
+            'latency_seconds_count{route="GET /"} 3',
+        ]
+
+    def test_gauge_and_label_escaping(self, registry):
+        """Test gauges render their value with escaped labels."""
+        gauge = registry.gauge("in_flight", "In flight.", ("path",))
+        gauge.labels('a"b').inc(3)
+        gauge.labels('a"b').dec()
+        registry.gauge("pool", "Pool.").set_function(lambda: 7)
+
+        lines = registry.render().splitlines()
+
+        assert 'in_flight{path="a\\"b"} 2.0' in lines
+        assert "pool 7.0" in lines
+
+    def test_same_name_returns_registered_metric(self, registry):
+        """Test registering a metric twice returns the first one."""
+        first = registry.histogram("h", "First.")
+
+        assert registry.histogram("h", "Second.") is first
+        with pytest.raises(ValueError, match="already registered"):
+            registry.gauge("h", "Gauge.")
+
+    def test_wrong_label_count(self, registry):
+        """Test label values must match the label names."""
+        histogram = registry.histogram("h", "Help.", ("route",))
+
+        with pytest.raises(ValueError, match="expects labels"):
+            histogram.labels("a", "b")
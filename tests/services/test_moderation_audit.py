@@ -0,0 +1,171 @@
+"""Tests for the moderation audit log."""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import select
+
+from fastapi_seed.models.moderation_audit import (
+    ModerationDecision,
+    ModerationScore,
+)
+from fastapi_seed.repository.database import DatabaseManager
+from fastapi_seed.services.moderation_audit import (
+    AuditSettings,
+    ModerationAuditLog,
+    moderation_analytics,
+)
+
+SAFE = {"Safe Content": 0.9, "Violence": 0.1}
+VIOLENT = {"Safe Content": 0.2, "Violence": 0.8}
+
+
+@pytest.fixture
+def manager(tmp_path, mocker):
+    """Create a database manager of its own on an empty database."""
+    mocker.patch.object(DatabaseManager, "_instance", None)
+    manager = DatabaseManager(
+        db_file=str(tmp_path / "audit.db"),
+        pool_size=1,
+        max_overflow=0,
+        timeout=1,
+    )
+    yield manager
+    manager.dispose()
+
+
+@pytest.fixture
+def audit(manager):
+    """Create a started audit log that only flushes when asked to."""
+    log = ModerationAuditLog(
+        AuditSettings(capacity=4, flush_rows=100, flush_interval_s=60)
+    )
+    log.start(manager)
+    yield log
+    log.shutdown()
+
+
+class TestModerationAuditLog:
+    """Test moderation audit log."""
+
+    def test_not_recording_until_started(self):
+        """Test decisions are ignored while no database is attached."""
+        log = ModerationAuditLog()
+
+        log.record("model", "hello", SAFE)
+
+        assert len(log) == 0
+        assert log.stats()["recorded"] == 0
+
+    def test_flush_writes_decisions(self, audit, manager):
+        """Test a flush writes decisions and scores, without the text."""
+        # Arrange
+        audit.record_many("model", ["hello", "hit"], [SAFE, VIOLENT])
+
+        # Act
+        written = audit.flush()
+
+        # Assert
+        assert written == 2
+        assert len(audit) == 0
+        with manager.read_session() as session:
+            decisions = session.exec(
+                select(ModerationDecision).order_by(ModerationDecision.score)
+            ).all()
+            scores = session.exec(select(ModerationScore)).all()
+        assert [(d.flagged, d.category) for d in decisions] == [
+            (True, "Violence"),
+            (False, "Safe Content"),
+        ]
+        assert decisions[1].text_sha256 == (
+            hashlib.sha256(b"hello").hexdigest()
+        )
+        assert decisions[1].text_length == 5
+        assert len(scores) == 4
+        assert audit.stats()["written"] == 2
+
+    def test_capacity_drops_oldest(self, audit, manager):
+        """Test a full buffer drops its oldest decisions."""
+        # Arrange
+        for i in range(6):
+            audit.record("model", f"text {i}", SAFE)
+
+        # Act
+        audit.flush()
+
+        # Assert
+        with manager.read_session() as session:
+            lengths = session.exec(select(ModerationDecision.text_length))
+            assert sorted(lengths.all()) == [6, 6, 6, 6]
+        assert audit.stats()["dropped"] == 2
+
+    def test_failed_flush_requeues(self, audit, mocker):
+        """Test decisions of a failed flush are kept for the next one."""
+        # Arrange
+        audit.record_many("model", ["a", "b"], [SAFE, VIOLENT])
+        mocker.patch(
+            "fastapi_seed.services.moderation_audit.insert_decisions",
+            side_effect=RuntimeError("disk full"),
+        )
+
+        # Act
+        written = audit.flush()
+
+        # Assert
+        assert written == 0
+        assert len(audit) == 2
+        assert audit.stats()["write_errors"] == 1
+
+    def test_shutdown_flushes(self, audit, manager):
+        """Test shutdown writes the decisions still buffered."""
+        audit.record("model", "hello", SAFE)
+
+        audit.shutdown()
+
+        assert not audit.running
+        with manager.read_session() as session:
+            assert len(session.exec(select(ModerationDecision)).all()) == 1
+
+
+class TestModerationAnalytics:
+    """Test moderation analytics."""
+
+    def test_aggregates_per_bucket(self, manager):
+        """Test flagged rates and percentiles are computed per bucket."""
+        # Arrange
+        log = ModerationAuditLog(AuditSettings(flush_interval_s=60))
+        log.start(manager)
+        log.record_many("model", ["a", "b", "c", "d"], [SAFE] * 3 + [VIOLENT])
+        log.shutdown()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        # Act
+        with manager.read_session() as session:
+            analytics = moderation_analytics(
+                session, 3600, now - timedelta(days=1), now + timedelta(hours=1)
+            )
+
+        # Assert
+        assert analytics.bucket_seconds == 3600
+        (bucket,) = analytics.buckets
+        assert (bucket.decisions, bucket.flagged) == (4, 1)
+        assert bucket.flagged_rate == 0.25
+        violence = bucket.categories["Violence"]
+        assert violence.mean == pytest.approx(0.275)
+        assert violence.p50 == pytest.approx(0.1)
+        assert violence.p99 == pytest.approx(0.8, abs=0.03)
+
+    def test_empty_range(self, manager):
+        """Test a range without decisions has no buckets."""
+        log = ModerationAuditLog()
+        log.start(manager)
+        log.shutdown()
+        since = datetime.fromisoformat("2020-01-01")
+
+        with manager.read_session() as session:
+            analytics = moderation_analytics(
+                session, 60, since, since + timedelta(hours=1)
+            )
+
+        assert analytics.buckets == []
@@ -0,0 +1,155 @@
+"""Tests for the moderation result cache."""
+
+from concurrent.futures import Future
+
+import pytest
+
+from fastapi_seed.services.moderation_cache import (
+    CacheSettings,
+    ModerationCache,
+    normalize_text,
+)
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Create a fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    """Create a small cache."""
+    return ModerationCache(
+        "model",
+        "rev",
+        CacheSettings(max_entries=2, ttl_seconds=10),
+        clock=clock,
+    )
+
+
+class TestModerationCache:
+    """Test moderation cache."""
+
+    def test_normalized_texts_share_key(self, cache):
+        """Test whitespace differences map to the same key."""
+        assert normalize_text("  spam\tspam \n") == "spam spam"
+        assert cache.key("spam  spam") == cache.key(" spam spam ")
+        assert cache.key("spam") != cache.key("Spam")
+
+    def test_key_depends_on_model_revision(self, cache, clock):
+        """Test another model revision does not reuse results."""
+        other = ModerationCache("model", "other-rev", clock=clock)
+
+        assert cache.key("spam") != other.key("spam")
+
+    def test_hit_and_miss_counters(self, cache):
+        """Test lookups update the counters."""
+        key = cache.key("spam")
+
+        assert cache.get(key) is None
+        cache.put(key, {"Safe Content": 0.1})
+
+        assert cache.get(key) == {"Safe Content": 0.1}
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_lru_eviction(self, cache):
+        """Test the least recently used entry is evicted first."""
+        cache.put("a", {"x": 1.0})
+        cache.put("b", {"x": 2.0})
+        cache.get("a")
+
+        cache.put("c", {"x": 3.0})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"x": 1.0}
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self, cache, clock):
+        """Test entries expire after the TTL."""
+        cache.put("a", {"x": 1.0})
+        clock.now = 11
+
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+        assert cache.stats()["bytes"] == 0
+
+    def test_byte_budget(self, clock):
+        """Test the byte budget bounds the number of entries."""
+        probe = ModerationCache("model", "rev", clock=clock)
+        probe.put("a", {"x": 1.0})
+        entry_bytes = probe.stats()["bytes"]
+        cache = ModerationCache(
+            "model",
+            "rev",
+            CacheSettings(max_bytes=entry_bytes * 3),
+            clock=clock,
+        )
+
+        for key in "abcde":
+            cache.put(key, {"x": 1.0})
+
+        assert cache.stats()["entries"] == 3
+        assert cache.stats()["bytes"] <= entry_bytes * 3
+
+    def test_concurrent_requests_coalesce(self, cache):
+        """Test identical in-flight requests share one computation."""
+        computations = []
+
+        def compute():
+            future = Future()
+            computations.append(future)
+            return future
+
+        first = cache.get_or_compute("a", compute)
+        second = cache.get_or_compute("a", compute)
+        computations[0].set_result({"x": 1.0})
+
+        assert first.result(timeout=0) == {"x": 1.0}
+        assert second.result(timeout=0) == {"x": 1.0}
+        assert len(computations) == 1
+        assert cache.stats()["coalesced"] == 1
+        third = cache.get_or_compute("a", compute)
+        assert third.result(timeout=0) == {"x": 1.0}
+        assert len(computations) == 1
+
+    def test_failed_computation_not_cached(self, cache):
+        """Test errors are not cached and the key can be retried."""
+        failed = Future()
+        cache.get_or_compute("a", lambda: failed)
+        failed.set_exception(RuntimeError("model error"))
+
+        retry = Future()
+        retried = cache.get_or_compute("a", lambda: retry)
+        retry.set_result({"x": 1.0})
+        assert retried.result(timeout=0) == {"x": 1.0}
+
+    def test_cancelled_waiter_does_not_cancel_others(self, cache):
+        """Test cancelling one coalesced waiter leaves the other intact."""
+        # Arrange
+        computation = Future()
+        first = cache.get_or_compute("a", lambda: computation)
+        second = cache.get_or_compute("a", Future)
+
+        # Act
+        first.cancel()
+        computation.set_result({"x": 1.0})
+
+        # Assert
+        assert first.cancelled()
+        assert not computation.cancelled()
+        assert second.result(timeout=0) == {"x": 1.0}
+        assert cache.get("a") == {"x": 1.0}
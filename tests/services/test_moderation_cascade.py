@@ -0,0 +1,222 @@
+"""Tests for the moderation cascade."""
+
+import numpy as np
+import pytest
+
+from fastapi_seed.services.moderation_cascade import (
+    CascadeSettings,
+    HashedNgramModel,
+    ModerationCascade,
+    TrainingSettings,
+    calibrate,
+    compile_lexicon,
+    pick_thresholds,
+    tokenize,
+)
+
+CATEGORIES = ["Safe Content", "Violence"]
+SAFE = [0.95, 0.01]
+VIOLENT = [0.1, 0.9]
+
+
+def constant_model(violence):
+    """Create a model scoring every text the same."""
+    logit = np.log(violence / (1 - violence))
+    return HashedNgramModel(
+        CATEGORIES,
+        np.zeros((16, 2), dtype=np.float32),
+        np.array([-logit, logit]),
+    )
+
+
+@pytest.fixture
+def trained():
+    """Train a model telling threats from small talk."""
+    rng = np.random.default_rng(0)
+    words = ["nice", "weather", "thanks", "for", "the", "help", "tomorrow"]
+    texts, targets = [], []
+    for i in range(600):
+        text = " ".join(rng.choice(words, size=rng.integers(3, 8)))
+        if i % 4 == 0:
+            texts.append(f"{text} i will hurt you")
+            targets.append(VIOLENT)
+        else:
+            texts.append(text)
+            targets.append(SAFE)
+    model = HashedNgramModel.train(
+        texts,
+        np.array(targets),
+        CATEGORIES,
+        TrainingSettings(n_features=1 << 12, epochs=5),
+    )
+    return model, texts, np.array(targets)
+
+
+class TestLexicon:
+    """Test lexicon compilation."""
+
+    def test_matches_whole_words_and_phrases(self):
+        """Test terms match as whole words, sharing their prefixes."""
+        pattern = compile_lexicon(["Kill", "killer", "hurt you", " "])
+
+        matches = [
+            bool(pattern.search(" ".join(tokenize(text))))
+            for text in [
+                "KILL it",
+                "a killer",
+                "skill",
+                "killers",
+                "I'll hurt   you!",
+                "hurt yourself",
+            ]
+        ]
+
+        assert matches == [True, True, False, False, True, False]
+
+    def test_no_terms(self):
+        """Test an empty lexicon compiles to no pattern."""
+        assert compile_lexicon(["", "!!"]) is None
+
+
+class TestHashedNgramModel:
+    """Test hashed n-gram model."""
+
+    def test_features_normalized(self):
+        """Test features are stable buckets with unit norm."""
+        indices, values = HashedNgramModel.features(["a", "b", "a"], 64)
+        again, _ = HashedNgramModel.features(["a", "b", "a"], 64)
+
+        assert np.array_equal(indices, again)
+        assert indices.max() < 64
+        assert np.dot(values, values) == pytest.approx(1.0)
+
+    def test_train_separates_categories(self, trained):
+        """Test training reproduces the reference scores."""
+        model, _, _ = trained
+
+        safe = model.predict(tokenize("thanks for the nice weather"))
+        violent = model.predict(tokenize("see you tomorrow, i will hurt you"))
+
+        assert safe[1] < 0.1
+        assert violent[1] > 0.5
+
+    def test_weights_must_match_categories(self):
+        """Test weights need one column per category."""
+        with pytest.raises(ValueError, match="2 categories"):
+            HashedNgramModel(CATEGORIES, np.zeros((4, 3)), np.zeros(3))
+
+
+class TestModerationCascade:
+    """Test moderation cascade."""
+
+    def test_clears_obvious_texts(self):
+        """Test clearly safe texts are answered with first stage scores."""
+        cascade = ModerationCascade(constant_model(0.01))
+
+        scores = cascade.screen("hello there")
+
+        assert scores == pytest.approx({"Safe Content": 0.99, "Violence": 0.01})
+        assert cascade.stats()["cleared"] == 1
+
+    def test_escalates(self):
+        """Test lexicon hits, long and uncertain texts escalate."""
+        # Arrange
+        cascade = ModerationCascade(
+            constant_model(0.3),
+            ["hurt you"],
+            CascadeSettings(path="cascade.npz", max_chars=20),
+        )
+
+        # Act
+        results = [
+            cascade.screen(text)
+            for text in ["i will HURT you", "hello " * 10, "hello"]
+        ]
+
+        # Assert
+        assert results == [None, None, None]
+        assert cascade.stats() == {
+            "lexicon": 1,
+            "long": 1,
+            "cleared": 0,
+            "flagged": 0,
+            "escalated": 1,
+        }
+
+    def test_flags_only_when_enabled(self):
+        """Test clearly unsafe texts are answered only with flag_above."""
+        model = constant_model(0.97)
+
+        escalated = ModerationCascade(model).screen("hello")
+        flagged = ModerationCascade(
+            model, settings=CascadeSettings(path="", flag_above=0.95)
+        ).screen("hello")
+
+        assert escalated is None
+        assert flagged["Violence"] == pytest.approx(0.97)
+
+    def test_save_and_load(self, trained, tmp_path):
+        """Test a saved cascade scores like the original."""
+        # Arrange
+        model, _, _ = trained
+        path = tmp_path / "cascade.npz"
+        ModerationCascade(model, ["hurt you"]).save(path)
+
+        # Act
+        loaded = ModerationCascade.load(CascadeSettings(path=str(path)))
+
+        # Assert
+        assert loaded.name == "cascade:cascade.npz"
+        assert loaded.categories == CATEGORIES
+        assert loaded.lexicon == ["hurt you"]
+        words = tokenize("thanks for the help")
+        assert np.allclose(loaded.model.predict(words), model.predict(words))
+
+
+class TestCalibrate:
+    """Test calibration against the full model."""
+
+    def test_reports_per_threshold(self, trained):
+        """Test escalation and agreement are reported per threshold."""
+        # Arrange
+        model, texts, targets = trained
+        cascade = ModerationCascade(model)
+
+        # Act
+        reports = calibrate(
+            cascade, texts[:100], targets[:100], [(0.0, None), (0.2, 0.5)]
+        )
+
+        # Assert
+        strict, loose = reports
+        assert strict.escalation_rate == 1.0
+        assert strict.agreement == 1.0
+        assert strict.mean_abs_error is None
+        assert loose.escalation_rate < 0.1
+        assert loose.agreement == 1.0
+        assert loose.missed_rate == 0.0
+
+    def test_missed_texts_lower_agreement(self):
+        """Test texts cleared against the full model count as misses."""
+        cascade = ModerationCascade(constant_model(0.01))
+
+        (report,) = calibrate(
+            cascade, ["a", "b"], np.array([SAFE, VIOLENT]), [(0.05, None)]
+        )
+
+        assert report.agreement == 0.5
+        assert report.missed_rate == 1.0
+        assert report.false_flag_rate == 0.0
+
+    def test_pick_thresholds(self, trained):
+        """Test the least escalating thresholds within agreement win."""
+        model, texts, targets = trained
+        reports = calibrate(
+            ModerationCascade(model),
+            texts[:100],
+            targets[:100],
+            [(0.0, None), (0.2, None), (0.2, 0.5)],
+        )
+
+        assert pick_thresholds(reports, 0.99) is reports[2]
+        assert pick_thresholds(reports, 1.01) is None
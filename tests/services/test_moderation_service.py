@@ -0,0 +1,348 @@
+"""Tests for the content moderation service."""
+
+import asyncio
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast
+
+from fastapi_seed.services.admission import Priority
+from fastapi_seed.services.batching import DeadlineExceededError
+from fastapi_seed.services.content_moderation import (
+    ContentModerationService,
+    ModerationSettings,
+)
+from fastapi_seed.services.inference_executor import InferenceOverloadedError
+from fastapi_seed.services.moderation_cascade import (
+    CascadeSettings,
+    HashedNgramModel,
+    ModerationCascade,
+)
+
+
+class StubModel(torch.nn.Module):
+    """Model whose score is the sum of the token ids of a text."""
+
+    def __init__(self):
+        super().__init__()
+        self.config = SimpleNamespace(
+            id2label={0: "OK", 1: "V"}, _commit_hash="stub"
+        )
+
+    def forward(self, input_ids, **_):
+        total = input_ids.float().sum(dim=1, keepdim=True) / 100
+        return (torch.cat([total, -total], dim=1),)
+
+
+def stub_tokenizer():
+    """Create a word-level tokenizer mapping word `wN` to id N + 2."""
+    vocab = {"[PAD]": 0, "[UNK]": 1}
+    vocab.update({f"w{i}": i + 2 for i in range(50)})
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, pad_token="[PAD]", unk_token="[UNK]"
+    )
+
+
+@pytest.fixture
+def create_service(mocker):
+    """Create moderation services backed by the stub model."""
+    module = "fastapi_seed.services.content_moderation"
+    mocker.patch(
+        f"{module}.AutoTokenizer.from_pretrained",
+        side_effect=lambda *_, **__: stub_tokenizer(),
+    )
+    mocker.patch(
+        f"{module}.AutoModelForSequenceClassification.from_pretrained",
+        side_effect=lambda *_, **__: StubModel(),
+    )
+    services = []
+    ContentModerationService._instance = None
+
+    def create(**options):
+        ContentModerationService._instance = None
+        service = ContentModerationService(ModerationSettings(**options))
+        services.append(service)
+        return service
+
+    yield create
+    for service in services:
+        service.shutdown()
+    ContentModerationService._instance = None
+    ContentModerationService._ready.clear()
+    ContentModerationService._load_error = None
+
+
+class TestInitialize:
+    """Test loading the model."""
+
+    @pytest.mark.usefixtures("create_service")
+    def test_ready_after_background_load(self, mocker):
+        """Test the service is ready once loaded and warmed up."""
+        # Arrange
+        warmup = mocker.spy(ContentModerationService, "warmup")
+
+        # Act
+        loader = ContentModerationService.initialize_in_background(
+            ModerationSettings(cache=None, warmup_lengths=(4, 600))
+        )
+        loader.join(timeout=5)
+
+        # Assert
+        assert ContentModerationService.is_ready()
+        assert ContentModerationService.load_error() is None
+        warmup.assert_called_once()
+        ContentModerationService().shutdown()
+
+    @pytest.mark.usefixtures("create_service")
+    def test_load_error_reported(self, mocker):
+        """Test a failed load leaves the service not ready."""
+        # Arrange
+        mocker.patch(
+            "fastapi_seed.services.content_moderation"
+            ".AutoTokenizer.from_pretrained",
+            side_effect=OSError("no such model"),
+        )
+
+        # Act
+        ContentModerationService.initialize_in_background().join(timeout=5)
+
+        # Assert
+        assert not ContentModerationService.is_ready()
+        assert isinstance(ContentModerationService.load_error(), OSError)
+
+
+def words(*ids):
+    """Build a text from word ids."""
+    return " ".join(f"w{i}" for i in ids)
+
+
+class TestModerateTexts:
+    """Test moderating many texts at once."""
+
+    def test_bucketed_results_in_input_order(self, create_service):
+        """Test texts of different lengths come back in input order."""
+        # Arrange
+        service = create_service(cache=None)
+        texts = [
+            words(*range(9)),
+            words(3),
+            words(1, 2, 3, 4, 5),
+            words(7, 7),
+            words(*range(20)),
+        ]
+        expected = [service.moderate_batch([text])[0] for text in texts]
+
+        # Act
+        results = service.moderate_texts(texts, batch_size=2)
+
+        # Assert
+        assert results == pytest.approx(expected)
+
+    def test_cache_misses_merged_in_order(self, create_service, mocker):
+        """Test only misses are run and merged back at their positions."""
+        # Arrange
+        service = create_service()
+        texts = [words(1), words(2, 2), words(3, 3, 3)]
+        cached = service.moderate_texts([texts[1]])
+        run_bucketed = mocker.spy(service, "_run_bucketed")
+
+        # Act
+        results = service.moderate_texts(texts)
+
+        # Assert
+        run_bucketed.assert_called_once_with([texts[0], texts[2]], 32)
+        assert results[1] == cached[0]
+        assert results == pytest.approx(
+            [service.moderate_batch([text])[0] for text in texts]
+        )
+        assert service.cache.stats()["hits"] == 1
+
+
+class TestLongText:
+    """Test scoring long texts in overlapping windows."""
+
+    @pytest.fixture(autouse=True)
+    def short_windows(self, mocker):
+        """Use windows of 16 tokens overlapping by 4."""
+        mocker.patch.object(ContentModerationService, "MAX_LENGTH", 16)
+
+    @pytest.mark.parametrize("reducer", ["max", "mean"])
+    def test_windows_reduced_per_text(self, create_service, reducer):
+        """Test window scores are reduced per text, keeping text order."""
+        # Arrange
+        service = create_service(
+            cache=None, long_text=True, window_stride=4, window_reducer=reducer
+        )
+        # Windows at tokens 0-16, 12-28, 24-40 and 36-41
+        long_text = words(*[9] * 41)
+        full, tail = (
+            scores["Safe Content"]
+            for scores in service.moderate_texts(
+                [words(*[9] * 16), words(*[9] * 5)]
+            )
+        )
+        expected = {"max": full, "mean": (3 * full + tail) / 4}[reducer]
+        texts = [words(1), long_text, words(2, 2)]
+        singles = [service.moderate_batch([text])[0] for text in texts]
+
+        # Act
+        results = service.moderate_batch(texts)
+
+        # Assert
+        assert results[1]["Safe Content"] == pytest.approx(expected)
+        assert results[0] == pytest.approx(singles[0])
+        assert results[2] == pytest.approx(singles[2])
+
+    def test_windows_split_into_bounded_passes(self, create_service, mocker):
+        """Test a batch of many windows is run in bounded forward passes."""
+        # Arrange
+        service = create_service(
+            cache=None, long_text=True, window_stride=4, max_windows_per_pass=3
+        )
+        forward = mocker.spy(service, "_forward")
+
+        # Act
+        service.moderate_batch([words(*range(41)), words(*range(30))])
+
+        # Assert
+        rows = [len(call.args[0]["input_ids"]) for call in forward.mock_calls]
+        assert sum(rows) == 7
+        assert max(rows) <= 3
+
+    def test_unknown_reducer(self, create_service):
+        """Test an unknown window reducer is rejected."""
+        with pytest.raises(ValueError, match="Unknown window reducer"):
+            create_service(long_text=True, window_reducer="median")
+
+
+class TestAdmission:
+    """Test priorities and deadlines of single texts."""
+
+    def test_lower_priorities_rejected_first(self, create_service):
+        """Test each priority may only fill its share of the queue."""
+        # Arrange
+        service = create_service(max_pending=10, cache=None)
+        text = words(1)
+
+        async def moderate(priority):
+            return await service.moderate_text_async(text, priority)
+
+        # Act
+        with ExitStack() as in_flight:
+            for _ in range(5):
+                in_flight.enter_context(service.executor.admit())
+            high = asyncio.run(moderate(Priority.HIGH))
+            normal = asyncio.run(moderate(Priority.NORMAL))
+            with pytest.raises(InferenceOverloadedError):
+                asyncio.run(moderate(Priority.LOW))
+
+        # Assert
+        assert service.admission_limits == {
+            Priority.HIGH: 10,
+            Priority.NORMAL: 8,
+            Priority.LOW: 5,
+        }
+        assert high == normal == pytest.approx(service.moderate_text(text))
+
+    def test_expired_text_not_scored(self, create_service, mocker):
+        """Test a text past its deadline is rejected before queueing."""
+        service = create_service()
+        submit = mocker.spy(service.scheduler, "submit")
+
+        with pytest.raises(DeadlineExceededError):
+            asyncio.run(
+                service.moderate_text_async(words(1), deadline=time.monotonic())
+            )
+
+        submit.assert_not_called()
+
+    def test_deadline_passes_while_queued(self, create_service, mocker):
+        """Test the caller is answered at its deadline, not at inference."""
+        # Arrange
+        service = create_service(cache=None)
+        mocker.patch.object(service.scheduler, "submit", return_value=Future())
+        deadline = time.monotonic() + 0.05
+
+        # Act
+        with pytest.raises(DeadlineExceededError):
+            asyncio.run(
+                service.moderate_text_async(words(1), deadline=deadline)
+            )
+
+        # Assert
+        assert time.monotonic() - deadline < 0.5
+
+    def test_invalid_priority_shares(self, create_service):
+        """Test a share is required for every priority."""
+        with pytest.raises(ValueError, match="priority shares"):
+            create_service(priority_shares=(1.0, 0.5))
+
+
+@pytest.fixture
+def cascade_file(tmp_path):
+    """Write a cascade clearing every text without the word w7."""
+
+    def write(categories=("Safe Content", "Violence")):
+        path = tmp_path / "cascade.npz"
+        model = HashedNgramModel(
+            list(categories),
+            np.zeros((16, len(categories)), dtype=np.float32),
+            np.array([5.0] + [-5.0] * (len(categories) - 1)),
+        )
+        ModerationCascade(model, ["w7"]).save(path)
+        return CascadeSettings(path=str(path))
+
+    return write
+
+
+class TestCascade:
+    """Test answering obvious texts with the cascade."""
+
+    def test_obvious_texts_skip_the_model(
+        self, create_service, cascade_file, mocker
+    ):
+        """Test only escalated texts are run and merged in order."""
+        # Arrange
+        service = create_service(cascade=cascade_file())
+        texts = [words(1), words(7, 7), words(2)]
+        run_bucketed = mocker.spy(service, "_run_bucketed")
+
+        # Act
+        results = service.moderate_texts(texts)
+
+        # Assert
+        run_bucketed.assert_called_once_with([texts[1]], 32)
+        assert results[1] == pytest.approx(
+            service.moderate_batch([texts[1]])[0]
+        )
+        assert results[0]["Violence"] == pytest.approx(0.0067, abs=1e-4)
+        assert service.stats()["cascade"]["cleared"] == 2
+
+    def test_screened_before_admission(
+        self, create_service, cascade_file, mocker
+    ):
+        """Test screened texts are never queued, even when overloaded."""
+        # Arrange
+        service = create_service(cascade=cascade_file(), max_pending=1)
+        submit = mocker.spy(service.scheduler, "submit")
+
+        # Act
+        with service.executor.admit():
+            scores = asyncio.run(service.moderate_text_async(words(1)))
+
+        # Assert
+        submit.assert_not_called()
+        assert scores["Safe Content"] > 0.99
+
+    def test_categories_must_match(self, create_service, cascade_file):
+        """Test a cascade trained for other categories is refused."""
+        with pytest.raises(ValueError, match="Cascade categories"):
+            create_service(cascade=cascade_file(("Safe Content", "Spam")))
@@ -0,0 +1,84 @@
+"""Tests for the application factory."""
+
+import pytest
+
+from fastapi_seed.app import (
+    FEATURES,
+    create_app,
+    enabled_features,
+    moderation_settings,
+)
+from fastapi_seed.middleware.load_shedding import LoadSheddingMiddleware
+from fastapi_seed.middleware.metrics import MetricsMiddleware
+from fastapi_seed.middleware.rps_tracker import RPSTrackerMiddleware
+from fastapi_seed.tools.startup_bench import measure_startup
+
+
+def _paths(app):
+    return {route.path for route in app.routes}
+
+
+class TestCreateApp:
+    """Test serving a profile of features."""
+
+    def test_all_features_by_default(self, mocker):
+        """Test every feature is served unless configured otherwise."""
+        mocker.patch.dict("os.environ", clear=True)
+
+        app = create_app()
+
+        assert app.state.features == frozenset(FEATURES)
+        assert {"/heroes/", "/content-moderation/moderate"} <= _paths(app)
+
+    def test_heroes_profile(self, mocker):
+        """Test a heroes profile serves no moderation routes."""
+        mocker.patch.dict("os.environ", {"APP_FEATURES": "heroes"})
+
+        paths = _paths(create_app())
+
+        assert "/heroes/" in paths
+        assert "/health/ready" in paths
+        assert not any(path.startswith("/content-moderation") for path in paths)
+
+    def test_moderation_load_shedding(self, mocker):
+        """Test shedding is added inside the tracker of the rate it uses."""
+        mocker.patch.dict("os.environ", {"MODERATION_MAX_RPS": "50"})
+
+        middleware = create_app().user_middleware
+
+        assert [entry.cls for entry in middleware] == [
+            MetricsMiddleware,
+            RPSTrackerMiddleware,
+            LoadSheddingMiddleware,
+        ]
+        assert middleware[2].kwargs == {"max_rps": 50.0}
+
+    def test_moderation_cascade(self, mocker):
+        """Test the cascade is configured from the environment."""
+        mocker.patch.dict(
+            "os.environ",
+            {
+                "MODERATION_CASCADE_PATH": "cascade.npz",
+                "MODERATION_CASCADE_FLAG_ABOVE": "0.95",
+            },
+            clear=True,
+        )
+
+        cascade = moderation_settings().cascade
+
+        assert cascade.path == "cascade.npz"
+        assert cascade.clear_below == 0.02
+        assert cascade.flag_above == 0.95
+
+    def test_unknown_feature(self):
+        """Test misspelled features are rejected."""
+        with pytest.raises(ValueError, match="heros"):
+            enabled_features(["heros"])
+        with pytest.raises(ValueError, match="At least one"):
+            enabled_features([" "])
+
+    def test_heroes_profile_does_not_import_torch(self):
+        """Test a heroes profile starts without importing torch."""
+        startup = measure_startup("heroes")
+
+        assert not startup["torch"]
@@ -0,0 +1,64 @@
+"""Tests for the benchmark tools."""
+
+import pytest
+
+from fastapi_seed.services.content_moderation import (
+    ContentModerationService,
+    ModerationSettings,
+)
+from fastapi_seed.tools.bench import summarize
+from fastapi_seed.tools.tiny_model import build_tiny_model
+
+
+class TestSummarize:
+    """Test summarizing a benchmark run."""
+
+    def test_percentiles_and_throughput(self):
+        """Test latencies are reported in milliseconds per percentile."""
+        # Arrange
+        latencies = [i / 1000 for i in range(1, 101)]
+
+        # Act
+        result = summarize("heroes_list", 4, latencies, errors=2, duration=2)
+
+        # Assert
+        assert result.requests == 100
+        assert result.errors == 2
+        assert result.throughput_rps == 50
+        assert result.goodput_rps == 49
+        assert result.latency_ms["p50"] == pytest.approx(50.5)
+        assert result.latency_ms["p99"] == pytest.approx(99.01)
+        assert result.latency_ms["max"] == pytest.approx(100)
+
+    def test_no_requests(self):
+        """Test an empty run reports zeros."""
+        result = summarize("moderate", 1, [], errors=0, duration=0)
+
+        assert result.requests == 0
+        assert result.throughput_rps == 0
+        assert result.latency_ms["p99"] == 0
+
+
+class TestTinyModel:
+    """Test the stand-in moderation model."""
+
+    def test_loads_into_moderation_service(self, tmp_path, mocker):
+        """Test the model is served offline with the moderation labels."""
+        # Arrange
+        mocker.patch.object(ContentModerationService, "_instance", None)
+        path = build_tiny_model(tmp_path / "model")
+
+        # Act
+        service = ContentModerationService(
+            ModerationSettings(model_name=str(path), cache=None)
+        )
+        try:
+            scores = service.moderate_text("I will find you")
+        finally:
+            service.shutdown()
+
+        # Assert
+        assert set(scores) == set(
+            ContentModerationService.CATEGORY_MAPPING.values()
+        )
+        assert all(0 <= score <= 1 for score in scores.values())
@@ -0,0 +1,66 @@
+"""Tests for the cascade calibration tool."""
+
+import json
+
+from fastapi_seed.services.moderation_cascade import (
+    CascadeSettings,
+    ModerationCascade,
+)
+from fastapi_seed.tools.calibrate_cascade import main
+
+
+def write_samples(path):
+    """Write small talk and threats scored by the full model."""
+    with open(path, "w", encoding="utf-8") as samples:
+        for i in range(200):
+            text = ["nice weather", "thanks for the help", "see you"][i % 3]
+            scores = {"Safe Content": 0.95, "Violence": 0.01}
+            if i % 5 == 0:
+                text += " or i will hurt you"
+                scores = {"Safe Content": 0.1, "Violence": 0.9}
+            samples.write(json.dumps({"text": text, "scores": scores}) + "\n")
+
+
+class TestCalibrateCascade:
+    """Test training and calibrating a cascade."""
+
+    def test_trains_and_reports(self, tmp_path, capsys):
+        """Test the cascade is written and thresholds are recommended."""
+        # Arrange
+        samples = tmp_path / "samples.jsonl"
+        write_samples(samples)
+        lexicon = tmp_path / "lexicon.txt"
+        lexicon.write_text("kill\n\n", encoding="utf-8")
+        output = tmp_path / "cascade.npz"
+
+        # Act
+        status = main(
+            [
+                str(samples),
+                "-o",
+                str(output),
+                "--lexicon",
+                str(lexicon),
+                "--features",
+                "4096",
+                "--clear-below",
+                "0.0",
+                "0.2",
+                "--flag-above",
+                "none",
+            ]
+        )
+
+        # Assert
+        assert status == 0
+        lines = [
+            json.loads(line) for line in capsys.readouterr().out.splitlines()
+        ]
+        reports, summary = lines[:-1], lines[-1]
+        assert [r["clear_below"] for r in reports] == [0.0, 0.2]
+        assert reports[0]["escalation_rate"] == 1.0
+        assert summary["evaluated"] == 40
+        assert summary["model_texts_per_second"] is None
+        assert summary["recommended"]["clear_below"] == 0.2
+        cascade = ModerationCascade.load(CascadeSettings(path=str(output)))
+        assert cascade.lexicon == ["kill"]